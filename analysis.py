@@ -0,0 +1,286 @@
+import sys
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from data_manager import DataManager
+from latency_profile import load_profiles, record_profile, apply_correction
+from span_procedure import record_procedure
+from scoring import ScoreCache, score_record
+from integrity import chain_hash
+
+# Resamples are drawn in fixed-size chunks so that results only depend on the
+# seed and the number of resamples, not on how many cores happen to be present
+CHUNK_SIZE = 10000
+
+CONDITIONS = ("orexin", "placebo")
+
+
+def _pvt_metrics(record):
+    if "median_rt_ms" not in record:
+        return {}
+    return {
+        "pvt_median_rt_ms": record["median_rt_ms"],
+        "pvt_mean_rt_ms": record["mean_rt_ms"],
+        "pvt_lapses": record["lapses"],
+        "pvt_false_starts": record.get("false_starts", 0)
+    }
+
+
+def _dsst_metrics(record):
+    return {
+        "dsst_correct": record["correct_count"],
+        "dsst_accuracy": record["accuracy"]
+    }
+
+
+def _digit_span_metrics(record):
+    if record_procedure(record) == "adaptive":
+        # The staircase's threshold estimates, which are not comparable to longest passed spans
+        metrics = {f"digit_span_{direction}_estimate": record[f"{direction}_span_estimate"]
+                   for direction in ("forward", "backward") if f"{direction}_span_estimate" in record}
+        if len(metrics) == 2:
+            metrics["digit_span_total_estimate"] = sum(metrics.values())
+        return metrics
+    return {
+        "digit_span_forward": record["forward_span"],
+        "digit_span_backward": record["backward_span"],
+        "digit_span_total": record["total_span"]
+    }
+
+
+def _sss_metrics(record):
+    return {"sss_rating": record["rating"]}
+
+
+def _time_perception_metrics(record):
+    return {
+        "time_perception_ratio": record["mean_ratio"],
+        "time_perception_abs_error_s": record["mean_abs_error_s"]
+    }
+
+
+# Data file name -> function extracting session-level metrics from one scored record
+METRIC_EXTRACTORS = {
+    "pvt": _pvt_metrics,
+    "dsst": _dsst_metrics,
+    "digit_span": _digit_span_metrics,
+    "sss": _sss_metrics,
+    "time_perception": _time_perception_metrics
+}
+
+
+def load_assignment(path):
+    """Load the unblinded condition assignment file
+
+    The file lists one entry per block with the date on which each
+    condition was administered:
+
+        {"blocks": [{"block": "1", "orexin": "2026-01-05", "placebo": "2026-01-07"}]}
+
+    For records stamped with session metadata the protocol day can be
+    given instead of the date, e.g. {"block": "1", "orexin": 1, "placebo": 3}.
+    """
+    try:
+        with open(path, 'r') as f:
+            assignment = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        raise OSError(f"Error reading condition assignment '{path}': {e}")
+
+    blocks = []
+    for entry in assignment.get("blocks", []):
+        if not all(condition in entry for condition in CONDITIONS):
+            raise ValueError(f"Block entry {entry} must name a date for both orexin and placebo")
+        blocks.append(entry)
+    return blocks
+
+
+def _corrected_pvt(record, profiles):
+    # Reaction times corrected for the machine's input and display delay where calibrated,
+    # including PVT records saved before their machine was calibrated
+    record = apply_correction(record, record_profile(record, profiles))
+    corrected = record.get("corrected_reaction_times_ms")
+    if not corrected:
+        return record
+    return {**record, **score_record("pvt", {"reaction_times_ms": corrected})}
+
+
+def scored_sessions(cache, test_name, records, profiles, prune=True):
+    """Records with their scores by the current scorers, PVT scores from latency-corrected reaction times"""
+    scored = cache.scored(test_name, records, prune)
+    if test_name == "pvt":
+        scored = [_corrected_pvt(record, profiles) for record in scored]
+    return scored
+
+
+def _add_metrics(sums, day, extract, record):
+    for metric, value in extract(record).items():
+        total, count = sums.get((metric, day), (0.0, 0))
+        sums[(metric, day)] = (total + value, count + 1)
+
+
+def collect_daily_metrics(data_manager, workers=None):
+    """Average every session-level metric per calendar day and per (block, protocol day)"""
+    sums = {}
+    profiles = load_profiles(data_manager)
+    cache = ScoreCache(data_manager, workers)
+    scored_by_hash = {}
+    for test_name, extract in METRIC_EXTRACTORS.items():
+        records = data_manager.load_test_data(test_name)
+        scored = scored_sessions(cache, test_name, records, profiles)
+        for record in scored:
+            day = datetime.fromisoformat(record["timestamp"]).date().isoformat()
+            _add_metrics(sums, day, extract, record)
+        scored_by_hash[test_name] = {chain_hash(record): score for record, score in zip(records, scored)}
+    cache.save()
+
+    # Stamped records are grouped through the session index, pooling both slots
+    for (block_id, day, slot), tests in data_manager.group_by_session(list(METRIC_EXTRACTORS)).items():
+        for test_name, records in tests.items():
+            for record in records:
+                scored = scored_by_hash[test_name][chain_hash(record)]
+                _add_metrics(sums, (block_id, day), METRIC_EXTRACTORS[test_name], scored)
+
+    daily = {}
+    for (metric, day), (total, count) in sums.items():
+        daily.setdefault(metric, {})[day] = total / count
+    return daily
+
+
+def _day_key(block, condition):
+    """Date string, or (block, protocol day) when the assignment gives a day number"""
+    day = block[condition]
+    if isinstance(day, int):
+        return (str(block["block"]), day)
+    return day
+
+
+def paired_differences(blocks, daily):
+    """Build per-metric arrays of orexin minus placebo differences, one per block"""
+    # Imported here so that the dashboard can use the extractors without numpy
+    import numpy as np
+
+    differences = {}
+    for metric, by_day in sorted(daily.items()):
+        diffs = [
+            by_day[_day_key(block, "orexin")] - by_day[_day_key(block, "placebo")]
+            for block in blocks
+            if _day_key(block, "orexin") in by_day and _day_key(block, "placebo") in by_day
+        ]
+        if diffs:
+            differences[metric] = np.array(diffs, dtype=np.float64)
+    return differences
+
+
+def _resample_chunk(job):
+    """Run one chunk of sign-flip permutations or bootstrap resamples"""
+    import numpy as np
+
+    kind, diffs, size, seed = job
+    rng = np.random.default_rng(seed)
+    n = len(diffs)
+
+    if kind == "permutation":
+        signs = rng.integers(0, 2, size=(size, n), dtype=np.int8) * 2 - 1
+        permuted_means = signs @ diffs / n
+        observed = abs(diffs.mean())
+        # Small tolerance so that ties with the observed mean count as extreme
+        return int(np.count_nonzero(np.abs(permuted_means) >= observed - 1e-12))
+
+    indices = rng.integers(0, n, size=(size, n))
+    return diffs[indices].mean(axis=1)
+
+
+def _chunk_sizes(n_resamples):
+    full, rest = divmod(n_resamples, CHUNK_SIZE)
+    return [CHUNK_SIZE] * full + ([rest] if rest else [])
+
+
+def analyze(differences, n_resamples=100000, seed=0, confidence=0.95, workers=None):
+    """Compute effect sizes, permutation p-values and bootstrap CIs for every metric"""
+    import numpy as np
+
+    metrics = sorted(differences)
+    sizes = _chunk_sizes(n_resamples)
+
+    # One child seed per (metric, kind, chunk), assigned in a fixed order
+    jobs = []
+    seeds = iter(np.random.SeedSequence(seed).spawn(len(metrics) * 2 * len(sizes)))
+    for metric in metrics:
+        for kind in ("permutation", "bootstrap"):
+            for size in sizes:
+                jobs.append((kind, differences[metric], size, next(seeds)))
+
+    if workers == 1:
+        outputs = [_resample_chunk(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            outputs = list(executor.map(_resample_chunk, jobs))
+
+    results = {}
+    alpha = 1 - confidence
+    per_metric = 2 * len(sizes)
+    for i, metric in enumerate(metrics):
+        diffs = differences[metric]
+        chunk_outputs = outputs[i * per_metric:(i + 1) * per_metric]
+        extreme_count = sum(chunk_outputs[:len(sizes)])
+        bootstrap_means = np.concatenate(chunk_outputs[len(sizes):])
+
+        mean_diff = float(diffs.mean())
+        sd_diff = float(diffs.std(ddof=1)) if len(diffs) > 1 else 0.0
+        ci_low, ci_high = np.quantile(bootstrap_means, [alpha / 2, 1 - alpha / 2])
+
+        results[metric] = {
+            "n_blocks": len(diffs),
+            "mean_difference": mean_diff,
+            "sd_difference": sd_diff,
+            "cohens_dz": mean_diff / sd_diff if sd_diff > 0 else None,
+            "p_value": (extreme_count + 1) / (n_resamples + 1),
+            "ci_low": float(ci_low),
+            "ci_high": float(ci_high),
+            "confidence": confidence
+        }
+    return results
+
+
+def format_results(results):
+    """Format analysis results as a plain-text table"""
+    lines = [f"{'metric':<22}{'n':>4}{'diff':>10}{'dz':>8}{'p':>9}   CI"]
+    for metric, r in results.items():
+        dz = f"{r['cohens_dz']:.2f}" if r['cohens_dz'] is not None else "-"
+        lines.append(
+            f"{metric:<22}{r['n_blocks']:>4}{r['mean_difference']:>10.2f}{dz:>8}"
+            f"{r['p_value']:>9.4f}   [{r['ci_low']:.2f}, {r['ci_high']:.2f}]"
+        )
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Paired orexin vs. placebo comparison of the collected test data")
+    parser.add_argument("assignment", help="JSON file with the unblinded condition of each block")
+    parser.add_argument("--resamples", type=int, default=100000, help="permutation and bootstrap resamples per metric")
+    parser.add_argument("--seed", type=int, default=0, help="seed for reproducible resampling")
+    parser.add_argument("--confidence", type=float, default=0.95, help="bootstrap confidence level")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args(argv)
+
+    try:
+        blocks = load_assignment(args.assignment)
+        differences = paired_differences(blocks, collect_daily_metrics(DataManager(), args.workers))
+    except (OSError, ValueError) as e:
+        print(e)
+        return 1
+
+    if not differences:
+        print("No blocks with data for both conditions")
+        return 1
+
+    results = analyze(differences, args.resamples, args.seed, args.confidence, args.workers)
+    print(json.dumps(results, indent=2) if args.json else format_results(results))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,56 @@
+import time
+import pygame
+
+# Font sizes used across the menu and the tests, loaded up front at menu time
+PRELOAD_FONT_SIZES = (24, 36, 48, 72)
+
+class AssetRegistry:
+    """Process-wide cache of fonts, so each font file and size is only loaded once"""
+
+    def __init__(self):
+        self._fonts = {}
+        self._load_seconds = {}
+        self._hits = {}
+
+    def font(self, size, name=None):
+        """Get a font, loading it on first use (name=None is pygame's default font)"""
+        key = (name, size)
+        font = self._fonts.get(key)
+        if font is None:
+            start = time.perf_counter()
+            font = pygame.font.Font(name, size)
+            self._load_seconds[key] = time.perf_counter() - start
+            self._fonts[key] = font
+            self._hits[key] = 0
+        else:
+            self._hits[key] += 1
+        return font
+
+    def preload(self, sizes=PRELOAD_FONT_SIZES, name=None):
+        """Load fonts ahead of time; returns the seconds spent loading"""
+        start = time.perf_counter()
+        for size in sizes:
+            self.font(size, name)
+        return time.perf_counter() - start
+
+    def stats(self):
+        """Load time and cache hits per loaded font"""
+        return {
+            f"{name or 'default'}:{size}": {
+                "load_ms": self._load_seconds[(name, size)] * 1000,
+                "hits": self._hits[(name, size)]
+            }
+            for name, size in self._fonts
+        }
+
+    def clear(self):
+        """Drop all cached fonts, e.g. after pygame.font.quit()"""
+        self._fonts.clear()
+        self._load_seconds.clear()
+        self._hits.clear()
+
+registry = AssetRegistry()
+
+def get_font(size, name=None):
+    """Shared font from the process-wide registry"""
+    return registry.font(size, name)
@@ -0,0 +1,74 @@
+import math
+import time
+from array import array
+import pygame
+
+# Mixer settings, applied by pre_init_mixer() before pygame.init(). A 256
+# sample buffer holds ~6ms of audio, against ~93ms for SDL's 4096 default.
+MIXER_FREQUENCY = 44100
+MIXER_SIZE = -16
+MIXER_CHANNELS = 1
+MIXER_BUFFER = 256
+
+# The PVT's auditory stimulus
+TONE_FREQUENCY = 1000
+TONE_DURATION_S = 0.1
+TONE_VOLUME = 0.5
+
+_tones = {}
+_buffer = None
+
+def pre_init_mixer(frequency=MIXER_FREQUENCY, buffer=MIXER_BUFFER):
+    """Ask for a small mixer buffer; must run before pygame.init()"""
+    global _buffer
+    pygame.mixer.pre_init(frequency, MIXER_SIZE, MIXER_CHANNELS, buffer)
+    _buffer = buffer
+
+def mixer_settings():
+    """Active mixer settings and the latency of one buffer, or None without audio"""
+    init = pygame.mixer.get_init()
+    if not init:
+        return None
+    frequency, size, channels = init
+    # pygame does not report the buffer size, only what pre_init_mixer() asked for
+    return {
+        "frequency": frequency,
+        "channels": channels,
+        "buffer_samples": _buffer,
+        "buffer_latency_ms": _buffer / frequency * 1000 if _buffer else None
+    }
+
+def get_tone(frequency=TONE_FREQUENCY, duration_s=TONE_DURATION_S, volume=TONE_VOLUME):
+    """A sine tone as a resident Sound, synthesized once per process; None without audio
+
+    The samples are generated straight in the mixer's format, so play() only
+    has to queue an already decoded buffer.
+    """
+    key = (frequency, duration_s, volume)
+    tone = _tones.get(key)
+    if tone is not None:
+        return tone
+
+    init = pygame.mixer.get_init()
+    if not init:
+        return None
+    mixer_frequency, size, channels = init
+    if size != MIXER_SIZE:
+        print(f"Cannot synthesize a tone for mixer sample size {size}")
+        return None
+
+    start = time.perf_counter()
+    count = int(mixer_frequency * duration_s)
+    # Short linear fades avoid clicks at the start and end of the tone
+    fade = max(1, int(mixer_frequency * 0.005))
+    samples = array('h', bytes(2 * count * channels))
+    for i in range(count):
+        envelope = min(1.0, i / fade, (count - 1 - i) / fade)
+        value = int(32767 * volume * envelope * math.sin(2 * math.pi * frequency * i / mixer_frequency))
+        for channel in range(channels):
+            samples[i * channels + channel] = value
+
+    tone = pygame.mixer.Sound(buffer=samples.tobytes())
+    _tones[key] = tone
+    print(f"Synthesized {frequency}Hz tone in {(time.perf_counter() - start) * 1000:.1f}ms")
+    return tone
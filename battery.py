@@ -0,0 +1,182 @@
+import json
+import time
+import uuid
+import pygame
+from concurrent.futures import ThreadPoolExecutor
+from data_manager import DataManager
+from assets import get_font
+from feelings_index import FeelingsIndex
+from pvt import PsychomotorVigilanceTask, remove_checkpoint
+from dsst import DigitSymbolSubstitutionTest
+from digit_span import DigitSpanTest
+from stanford_sleepiness import StanfordSleepinessScale
+from subjective_feelings import SubjectiveFeelingsTest
+from time_perception import TimePerceptionTest
+
+BATTERY_CONFIG_FILE = "battery.json"
+
+# Run when there is no battery.json; tests added to the menu later are not picked up by it
+DEFAULT_SEQUENCE = ("pvt", "dsst", "digit_span", "sss", "feelings")
+
+# Data file name -> (test class, display name)
+BATTERY_TESTS = {
+    "pvt": (PsychomotorVigilanceTask, "Psychomotor Vigilance Task"),
+    "dsst": (DigitSymbolSubstitutionTest, "Digit Symbol Substitution Test"),
+    "digit_span": (DigitSpanTest, "Digit Span"),
+    "sss": (StanfordSleepinessScale, "Stanford Sleepiness Scale"),
+    "feelings": (SubjectiveFeelingsTest, "Subjective Feelings"),
+    "time_perception": (TimePerceptionTest, "Time Perception")
+}
+
+def load_battery_sequence(data_manager):
+    """Test sequence from battery.json in the data directory, or DEFAULT_SEQUENCE
+
+    The file looks like {"sequence": ["pvt", "dsst", "sss"]}.
+    """
+    filepath = data_manager.data_dir / BATTERY_CONFIG_FILE
+    if not filepath.exists():
+        return list(DEFAULT_SEQUENCE)
+
+    try:
+        with open(filepath, 'r') as f:
+            sequence = json.load(f)["sequence"]
+    except (OSError, json.JSONDecodeError, KeyError) as e:
+        print(f"Ignoring unreadable battery config '{filepath}': {e}")
+        return list(DEFAULT_SEQUENCE)
+
+    unknown = [name for name in sequence if name not in BATTERY_TESTS]
+    if unknown:
+        print(f"Ignoring unknown tests in battery config: {unknown}")
+    return [name for name in sequence if name in BATTERY_TESTS]
+
+class BatteryRunner:
+    """Runs several tests back to back and saves all their results in one commit
+
+    The next test's data file is read on a worker thread while the current test
+    runs, so moving on costs no loading time. The test object itself is built
+    on the main thread, since its fonts, surfaces and sounds are not safe to
+    create while the main thread draws.
+    """
+
+    def __init__(self, screen, font, sequence=None):
+        self.screen = screen
+        self.font = font
+        self.small_font = get_font(24)
+        self.large_font = get_font(48)
+        self.data_manager = DataManager()
+        self.sequence = sequence or load_battery_sequence(self.data_manager)
+        self.battery_id = uuid.uuid4().hex
+        self.results = {}
+
+        # Colors
+        self.WHITE = (255, 255, 255)
+        self.BLACK = (0, 0, 0)
+        self.BLUE = (70, 130, 180)
+        self.GRAY = (128, 128, 128)
+
+    def prefetch(self, test_name):
+        """Read a test's existing records; runs on the worker thread"""
+        start = time.perf_counter()
+        self.data_manager.prefetch([test_name])
+        return time.perf_counter() - start
+
+    def build(self, test_name):
+        """Construct a test; must run on the main thread"""
+        test_class, _ = BATTERY_TESTS[test_name]
+        return test_class(self.screen, self.font, self.data_manager)
+
+    def run(self):
+        self.data_manager.begin_batch(self.battery_id)
+        executor = ThreadPoolExecutor(max_workers=1)
+        next_prefetch = executor.submit(self.prefetch, self.sequence[0]) if self.sequence else None
+
+        try:
+            for position, test_name in enumerate(self.sequence):
+                if not self.show_transition(position):
+                    break
+
+                wait_start = time.perf_counter()
+                prefetch_seconds = next_prefetch.result()
+                test = self.build(test_name)
+                print(f"{BATTERY_TESTS[test_name][1]} ready (prefetched in {prefetch_seconds * 1000:.1f}ms, "
+                      f"waited {(time.perf_counter() - wait_start) * 1000:.1f}ms)")
+
+                if position + 1 < len(self.sequence):
+                    next_prefetch = executor.submit(self.prefetch, self.sequence[position + 1])
+
+                self.results[test_name] = test.run()
+        finally:
+            executor.shutdown(wait=True)
+            self.save_data()
+
+        return self.results
+
+    def show_transition(self, position):
+        """Show which test comes next; returns False if the battery was stopped"""
+        clock = pygame.time.Clock()
+        _, display_name = BATTERY_TESTS[self.sequence[position]]
+
+        while True:
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    return False
+                elif event.type == pygame.KEYDOWN:
+                    if event.key == pygame.K_ESCAPE:
+                        return False
+                    elif event.key == pygame.K_SPACE:
+                        return True
+
+            self.screen.fill(self.WHITE)
+
+            progress_text = self.small_font.render(f"Battery test {position + 1}/{len(self.sequence)}", True, self.GRAY)
+            progress_rect = progress_text.get_rect()
+            progress_rect.centerx = self.screen.get_width() // 2
+            progress_rect.y = 180
+            self.screen.blit(progress_text, progress_rect)
+
+            name_text = self.large_font.render(display_name, True, self.BLUE)
+            name_rect = name_text.get_rect()
+            name_rect.centerx = self.screen.get_width() // 2
+            name_rect.y = 230
+            self.screen.blit(name_text, name_rect)
+
+            instructions = [
+                "Press SPACE to start",
+                "ESC to stop the battery (finished tests are kept)"
+            ]
+            for i, instruction in enumerate(instructions):
+                text = self.font.render(instruction, True, self.BLACK)
+                text_rect = text.get_rect()
+                text_rect.centerx = self.screen.get_width() // 2
+                text_rect.y = 320 + i * 40
+                self.screen.blit(text, text_rect)
+
+            pygame.display.flip()
+            clock.tick(60)
+
+    def save_data(self):
+        """Commit every buffered result of the battery in one write per data file"""
+        start = time.perf_counter()
+        try:
+            committed = self.data_manager.commit_batch()
+        except Exception as e:
+            print(f"Error saving battery data: {e}")
+            return
+
+        if "pvt" in committed:
+            # Kept until now, since a PVT record in the batch is lost if the battery dies before committing
+            remove_checkpoint(self.data_manager)
+
+        if "feelings" in committed:
+            index = FeelingsIndex(self.data_manager)
+            first_offset, records = committed["feelings"]
+            for offset, record in enumerate(records, first_offset):
+                index.add_saved_record(offset, record)
+
+        record_count = sum(len(records) for _, records in committed.values())
+        print(f"Battery {self.battery_id}: saved {record_count} records to {len(committed)} files "
+              f"({self.data_manager.last_commit_bytes} bytes) in {(time.perf_counter() - start) * 1000:.1f}ms")
+
+def run_battery(screen, font, sequence=None):
+    battery = BatteryRunner(screen, font, sequence)
+    return battery.run()
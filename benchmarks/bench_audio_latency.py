@@ -0,0 +1,68 @@
+"""Headless benchmark: tone play-call cost and play-call-to-buffer latency per mixer buffer size
+
+For each buffer size the mixer is reopened and a 1ms tone (shorter than any
+buffer) is played repeatedly. The channel stops being busy once SDL's audio
+callback has mixed the tone into an output buffer, so the time from play()
+until then is the play-call-to-buffer latency. The device's own output
+latency comes on top of this and is not visible under the dummy driver.
+
+    python benchmarks/bench_audio_latency.py --plays 50
+"""
+import os
+import sys
+import time
+import random
+import argparse
+from pathlib import Path
+
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import pygame
+
+import audio
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+def measure(buffer, plays, rng):
+    pygame.mixer.quit()
+    pygame.mixer.init(audio.MIXER_FREQUENCY, audio.MIXER_SIZE, audio.MIXER_CHANNELS, buffer)
+    audio._tones.clear()
+    tone = audio.get_tone(duration_s=0.001)
+
+    call_us = []
+    latency_ms = []
+    for _ in range(plays):
+        # Random phase relative to the audio callback, like a PVT foreperiod
+        time.sleep(rng.uniform(0.005, 0.02))
+        start = time.perf_counter()
+        channel = tone.play()
+        returned = time.perf_counter()
+        while channel.get_busy():
+            pass
+        latency_ms.append((time.perf_counter() - start) * 1000)
+        call_us.append((returned - start) * 1e6)
+    return call_us, latency_ms
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--plays", type=int, default=30)
+    parser.add_argument("--buffers", type=int, nargs="+", default=[128, audio.MIXER_BUFFER, 1024, 4096],
+                        help="mixer buffer sizes in samples (4096 is SDL's usual default)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    print(f"audio driver: {os.environ['SDL_AUDIODRIVER']}, {args.plays} plays per buffer size")
+    print(f"{'buffer':>8}{'period ms':>11}{'play() us':>11}{'median ms':>11}{'p95 ms':>9}{'max ms':>9}")
+    for buffer in args.buffers:
+        call_us, latency_ms = measure(buffer, args.plays, rng)
+        print(f"{buffer:>8}{buffer / audio.MIXER_FREQUENCY * 1000:>11.2f}{percentile(call_us, 0.5):>11.1f}"
+              f"{percentile(latency_ms, 0.5):>11.2f}{percentile(latency_ms, 0.95):>9.2f}{max(latency_ms):>9.2f}")
+    pygame.mixer.quit()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
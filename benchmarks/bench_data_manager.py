@@ -0,0 +1,259 @@
+"""Scaling benchmark for DataManager persistence
+
+Seeds synthetic histories of realistic PVT, digit span and DSST records and,
+for every storage backend, history size and test, measures in a fresh
+subprocess: the time to load the full history, peak RSS after loading, save
+latency, and bytes written per save. Results are written to
+benchmarks/results/data_manager-<commit>.json so runs on different commits
+can be compared:
+
+    python benchmarks/bench_data_manager.py --sizes 1000 10000 100000
+    python benchmarks/bench_data_manager.py --compare benchmarks/results/data_manager-<commit>.json
+
+New storage backends are benchmarked by adding them to BACKENDS.
+"""
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import resource
+import tempfile
+import subprocess
+from datetime import datetime, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from data_manager import DataManager
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+TESTS = ("pvt", "digit_span", "dsst")
+
+def _timestamp(i):
+    return (datetime(2026, 1, 1) + timedelta(minutes=30 * i)).isoformat()
+
+def make_pvt(rng, i):
+    reaction_times = [rng.lognormvariate(5.6, 0.25) for _ in range(10)]
+    responses = [{"trial": n + 1, "type": "correct", "reaction_time_ms": rt,
+                  "stimulus_scheduled": 1.7e9 + n, "stimulus_onset": 1.7e9 + n + 0.001,
+                  "stimulus_lateness_ms": 1.0, "timestamp": 1.7e9 + n + rt / 1000}
+                 for n, rt in enumerate(reaction_times)]
+    return {
+        "timestamp": _timestamp(i),
+        "test_type": "psychomotor_vigilance_task",
+        "mode": "trials", "duration_s": None, "max_trials": 10,
+        "isi_range_s": [1.0, 3.0], "isi_distribution": "uniform", "stimulus": "visual", "input_backend": "sdl",
+        "completed_trials": 10, "false_starts": 0, "total_responses": 10,
+        "reaction_times_ms": reaction_times, "false_start_times_ms": [],
+        "all_responses": responses,
+        "mean_rt_ms": sum(reaction_times) / 10, "min_rt_ms": min(reaction_times),
+        "max_rt_ms": max(reaction_times), "lapses": sum(1 for rt in reaction_times if rt >= 500)
+    }
+
+def make_digit_span(rng, i):
+    def trials(forward, spans):
+        result = []
+        for span in spans:
+            sequence = [rng.randint(0, 9) for _ in range(span)]
+            result.append({
+                "span": span, "sequence": sequence, "user_input": sequence if rng.random() < 0.7 else sequence[::-1],
+                "correct": rng.random() < 0.7, "forward": forward,
+                "presentation": [{"onset_ms": 50 + k * 1000.0, "offset_ms": 850 + k * 1000.0,
+                                  "onset_error_ms": 0.02, "duration_ms": 800.0} for k in range(span)]
+            })
+        return result
+    forward = trials(True, [4, 4, 5, 5, 6, 6, 7, 7])
+    backward = trials(False, [3, 3, 4, 4, 5, 5])
+    return {
+        "timestamp": _timestamp(i), "test_type": "digit_span",
+        "forward_span": 6, "backward_span": 4, "total_span": 10,
+        "forward_trials": forward, "backward_trials": backward, "procedure": "linear"
+    }
+
+def make_dsst(rng, i):
+    attempted = rng.randint(60, 110)
+    correct = attempted - rng.randint(0, 5)
+    return {
+        "timestamp": _timestamp(i), "test_type": "digit_symbol_substitution_test",
+        "duration_seconds": 90, "correct_count": correct, "total_attempted": attempted,
+        "accuracy": correct / attempted,
+        "symbol_map": {"1": "-", "2": "T", "3": "#", "4": "O", "5": "H", "6": "L", "7": "^", "8": "X", "9": "="}
+    }
+
+RECORD_MAKERS = {"pvt": make_pvt, "digit_span": make_digit_span, "dsst": make_dsst}
+
+class JsonBackend:
+    """DataManager's JSON array files, rewritten in full on every save"""
+
+    def seed(self, data_dir, test_name, records):
+        with open(Path(data_dir) / f"{test_name}.json", 'w') as f:
+            json.dump(records, f, indent=2)
+
+    def open(self, data_dir):
+        return DataManager(data_dir)
+
+    def load(self, store, test_name):
+        return len(store.load_test_data(test_name))
+
+    def save(self, store, test_name, record):
+        store.save_test_data(test_name, record)
+
+    def size_on_disk(self, data_dir, test_name):
+        return (Path(data_dir) / f"{test_name}.json").stat().st_size
+
+# Backend name -> class; every backend is run over the same sizes and tests
+BACKENDS = {"json": JsonBackend}
+
+def _peak_rss_mb():
+    # ru_maxrss survives exec on Linux and would include the seeding parent's peak
+    try:
+        with open("/proc/self/status", 'r') as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def _bytes_written():
+    """Bytes this process has written so far, where the OS reports it"""
+    try:
+        with open("/proc/self/io", 'r') as f:
+            for line in f:
+                if line.startswith("wchar:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+def measure(backend_name, test_name, data_dir, saves, seed):
+    """Runs in a fresh subprocess, so RSS and caches only reflect this measurement"""
+    backend = BACKENDS[backend_name]()
+    rng = random.Random(seed)
+    baseline_rss = _peak_rss_mb()
+
+    store = backend.open(data_dir)
+    start = time.perf_counter()
+    loaded = backend.load(store, test_name)
+    load_s = time.perf_counter() - start
+    peak_rss = _peak_rss_mb()
+
+    latencies = []
+    written_before = _bytes_written()
+    for i in range(saves):
+        record = RECORD_MAKERS[test_name](rng, loaded + i)
+        record.pop("timestamp")
+        start = time.perf_counter()
+        backend.save(store, test_name, record)
+        latencies.append((time.perf_counter() - start) * 1000)
+    written_after = _bytes_written()
+
+    latencies.sort()
+    return {
+        "records": loaded,
+        "load_s": load_s,
+        "baseline_rss_mb": baseline_rss,
+        "peak_rss_mb": peak_rss,
+        "save_median_ms": latencies[len(latencies) // 2],
+        "save_max_ms": latencies[-1],
+        "bytes_per_save": (written_after - written_before) / saves if written_before is not None else None,
+        "size_on_disk": backend.size_on_disk(data_dir, test_name)
+    }
+
+def git_commit():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return f"{commit}-dirty" if dirty else commit
+
+def run_case(backend_name, test_name, size, saves, seed):
+    backend = BACKENDS[backend_name]()
+    rng = random.Random(seed)
+    data_dir = tempfile.mkdtemp(prefix="vigila-bench-")
+    try:
+        backend.seed(data_dir, test_name, [RECORD_MAKERS[test_name](rng, i) for i in range(size)])
+        worker = subprocess.run(
+            [sys.executable, __file__, "--worker", backend_name, test_name, data_dir,
+             "--saves", str(saves), "--seed", str(seed + 1)],
+            capture_output=True, text=True, check=True)
+        return json.loads(worker.stdout.strip().splitlines()[-1])
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+def print_table(rows, baseline=None):
+    baseline = {(r["backend"], r["test"], r["size"]): r for r in (baseline or [])}
+    header = f"{'backend':<8}{'test':<12}{'records':>9}{'load s':>9}{'save ms':>10}{'max ms':>9}{'MB/save':>9}{'RSS MB':>9}"
+    if baseline:
+        header += f"{'load x':>8}{'save x':>8}"
+    print(header)
+    for r in rows:
+        written = r["bytes_per_save"] / 1e6 if r["bytes_per_save"] is not None else float("nan")
+        line = (f"{r['backend']:<8}{r['test']:<12}{r['size']:>9}{r['load_s']:>9.3f}{r['save_median_ms']:>10.1f}"
+                f"{r['save_max_ms']:>9.1f}{written:>9.2f}{r['peak_rss_mb']:>9.1f}")
+        old = baseline.get((r["backend"], r["test"], r["size"]))
+        if old:
+            line += f"{r['load_s'] / old['load_s']:>8.2f}{r['save_median_ms'] / old['save_median_ms']:>8.2f}"
+        print(line)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--tests", nargs="+", default=list(TESTS), choices=TESTS)
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=list(BACKENDS))
+    parser.add_argument("--saves", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="report path (default: benchmarks/results/data_manager-<commit>.json)")
+    parser.add_argument("--compare", help="earlier report to show ratios against (new / old)")
+    parser.add_argument("--worker", nargs=3, metavar=("BACKEND", "TEST", "DATA_DIR"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        backend_name, test_name, data_dir = args.worker
+        print(json.dumps(measure(backend_name, test_name, data_dir, args.saves, args.seed)))
+        return 0
+
+    commit = git_commit()
+    rows = []
+    for backend_name in args.backends:
+        for size in args.sizes:
+            for test_name in args.tests:
+                result = run_case(backend_name, test_name, size, args.saves, args.seed)
+                rows.append({"backend": backend_name, "test": test_name, "size": size, **result})
+                print(f"{backend_name} {test_name} {size}: load {result['load_s']:.3f}s, "
+                      f"save {result['save_median_ms']:.1f}ms", file=sys.stderr)
+
+    report = {
+        "commit": commit,
+        "date": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "saves": args.saves,
+        "results": rows
+    }
+    output = Path(args.output) if args.output else RESULTS_DIR / f"data_manager-{commit}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)["results"]
+
+    print(f"commit {commit}, {args.saves} saves per case")
+    print_table(rows, baseline)
+    print(f"\nReport written to {output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,104 @@
+"""Headless benchmark: digit presentation timing error, frame-polled vs. scheduled
+
+Runs DigitSpanTest.present_sequence under SDL's dummy video driver and, for
+comparison, the old presentation loop that advanced digits when a 60 FPS
+frame noticed the display time had passed. Reports onset error (actual flip
+minus intended onset) and on-screen duration error per digit. Under the dummy
+driver a flip does not wait for vblank, so this measures scheduling error
+only; on real hardware add up to one refresh interval for both.
+
+    python benchmarks/bench_digit_presentation.py --sequences 20 --length 7
+"""
+import os
+import sys
+import time
+import random
+import argparse
+from pathlib import Path
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import pygame
+
+pygame.init()
+screen = pygame.display.set_mode((800, 600))
+
+from assets import get_font
+from digit_span import DigitSpanTest
+
+def frame_polled(test, length):
+    """The pre-scheduler loop: digits advance on the first frame past digit_display_time"""
+    clock = pygame.time.Clock()
+    soa = test.digit_display_time + test.digit_blank_time
+    test.current_sequence = [random.randint(0, 9) for _ in range(length)]
+    test.sequence_index = 0
+    test.digit_visible = True
+    test.phase = "showing"
+
+    onsets = []
+    start = digit_start = time.perf_counter()
+    while test.sequence_index < length:
+        current_time = time.perf_counter()
+        if current_time - digit_start >= soa:
+            test.sequence_index += 1
+            digit_start = current_time
+            if test.sequence_index >= length:
+                break
+        test.draw()
+        pygame.display.flip()
+        if len(onsets) == test.sequence_index:
+            onsets.append(time.perf_counter())
+        clock.tick(60)
+
+    errors = [(onset - (start + i * soa)) * 1000 for i, onset in enumerate(onsets)]
+    durations = [(b - a) * 1000 - soa * 1000 for a, b in zip(onsets, onsets[1:])]
+    return errors, durations
+
+def scheduled(test, length):
+    test.current_sequence = [random.randint(0, 9) for _ in range(length)]
+    test.present_sequence()
+    errors = [entry['onset_error_ms'] for entry in test.presentation]
+    durations = [entry['duration_ms'] - test.digit_display_time * 1000 for entry in test.presentation]
+    return errors, durations
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+def summarize(name, errors, durations):
+    mean = sum(errors) / len(errors)
+    print(f"{name:<14}{mean:>10.3f}{percentile(errors, 0.95):>10.3f}{max(errors):>10.3f}"
+          f"{sum(abs(d) for d in durations) / len(durations):>14.3f}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sequences", type=int, default=10)
+    parser.add_argument("--length", type=int, default=7)
+    parser.add_argument("--on", type=float, default=0.08, help="digit on-time in seconds (the test uses 0.8)")
+    parser.add_argument("--blank", type=float, default=0.02, help="blank after each digit in seconds (the test uses 0.2)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    random.seed(args.seed)
+    test = DigitSpanTest(screen, get_font(36))
+    test.digit_display_time = args.on
+    test.digit_blank_time = args.blank
+
+    results = {"frame-polled": ([], []), "scheduled": ([], [])}
+    for _ in range(args.sequences):
+        for name, method in (("frame-polled", frame_polled), ("scheduled", scheduled)):
+            errors, durations = method(test, args.length)
+            results[name][0].extend(errors)
+            results[name][1].extend(durations)
+
+    print(f"{args.sequences} sequences of {args.length} digits, {args.on * 1000:.0f}ms on + {args.blank * 1000:.0f}ms blank")
+    print(f"{'method':<14}{'onset ms':>10}{'p95 ms':>10}{'max ms':>10}{'|dur err| ms':>14}")
+    for name, (errors, durations) in results.items():
+        summarize(name, errors, durations)
+    print("\nFrame-polled onsets drift: each digit inherits the lateness of the one before.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+"""Simulation benchmark: linear vs. adaptive digit span procedure
+
+Simulated participants answer according to a logistic psychometric function
+around a true span. For each procedure this reports trials per estimate,
+estimated session wall time (using the DigitSpanTest timings), estimation
+error against the true span, and the CPU time the procedure itself costs.
+The history prior comes from ten earlier simulated sessions of the same
+participant, run before and independently of the measured one.
+
+    python benchmarks/bench_digit_span.py --participants 2000
+"""
+import sys
+import math
+import time
+import random
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from span_procedure import LinearSpanProcedure, BayesianSpanStaircase, history_prior
+
+# Timings of one DigitSpanTest trial, in seconds
+START_PROMPT = 1.0      # reading the prompt and pressing SPACE
+DIGIT_DISPLAY = 1.0     # DigitSpanTest.digit_display_time + digit_blank_time
+INPUT_PER_DIGIT = 0.5   # typing the answer
+FEEDBACK = 1.5          # DigitSpanTest.feedback_duration
+
+# Earlier adaptive sessions behind the history prior (history_prior uses up to 10)
+HISTORY_SESSIONS = 10
+
+def trial_seconds(length):
+    return START_PROMPT + length * (DIGIT_DISPLAY + INPUT_PER_DIGIT) + FEEDBACK
+
+def respond(rng, length, true_span, slope=1.2, lapse=0.03):
+    """Simulated answer; the true slope deliberately differs from the staircase's model"""
+    p = lapse + (1 - 2 * lapse) / (1 + math.exp(slope * (length - true_span)))
+    return rng.random() < p
+
+def run_procedure(procedure, rng, true_span):
+    seconds = 0.0
+    cpu = 0.0
+    while not procedure.finished:
+        length = procedure.current_span
+        seconds += trial_seconds(length)
+        correct = respond(rng, length, true_span)
+        start = time.perf_counter()
+        procedure.record(correct)
+        cpu += time.perf_counter() - start
+    return procedure.estimate(), seconds, cpu
+
+def simulate_history(rng, true_span, default_mean, sessions=HISTORY_SESSIONS):
+    """Records of earlier adaptive sessions, each run with the prior the sessions before it give"""
+    history = []
+    for _ in range(sessions):
+        procedure = BayesianSpanStaircase(*history_prior(history, "forward", default_mean))
+        estimate, _, _ = run_procedure(procedure, rng, true_span)
+        history.append({"procedure": "adaptive", "forward_span_estimate": estimate["span_estimate"]})
+    return history
+
+def make_adaptive(rng, true_span, default_mean, warm):
+    if warm:
+        # Earlier sessions simulated independently of the one measured, so their
+        # estimates carry the procedure's own error into the prior
+        mean, sd = history_prior(simulate_history(rng, true_span, default_mean), "forward", default_mean)
+    else:
+        mean, sd = default_mean, 2.0
+    start = time.perf_counter()
+    procedure = BayesianSpanStaircase(mean, sd)
+    return procedure, time.perf_counter() - start
+
+def summarize(name, rows):
+    n = len(rows)
+    trials = sum(r["trials"] for r in rows) / n
+    seconds = sum(r["seconds"] for r in rows) / n
+    errors = [r["estimate"] - r["true_span"] for r in rows]
+    bias = sum(errors) / n
+    rmse = math.sqrt(sum(e * e for e in errors) / n)
+    sd = math.sqrt(sum((e - bias) ** 2 for e in errors) / n)
+    cpu_ms = sum(r["cpu"] for r in rows) / sum(r["trials"] for r in rows) * 1000
+    print(f"{name:<22}{trials:>8.2f}{seconds:>10.1f}{bias:>8.2f}{sd:>8.2f}{rmse:>8.2f}{cpu_ms:>12.3f}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--participants", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    results = {"linear": [], "adaptive (cold prior)": [], "adaptive (history)": []}
+
+    for _ in range(args.participants):
+        for direction, population_mean, start_span in (("forward", 6.5, 4), ("backward", 5.0, 3)):
+            true_span = rng.gauss(population_mean, 1.0)
+
+            estimate, seconds, cpu = run_procedure(LinearSpanProcedure(start_span), rng, true_span)
+            results["linear"].append({"trials": estimate["trials"], "seconds": seconds, "cpu": cpu,
+                                      "estimate": estimate["span"], "true_span": true_span})
+
+            for name, warm in (("adaptive (cold prior)", False), ("adaptive (history)", True)):
+                procedure, setup = make_adaptive(rng, true_span, population_mean, warm)
+                estimate, seconds, cpu = run_procedure(procedure, rng, true_span)
+                results[name].append({"trials": estimate["trials"], "seconds": seconds, "cpu": cpu + setup,
+                                      "estimate": estimate["span_estimate"], "true_span": true_span})
+
+    print(f"{args.participants} simulated participants, forward and backward pooled")
+    print(f"{'procedure':<22}{'trials':>8}{'time s':>10}{'bias':>8}{'sd':>8}{'rmse':>8}{'cpu ms/tr':>12}")
+    for name, rows in results.items():
+        summarize(name, rows)
+    print("\nThe linear procedure reports the longest passed span, so its bias is structural;")
+    print("'sd' (error spread after removing bias) is the fair precision comparison.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
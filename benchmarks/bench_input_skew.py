@@ -0,0 +1,110 @@
+"""Benchmark: timestamp skew of the evdev and SDL key input paths
+
+Types SPACE on a uinput virtual keyboard at random moments while a 60 FPS
+loop like the PVT's handles events, and compares each path's timestamp for a
+press with the moment the press was written to /dev/uinput. The evdev path
+carries the kernel's timestamp; the SDL path is stamped when the loop
+dequeues the event. Both paths only count presses while the window has
+keyboard focus, so run it with a real video driver and keep the window
+focused.
+
+Without write access to /dev/uinput, presses are posted straight to SDL's
+queue instead and only the SDL path is measured.
+
+    sudo python benchmarks/bench_input_skew.py --presses 200
+"""
+import sys
+import time
+import random
+import argparse
+import threading
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import pygame
+
+from key_input import EvdevKeyInput, SDLKeyInput, VirtualKeyboard
+
+KEY_SPACE = 57
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+def type_presses(keyboard, presses, sent, stop):
+    """Background typist: press SPACE at random moments, remembering when each press was sent"""
+    for _ in range(presses):
+        if stop.wait(random.uniform(0.02, 0.08)):
+            return
+        if keyboard is not None:
+            sent.append(keyboard.press(KEY_SPACE))
+        else:
+            sent_ns = time.perf_counter_ns()
+            sent.append(sent_ns)
+            pygame.event.post(pygame.event.Event(pygame.KEYDOWN, key=pygame.K_SPACE))
+
+def frame_loop(sources, sent, presses, timeout_s):
+    """Handle events like the PVT, collecting each source's timestamps in press order"""
+    clock = pygame.time.Clock()
+    stamps = {name: [] for name in sources}
+    deadline = time.perf_counter() + timeout_s
+    while time.perf_counter() < deadline:
+        for event in pygame.event.get():
+            for name, source in sources.items():
+                press = source.key_press(event)
+                if press is not None and press.key == pygame.K_SPACE and press.source == name:
+                    stamps[name].append(press.time_ns)
+        if len(sent) >= presses and all(len(values) >= presses for values in stamps.values()):
+            break
+        pygame.display.flip()
+        clock.tick(60)
+    return stamps
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--presses", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    random.seed(args.seed)
+
+    pygame.init()
+    pygame.display.set_mode((200, 200))
+
+    keyboard = None
+    sources = {"sdl": SDLKeyInput()}
+    try:
+        keyboard = VirtualKeyboard()
+        evdev = EvdevKeyInput([keyboard.device_path()]).start()
+        sources["evdev"] = evdev
+    except (OSError, TypeError) as e:
+        print(f"No uinput virtual keyboard ({e}); measuring SDL posting only")
+
+    sent = []
+    stop = threading.Event()
+    typist = threading.Thread(target=type_presses, args=(keyboard, args.presses, sent, stop), daemon=True)
+    typist.start()
+    try:
+        stamps = frame_loop(sources, sent, args.presses, timeout_s=args.presses * 0.1 + 5)
+    finally:
+        stop.set()
+        typist.join()
+        if "evdev" in sources:
+            sources["evdev"].stop()
+        if keyboard is not None:
+            keyboard.close()
+
+    print(f"{len(sent)} presses, driver {pygame.display.get_driver()}")
+    print(f"{'path':<8}{'seen':>6}{'median ms':>11}{'p95 ms':>9}{'max ms':>9}")
+    for name, values in stamps.items():
+        if not values:
+            print(f"{name:<8}{0:>6}   (no events reached this path)")
+            continue
+        skews = [(stamp - sent_ns) / 1e6 for stamp, sent_ns in zip(values, sent)]
+        print(f"{name:<8}{len(values):>6}{percentile(skews, 0.5):>11.3f}{percentile(skews, 0.95):>9.3f}{max(skews):>9.3f}")
+    print("\nSkew is the timestamp minus the moment the press was written; the ideal is 0.")
+    pygame.quit()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+"""Benchmark: record validation throughput of the compiled schema validators
+
+Validates synthetic PVT, digit span and DSST histories as DataManager does on
+load, and single records as it does on every save. For comparison, the same
+schemas are also checked by a straightforward interpreter that walks the
+schema for every value.
+
+    python benchmarks/bench_schemas.py --records 100000
+"""
+import sys
+import time
+import random
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bench_data_manager import RECORD_MAKERS
+from schemas import SCHEMAS, SCHEMA_VERSION, validate_records, validate_record
+
+PY_TYPES = {"int": (int,), "number": (int, float), "str": (str,), "bool": (bool,)}
+
+def interpret(spec, value, version):
+    """Reference check walking the schema at runtime; True if value matches"""
+    if spec == "any":
+        return True
+    if isinstance(spec, str):
+        return type(value) in PY_TYPES[spec]
+    kind = spec[0]
+    if kind == "nullable":
+        return value is None or interpret(spec[1], value, version)
+    if kind == "enum":
+        return type(value) is str and value in spec[1]
+    if kind == "list":
+        return type(value) is list and all(interpret(spec[1], item, version) for item in value)
+    if kind == "map":
+        return type(value) is dict and all(type(key) is str and interpret(spec[1], item, version)
+                                           for key, item in value.items())
+    _, fields, optional, since = spec
+    if type(value) is not dict or not set(value) <= set(fields):
+        return False
+    for field, field_spec in fields.items():
+        if field not in value:
+            if field in optional or version < since.get(field, 0):
+                continue
+            return False
+        if not interpret(field_spec, value[field], version):
+            return False
+    return True
+
+def make_history(test_name, size, seed):
+    rng = random.Random(seed)
+    records = []
+    for i in range(size):
+        record = RECORD_MAKERS[test_name](rng, i)
+        record["schema_version"] = SCHEMA_VERSION
+        records.append(record)
+    return records
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=100000)
+    parser.add_argument("--tests", nargs="+", default=list(RECORD_MAKERS), choices=list(RECORD_MAKERS))
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    print(f"{'test':<12}{'records':>9}{'compiled rec/s':>16}{'interpreted rec/s':>19}{'speedup':>9}{'per save us':>13}")
+    for test_name in args.tests:
+        records = make_history(test_name, args.records, args.seed)
+        validate_record(test_name, records[0])  # compile outside the measurement
+
+        start = time.perf_counter()
+        problems = validate_records(test_name, records)
+        compiled_s = time.perf_counter() - start
+        assert not problems, problems[:3]
+
+        start = time.perf_counter()
+        assert all(interpret(SCHEMAS[test_name], record, SCHEMA_VERSION) for record in records)
+        interpreted_s = time.perf_counter() - start
+
+        # One record at a time, as on save
+        sample = records[:1000]
+        start = time.perf_counter()
+        for record in sample:
+            validate_record(test_name, record)
+        per_save_us = (time.perf_counter() - start) / len(sample) * 1e6
+
+        print(f"{test_name:<12}{len(records):>9}{len(records) / compiled_s:>16.0f}"
+              f"{len(records) / interpreted_s:>19.0f}{interpreted_s / compiled_s:>8.1f}x{per_save_us:>13.1f}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+"""Benchmark: rescoring a history with the memoized, versioned scorers
+
+Seeds sealed synthetic PVT, DSST and digit span histories and times a full
+rescore with an empty memo (in this process and across a process pool),
+again with a warm memo, and after bumping the digit span scorer's version,
+when only the digit span records are scored again.
+
+    python benchmarks/bench_scoring.py --records 20000 --workers 4
+"""
+import sys
+import time
+import random
+import shutil
+import argparse
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bench_data_manager import RECORD_MAKERS
+from integrity import seal_record
+import scoring
+
+class MemoryRecords:
+    """The part of DataManager that ScoreCache uses, serving records from memory"""
+
+    def __init__(self, data_dir, records):
+        self.data_dir = Path(data_dir)
+        self.records = records
+
+    def load_test_data(self, test_name):
+        return self.records[test_name]
+
+def make_history(test_name, size, rng):
+    records = []
+    for i in range(size):
+        record = RECORD_MAKERS[test_name](rng, i)
+        if test_name == "digit_span" and i % 2:
+            # Every other session from the adaptive staircase, whose replay is the costly part of scoring
+            record.update(procedure="adaptive", forward_span_prior=[6.5, 2.0], backward_span_prior=[5.0, 2.0])
+        records.append(seal_record(record, records[-1] if records else None))
+    return records
+
+def timed_rescore(data_manager, workers):
+    cache = scoring.ScoreCache(data_manager, workers=workers)
+    start = time.perf_counter()
+    results = cache.rescore(list(data_manager.records))
+    scored = {test_name: computed for test_name, (_, _, computed, _) in results.items()}
+    return time.perf_counter() - start, scored
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=20000, help="records per test")
+    parser.add_argument("--workers", type=int, default=None, help="pool size (default: all cores)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    records = {test_name: make_history(test_name, args.records, rng) for test_name in RECORD_MAKERS}
+    total = sum(len(test_records) for test_records in records.values())
+    data_dir = tempfile.mkdtemp(prefix="vigila-bench-")
+    try:
+        data_manager = MemoryRecords(data_dir, records)
+        runs = []
+        for label, workers, fresh in (("cold, 1 process", 1, True), ("cold, pool", args.workers, True),
+                                      ("warm memo", args.workers, False)):
+            if fresh:
+                (data_manager.data_dir / scoring.SCORE_CACHE_FILE).unlink(missing_ok=True)
+            runs.append((label,) + timed_rescore(data_manager, workers))
+
+        version, scorer = scoring.SCORERS["digit_span"]
+        scoring.SCORERS["digit_span"] = (version + 1, scorer)
+        runs.append(("digit span v+1",) + timed_rescore(data_manager, args.workers))
+    finally:
+        shutil.rmtree(data_dir)
+
+    print(f"{total} records ({args.records} each of {', '.join(records)})")
+    print(f"{'run':<18}{'seconds':>9}{'scored':>9}{'records/s':>12}")
+    for label, seconds, scored in runs:
+        print(f"{label:<18}{seconds:>9.2f}{sum(scored.values()):>9}{total / seconds:>12.0f}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+"""Benchmark: loading PVT trials from the JSON records vs the memory-mapped trial store
+
+Seeds a synthetic PVT history (10 trials per session) and, in a fresh
+subprocess per path, measures the time to get the reaction times of all
+correct trials into a NumPy array and the peak RSS afterwards. The JSON path
+parses pvt.json and collects all_responses; the trial store path maps
+pvt.trials as a structured array and selects from it without copying the file.
+
+    python benchmarks/bench_trial_store.py --sessions 10000 50000
+"""
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+
+from bench_data_manager import make_pvt, _peak_rss_mb
+from trial_store import open_trials, update_trial_store, trial_store_path, PVT_KINDS
+
+def load_json(data_dir):
+    with open(Path(data_dir) / "pvt.json", 'r') as f:
+        records = json.load(f)
+    return np.array([response["reaction_time_ms"] for record in records
+                     for response in record["all_responses"] if response["type"] == "correct"])
+
+def load_trial_store(data_dir):
+    trials = open_trials(Path(data_dir), "pvt")
+    return trials["value_ms"][trials["kind"] == PVT_KINDS["correct"]]
+
+LOADERS = {"json": load_json, "trials": load_trial_store}
+
+def measure(path_name, data_dir):
+    """Runs in a fresh subprocess, so RSS only reflects this load"""
+    baseline_rss = _peak_rss_mb()
+    start = time.perf_counter()
+    reaction_times = LOADERS[path_name](data_dir)
+    mean = float(reaction_times.mean())
+    load_s = time.perf_counter() - start
+    return {"trials": len(reaction_times), "mean_rt_ms": mean, "load_s": load_s,
+            "baseline_rss_mb": baseline_rss, "peak_rss_mb": _peak_rss_mb()}
+
+def run_size(sessions, seed):
+    rng = random.Random(seed)
+    data_dir = tempfile.mkdtemp(prefix="vigila-bench-")
+    try:
+        records = [make_pvt(rng, i) for i in range(sessions)]
+        with open(Path(data_dir) / "pvt.json", 'w') as f:
+            json.dump(records, f, indent=2)
+        update_trial_store(Path(data_dir), "pvt", records)
+        del records
+
+        sizes = {"json": (Path(data_dir) / "pvt.json").stat().st_size,
+                 "trials": trial_store_path(Path(data_dir), "pvt").stat().st_size}
+        results = {}
+        for path_name in LOADERS:
+            worker = subprocess.run([sys.executable, __file__, "--worker", path_name, data_dir],
+                                    capture_output=True, text=True, check=True)
+            results[path_name] = {**json.loads(worker.stdout.strip().splitlines()[-1]),
+                                  "size_mb": sizes[path_name] / 1e6}
+        return results
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, nargs="+", default=[10000, 50000])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--worker", nargs=2, metavar=("PATH", "DATA_DIR"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        print(json.dumps(measure(*args.worker)))
+        return 0
+
+    print(f"{'path':<8}{'trials':>9}{'file MB':>9}{'load s':>9}{'RSS MB':>9}{'+RSS MB':>9}{'mean RT':>9}")
+    for sessions in args.sessions:
+        results = run_size(sessions, args.seed)
+        for path_name, r in results.items():
+            print(f"{path_name:<8}{r['trials']:>9}{r['size_mb']:>9.1f}{r['load_s']:>9.3f}{r['peak_rss_mb']:>9.1f}"
+                  f"{r['peak_rss_mb'] - r['baseline_rss_mb']:>9.1f}{r['mean_rt_ms']:>9.1f}")
+        print(f"speedup {results['json']['load_s'] / results['trials']['load_s']:.0f}x\n")
+    print("+RSS is the peak resident memory added by the load; the mean RT must match between paths.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,145 @@
+import time
+import random
+import platform
+import threading
+import pygame
+from datetime import datetime
+from data_manager import DataManager, get_runtime_info
+from assets import get_font
+from latency_profile import machine_id, current_profile_key, save_profile, summarize
+
+class LatencyCalibration:
+    """Measures the software part of the PVT's input and display pipeline
+
+    Synthetic SPACE presses are posted to SDL's event queue from a background
+    thread at random moments, while a loop built like the PVT's (event
+    handling, drawing, flip, 60 FPS tick) handles them. Two delays are
+    measured: from posting an event until its handler runs, and from
+    deciding to show a stimulus until the flip showing it returns. Their
+    medians add up to the correction subtracted from PVT reaction times.
+    Keyboard scanning and display scan-out happen outside the software and
+    are not included.
+    """
+
+    def __init__(self, screen, font, data_manager=None, samples=100):
+        self.screen = screen
+        self.font = font
+        self.data_manager = data_manager or DataManager()
+        self.small_font = get_font(24)
+        self.samples = samples
+        self.running = True
+        self.queue_to_handler_ms = []
+        self.handler_to_flip_ms = []
+
+        # Colors
+        self.WHITE = (255, 255, 255)
+        self.BLACK = (0, 0, 0)
+        self.RED = (255, 0, 0)
+        self.GRAY = (128, 128, 128)
+
+    def inject_events(self, stop):
+        for _ in range(self.samples):
+            if stop.wait(random.uniform(0.05, 0.2)):
+                return
+            pygame.event.post(pygame.event.Event(pygame.KEYDOWN, key=pygame.K_SPACE,
+                                                 posted=time.perf_counter(), synthetic=True))
+
+    def run(self):
+        stop = threading.Event()
+        injector = threading.Thread(target=self.inject_events, args=(stop,), name="latency-injector", daemon=True)
+        injector.start()
+        try:
+            self.measure()
+        finally:
+            stop.set()
+            injector.join()
+
+        if not self.running:
+            print("Latency calibration cancelled")
+            return None
+        return self.save_profile()
+
+    def measure(self):
+        clock = pygame.time.Clock()
+        next_stimulus = time.perf_counter() + random.uniform(0.05, 0.2)
+        stimulus_time = None
+        stimulus_visible = False
+
+        while len(self.queue_to_handler_ms) < self.samples or len(self.handler_to_flip_ms) < self.samples:
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    self.running = False
+                    return
+                elif event.type == pygame.KEYDOWN:
+                    if getattr(event, "synthetic", False):
+                        self.queue_to_handler_ms.append((time.perf_counter() - event.posted) * 1000)
+                    elif event.key == pygame.K_ESCAPE:
+                        self.running = False
+                        return
+
+            # Same decision point as the PVT's stimulus onset
+            now = time.perf_counter()
+            if len(self.handler_to_flip_ms) < self.samples and now >= next_stimulus:
+                stimulus_time = now
+                stimulus_visible = not stimulus_visible
+                next_stimulus = now + random.uniform(0.05, 0.2)
+
+            self.draw(stimulus_visible)
+            pygame.display.flip()
+            if stimulus_time is not None:
+                self.handler_to_flip_ms.append((time.perf_counter() - stimulus_time) * 1000)
+                stimulus_time = None
+            clock.tick(60)
+
+    def save_profile(self):
+        queue = summarize(self.queue_to_handler_ms)
+        flip = summarize(self.handler_to_flip_ms)
+        display = get_runtime_info("display") or {}
+        profile = {
+            "key": current_profile_key(),
+            "machine": get_runtime_info("machine") or machine_id(),
+            "platform": platform.platform(),
+            "display": display,
+            "created": datetime.now().isoformat(),
+            "queue_to_handler_ms": queue,
+            "handler_to_flip_ms": flip,
+            "correction_ms": queue["median"] + flip["median"]
+        }
+
+        try:
+            save_profile(self.data_manager, profile)
+            print(f"Latency calibration saved for {profile['key']}: "
+                  f"queue->handler {queue['median']:.2f}ms, handler->flip {flip['median']:.2f}ms")
+        except OSError as e:
+            print(f"Error saving latency calibration: {e}")
+        return profile
+
+    def draw(self, stimulus_visible):
+        self.screen.fill(self.WHITE)
+
+        title_text = self.font.render("Latency Calibration", True, self.BLACK)
+        title_rect = title_text.get_rect()
+        title_rect.centerx = self.screen.get_width() // 2
+        title_rect.y = 50
+        self.screen.blit(title_text, title_rect)
+
+        lines = [
+            "Measuring input and display delay, please don't press any keys",
+            f"Events: {len(self.queue_to_handler_ms)}/{self.samples}   Frames: {len(self.handler_to_flip_ms)}/{self.samples}",
+            "ESC to cancel"
+        ]
+        for i, line in enumerate(lines):
+            text = self.small_font.render(line, True, self.GRAY)
+            text_rect = text.get_rect()
+            text_rect.centerx = self.screen.get_width() // 2
+            text_rect.y = 120 + i * 30
+            self.screen.blit(text, text_rect)
+
+        # Same stimulus the PVT draws, toggled at every measured onset
+        if stimulus_visible:
+            pygame.draw.circle(self.screen, self.RED,
+                               (self.screen.get_width() // 2, self.screen.get_height() // 2), 50)
+
+def run_latency_calibration(screen, font, data_manager=None, samples=100):
+    calibration = LatencyCalibration(screen, font, data_manager, samples)
+    return calibration.run()
@@ -0,0 +1,136 @@
+import re
+import sys
+import json
+import gzip
+import argparse
+import threading
+from pathlib import Path
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from data_manager import TEST_NAMES
+
+# Client ids become directory names, so only plain names are accepted
+_CLIENT_ID = re.compile(r"[A-Za-z0-9_-]+")
+
+class UploadGap(Exception):
+    """Raised when a batch starts past the records the collector holds"""
+
+    def __init__(self, held):
+        super().__init__(f"Gap in upload: collector holds {held} records")
+        self.held = held
+
+class RecordStore:
+    """Append-only per-client, per-test JSON lines files"""
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def _path(self, client_id, test_name):
+        return self.directory / client_id / f"{test_name}.jsonl"
+
+    def count(self, client_id, test_name):
+        key = (client_id, test_name)
+        if key not in self._counts:
+            path = self._path(client_id, test_name)
+            if path.exists():
+                with open(path, 'rb') as f:
+                    self._counts[key] = sum(1 for _ in f)
+            else:
+                self._counts[key] = 0
+        return self._counts[key]
+
+    def append(self, client_id, test_name, start, records):
+        """Store records beginning at offset start, skipping ones already held
+
+        Returns (records now held, records newly stored).
+        """
+        with self._lock:
+            held = self.count(client_id, test_name)
+            if start > held:
+                raise UploadGap(held)
+
+            new_records = records[held - start:]
+            if new_records:
+                path = self._path(client_id, test_name)
+                path.parent.mkdir(parents=True, exist_ok=True)
+                with open(path, 'a') as f:
+                    for record in new_records:
+                        f.write(json.dumps(record) + "\n")
+            self._counts[(client_id, test_name)] = held + len(new_records)
+            return held + len(new_records), len(new_records)
+
+class CollectorHandler(BaseHTTPRequestHandler):
+    # Keep-alive, so one client connection carries all of its batches
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        if self.path.rstrip("/").split("/")[-1] != "upload":
+            self._reply(404, {"error": "not found"})
+            return
+
+        try:
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if self.headers.get("Content-Encoding") == "gzip":
+                body = gzip.decompress(body)
+            batch = json.loads(body)
+            client_id, test_name = batch["client_id"], batch["test_name"]
+            if not isinstance(client_id, str) or not _CLIENT_ID.fullmatch(client_id):
+                raise ValueError(f"Invalid client id {client_id!r}")
+            if test_name not in TEST_NAMES:
+                raise ValueError(f"Unknown test {test_name!r}")
+            start, records = batch["start"], batch["records"]
+            if type(start) is not int or start < 0:
+                raise ValueError(f"Invalid start offset {start!r}")
+            if not isinstance(records, list):
+                raise ValueError("Records must be a list")
+            next_offset, stored = self.server.store.append(client_id, test_name, start, records)
+        except UploadGap as e:
+            # Tell the client where to resume instead of failing the sync
+            self._reply(409, {"error": str(e), "next": e.held})
+            return
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            self._reply(400, {"error": str(e)})
+            return
+
+        self._reply(200, {"next": next_offset, "stored": stored})
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+def make_collector(directory, host="127.0.0.1", port=8750, quiet=False):
+    """Create a collector server; port 0 picks a free port (see server.server_address)"""
+    server = ThreadingHTTPServer((host, port), CollectorHandler)
+    server.store = RecordStore(directory)
+    server.quiet = quiet
+    return server
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Minimal collector receiving uploads from sync.py")
+    parser.add_argument("directory", help="where received records are stored")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8750)
+    args = parser.parse_args(argv)
+
+    server = make_collector(args.directory, args.host, args.port)
+    print(f"Collecting into {args.directory} on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
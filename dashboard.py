@@ -0,0 +1,192 @@
+import time
+import threading
+import pygame
+from datetime import datetime
+from data_manager import DataManager
+from assets import get_font
+from series import SeriesCache, SERIES_METRICS, ZOOM_LEVELS, group_color
+
+def _format_value(value):
+    return f"{value:.0f}" if abs(value) >= 100 or value == int(value) else f"{value:.1f}"
+
+class Dashboard:
+    """Charts of the session-level metrics over time, split by condition and time of day
+
+    The charts draw from SeriesCache's downsampled series, never from the raw
+    history, and are rendered to a surface once per zoom level and data
+    update; the frame loop only blits that surface. The cache is brought up
+    to date on a background thread, showing the cached series meanwhile.
+    """
+
+    def __init__(self, screen, font, data_manager=None):
+        self.screen = screen
+        self.font = font
+        self.data_manager = data_manager or DataManager()
+        self.small_font = get_font(20)
+        self.tiny_font = get_font(16)
+        self.cache = SeriesCache(self.data_manager)
+        self.state = self.cache.load()
+        self.zoom = 0
+        self.charts = {}
+        self.status = "Updating..."
+        self.frame_ms = 0.0
+        self._updated = None
+
+        # Colors
+        self.WHITE = (255, 255, 255)
+        self.BLACK = (0, 0, 0)
+        self.GRAY = (128, 128, 128)
+        self.LIGHT_GRAY = (225, 225, 225)
+        self.BLUE = (70, 130, 180)
+
+        # Layout: zoom tabs under the title, then a 3 x 2 grid of charts
+        width = self.screen.get_width()
+        self.tab_rects = [pygame.Rect(width // 2 - 2 * 100 + i * 100, 60, 90, 26) for i in range(len(ZOOM_LEVELS))]
+        margin, columns, rows = 20, 3, 2
+        chart_width = (width - (columns + 1) * margin) // columns
+        chart_height = 210
+        self.chart_rects = [pygame.Rect(margin + (i % columns) * (chart_width + margin),
+                                        100 + (i // columns) * (chart_height + margin),
+                                        chart_width, chart_height)
+                            for i in range(columns * rows)]
+
+    def update_series(self):
+        try:
+            self._updated = self.cache.update()
+        except OSError as e:
+            self.status = f"Update failed: {e}"
+
+    def run(self):
+        updater = threading.Thread(target=self.update_series, name="dashboard-series", daemon=True)
+        updater.start()
+        clock = pygame.time.Clock()
+
+        while True:
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    return
+                elif event.type == pygame.KEYDOWN:
+                    if event.key == pygame.K_ESCAPE:
+                        return
+                    elif event.key == pygame.K_LEFT:
+                        self.zoom = (self.zoom - 1) % len(ZOOM_LEVELS)
+                    elif event.key == pygame.K_RIGHT:
+                        self.zoom = (self.zoom + 1) % len(ZOOM_LEVELS)
+                    elif pygame.K_1 <= event.key < pygame.K_1 + len(ZOOM_LEVELS):
+                        self.zoom = event.key - pygame.K_1
+                elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+                    for i, rect in enumerate(self.tab_rects):
+                        if rect.collidepoint(event.pos):
+                            self.zoom = i
+
+            if self._updated is not None:
+                self.state, self._updated = self._updated, None
+                self.charts = {}
+            if not updater.is_alive() and self.status == "Updating...":
+                self.status = ""
+
+            start = time.perf_counter()
+            self.draw()
+            self.frame_ms = (time.perf_counter() - start) * 1000
+            pygame.display.flip()
+            clock.tick(60)
+
+    def render_charts(self, zoom):
+        """One surface holding every chart of a zoom level"""
+        surface = pygame.Surface(self.screen.get_size(), pygame.SRCALPHA)
+        label, days = ZOOM_LEVELS[zoom]
+        level = self.state["levels"].get(label, {})
+
+        # All charts of a zoom level share the time axis, ending at the latest session
+        points = [point for groups in level.values() for series in groups.values() for point in series]
+        if points:
+            end = max(x for x, _ in points)
+            start = end - days * 86400 if days else min(x for x, _ in points)
+        for (metric, metric_label, _), rect in zip(SERIES_METRICS, self.chart_rects):
+            groups = level.get(metric, {})
+            latest = self.state["latest"].get(metric)
+            title = f"{metric_label}: {_format_value(latest[1])}" if latest else metric_label
+            if not points or not any(groups.values()):
+                plot = self.draw_chart_frame(surface, rect, title)
+                text = self.tiny_font.render("No sessions in this range", True, self.GRAY)
+                surface.blit(text, text.get_rect(center=plot.center))
+                continue
+            self.draw_chart(surface, rect, title, groups, start, end)
+        return surface
+
+    def draw_chart_frame(self, surface, rect, title):
+        pygame.draw.rect(surface, self.LIGHT_GRAY, rect, 1)
+        title_text = self.small_font.render(title, True, self.BLACK)
+        surface.blit(title_text, (rect.x + 6, rect.y + 4))
+        return pygame.Rect(rect.x + 40, rect.y + 28, rect.width - 48, rect.height - 50)
+
+    def draw_chart(self, surface, rect, title, groups, start, end):
+        plot = self.draw_chart_frame(surface, rect, title)
+        values = [y for series in groups.values() for _, y in series]
+        low, high = min(values), max(values)
+        if high == low:
+            low, high = low - 1, high + 1
+        span_x = max(end - start, 1.0)
+
+        def position(x, y):
+            return (plot.x + (x - start) / span_x * plot.width,
+                    plot.bottom - (y - low) / (high - low) * plot.height)
+
+        pygame.draw.line(surface, self.GRAY, plot.bottomleft, plot.bottomright)
+        pygame.draw.line(surface, self.GRAY, plot.bottomleft, plot.topleft)
+        for value, y in ((high, plot.top), (low, plot.bottom)):
+            text = self.tiny_font.render(_format_value(value), True, self.GRAY)
+            surface.blit(text, text.get_rect(right=plot.x - 4, centery=y))
+        for x, anchor in ((start, "left"), (end, "right")):
+            text = self.tiny_font.render(datetime.fromtimestamp(x).strftime("%m-%d"), True, self.GRAY)
+            surface.blit(text, text.get_rect(top=plot.bottom + 2, **{anchor: getattr(plot, anchor)}))
+
+        for group, series in sorted(groups.items()):
+            coordinates = [position(x, y) for x, y in series]
+            color = group_color(group)
+            if len(coordinates) > 1:
+                pygame.draw.lines(surface, color, False, coordinates, 2)
+            for coordinate in coordinates[-1:] if len(coordinates) > 1 else coordinates:
+                pygame.draw.circle(surface, color, coordinate, 3)
+
+    def draw(self):
+        self.screen.fill(self.WHITE)
+
+        title_text = self.font.render("Dashboard", True, self.BLACK)
+        title_rect = title_text.get_rect()
+        title_rect.centerx = self.screen.get_width() // 2
+        title_rect.y = 15
+        self.screen.blit(title_text, title_rect)
+
+        for i, ((label, _), rect) in enumerate(zip(ZOOM_LEVELS, self.tab_rects)):
+            selected = i == self.zoom
+            pygame.draw.rect(self.screen, self.BLUE if selected else self.LIGHT_GRAY, rect)
+            text = self.small_font.render(label, True, self.WHITE if selected else self.BLACK)
+            self.screen.blit(text, text.get_rect(center=rect.center))
+
+        if self.state is None:
+            text = self.small_font.render("No sessions yet" if not self.status else "Loading...", True, self.GRAY)
+            self.screen.blit(text, text.get_rect(center=(self.screen.get_width() // 2, 300)))
+        else:
+            if self.zoom not in self.charts:
+                self.charts[self.zoom] = self.render_charts(self.zoom)
+            self.screen.blit(self.charts[self.zoom], (0, 0))
+            self.draw_legend()
+
+        footer = f"{self.status}   " if self.status else ""
+        footer += f"Left/Right or 1-{len(ZOOM_LEVELS)} to zoom, ESC to return   frame {self.frame_ms:.1f}ms"
+        text = self.tiny_font.render(footer, True, self.GRAY)
+        self.screen.blit(text, text.get_rect(centerx=self.screen.get_width() // 2, y=578))
+
+    def draw_legend(self):
+        groups = sorted({group for groups in self.state["raw"].values() for group in groups})
+        x = 20
+        for group in groups:
+            pygame.draw.line(self.screen, group_color(group), (x, 560), (x + 20, 560), 3)
+            text = self.tiny_font.render(group, True, self.BLACK)
+            self.screen.blit(text, text.get_rect(x=x + 26, centery=560))
+            x += 26 + text.get_width() + 20
+
+def run_dashboard(screen, font, data_manager=None):
+    dashboard = Dashboard(screen, font, data_manager)
+    dashboard.run()
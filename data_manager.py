@@ -1,13 +1,50 @@
 import os
+import re
 import json
 from pathlib import Path
 from datetime import datetime
+from session import SessionContext, session_key, parse_session_key, default_slot
+from trial_store import update_trial_store
+from integrity import seal_record
+from schemas import SCHEMAS, SCHEMA_VERSION, SchemaError, validate_record, validate_records
+
+# Data file names of all tests, in menu order
+TEST_NAMES = ("pvt", "dsst", "digit_span", "sss", "feelings", "time_perception")
+
+SESSION_FILE = "session.json"
+SESSION_INDEX_FILE = "session_index.json"
+
+# Records that failed validation on save are kept here, one JSON object per line
+REJECTED_SUFFIX = ".rejected.jsonl"
+
+# Whitespace and commas between the records of a JSON array
+_SEPARATORS = re.compile(r"[\s,]*")
+
+# Facts about the running process (e.g. the display mode), stamped into every record
+_runtime_info = {}
+
+def set_runtime_info(key, value):
+    """Stamp value under key into the 'runtime' field of every record this process saves"""
+    _runtime_info[key] = value
+
+def get_runtime_info(key):
+    return _runtime_info.get(key)
 
 class DataManager:
     """Manages data directory creation and file operations for psychological tests"""
     
-    def __init__(self):
-        self.data_dir = self._get_data_directory()
+    def __init__(self, data_dir=None):
+        # data_dir overrides the platform default, e.g. for benchmarks
+        self.data_dir = Path(data_dir) if data_dir else self._get_data_directory()
+        # Offset and content of the most recently saved record, for incremental indexes
+        self.last_saved_offset = None
+        self.last_saved_record = None
+        self.last_commit_bytes = 0
+        self._batch = None
+        self._batch_id = None
+        self._prefetched = {}
+        # Records per test already validated on load by this process
+        self._validated = {}
     
     def _get_data_directory(self):
         """Get appropriate data directory for the platform"""
@@ -36,36 +73,373 @@ class DataManager:
         return None
     
     def save_test_data(self, test_name, data):
-        """Save test data to JSON file, appending to existing data"""
+        """Save test data to JSON file, appending to existing data
+
+        Inside begin_batch()/commit_batch() the record is only buffered and
+        written together with the rest of the batch.
+        """
         filename = f"{test_name}.json"
         filepath = self.data_dir / filename
         
         # Add timestamp to the data
+        now = datetime.now()
         data_with_timestamp = {
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": now.isoformat(),
             **data
         }
+        if test_name in SCHEMAS:
+            data_with_timestamp["schema_version"] = SCHEMA_VERSION
+
+        # Stamp the protocol position set from the main menu today
+        session = self.get_session_context(now)
+        if session is not None:
+            data_with_timestamp["session"] = session.to_dict()
+
+        if _runtime_info:
+            data_with_timestamp["runtime"] = dict(_runtime_info)
+
+        error = validate_record(test_name, data_with_timestamp)
+        if error is not None:
+            self._reject(test_name, data_with_timestamp, error)
+
+        if self._batch is not None:
+            data_with_timestamp["battery_id"] = self._batch_id
+            self._batch.append((test_name, data_with_timestamp))
+            self.last_saved_offset = None
+            self.last_saved_record = data_with_timestamp
+            return str(filepath)
         
         try:
             # Read existing data if file exists
-            existing_data = []
-            if filepath.exists():
-                with open(filepath, 'r') as f:
-                    existing_data = json.load(f)
+            existing_data = self._read_records(test_name)
             
-            # Append new data
+            # Append new data, chained to the record before it
+            seal_record(data_with_timestamp, existing_data[-1] if existing_data else None)
             existing_data.append(data_with_timestamp)
             
             # Write back to file
-            with open(filepath, 'w') as f:
-                json.dump(existing_data, f, indent=2)
-            
-            return str(filepath)
+            self._write_records(filepath, existing_data)
+            os.replace(self._temp_path(filepath), filepath)
         except OSError as e:
             raise OSError(f"Error saving data to '{filepath}': {e}")
         except json.JSONDecodeError as e:
             raise OSError(f"Error reading existing data from '{filepath}': {e}")
-    
+
+        self.last_saved_offset = len(existing_data) - 1
+        self.last_saved_record = data_with_timestamp
+        self._update_derived(test_name, existing_data)
+        return str(filepath)
+
+    def _update_derived(self, test_name, records):
+        """Bring the session index and trial store up to date with records already saved
+
+        Both remember how many records they cover and catch up on the next
+        save, so a failure is reported rather than raised: the save itself
+        succeeded, and raising would make callers save the records again.
+        """
+        try:
+            self._update_session_index(test_name, records)
+        except Exception as e:
+            print(f"Could not update the session index for '{test_name}': {e}")
+        try:
+            update_trial_store(self.data_dir, test_name, records)
+        except Exception as e:
+            print(f"Could not update the trial store for '{test_name}': {e}; "
+                  f"'python trial_store.py rebuild' recreates it")
+
+    def _reject(self, test_name, record, error):
+        """Keep a record that does not match its schema out of the data file, without losing it"""
+        filepath = self.data_dir / f"{test_name}{REJECTED_SUFFIX}"
+        try:
+            with open(filepath, 'a') as f:
+                f.write(json.dumps({"error": error, "record": record}) + "\n")
+        except OSError as e:
+            raise OSError(f"Error saving rejected record to '{filepath}': {e}")
+        raise SchemaError(f"Record for '{test_name}' does not match schema version {SCHEMA_VERSION} "
+                          f"({error}); kept in '{filepath}'")
+
+    def _temp_path(self, filepath):
+        return filepath.with_name(filepath.name + ".tmp")
+
+    def _read_records(self, test_name):
+        """Read a test's records, reusing a prefetched copy if the file is unchanged"""
+        filepath = self.data_dir / f"{test_name}.json"
+        if not filepath.exists():
+            return []
+
+        stat = filepath.stat()
+        prefetched = self._prefetched.pop(test_name, None)
+        if prefetched is not None and prefetched[0] == (stat.st_mtime_ns, stat.st_size):
+            return prefetched[1]
+
+        with open(filepath, 'r') as f:
+            return json.load(f)
+
+    def _write_records(self, filepath, records):
+        """Write records to a temporary file next to filepath; returns the bytes written
+
+        The caller renames it over filepath, so readers never see a half-written file.
+        """
+        temp_path = self._temp_path(filepath)
+        with open(temp_path, 'w') as f:
+            json.dump(records, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+            return f.tell()
+
+    def prefetch(self, test_names):
+        """Load existing records ahead of a later save or batch commit (safe to call from a worker thread)"""
+        for test_name in test_names:
+            filepath = self.data_dir / f"{test_name}.json"
+            try:
+                if filepath.exists():
+                    stat = filepath.stat()
+                    with open(filepath, 'r') as f:
+                        self._prefetched[test_name] = ((stat.st_mtime_ns, stat.st_size), json.load(f))
+            except (OSError, json.JSONDecodeError):
+                pass  # The regular read path reports the error
+
+    def begin_batch(self, batch_id):
+        """Buffer following saves until commit_batch, tagging each record with batch_id"""
+        self._batch = []
+        self._batch_id = batch_id
+
+    def in_batch(self):
+        """Whether saves are currently buffered until commit_batch"""
+        return self._batch is not None
+
+    def commit_batch(self):
+        """Write all buffered records with one rewrite per test file
+
+        Every affected file is fully written to a temporary file before any of
+        them replaces its original. Returns {test_name: (first_offset, records)}
+        for the records that were appended.
+        """
+        batch, self._batch = self._batch or [], None
+        grouped = {}
+        for test_name, record in batch:
+            grouped.setdefault(test_name, []).append(record)
+
+        self.last_commit_bytes = 0
+        written = {}
+        try:
+            for test_name, new_records in grouped.items():
+                filepath = self.data_dir / f"{test_name}.json"
+                records = self._read_records(test_name)
+                first_offset = len(records)
+                for record in new_records:
+                    seal_record(record, records[-1] if records else None)
+                    records.append(record)
+                self.last_commit_bytes += self._write_records(filepath, records)
+                written[test_name] = (filepath, first_offset, records)
+
+            for filepath, _, _ in written.values():
+                os.replace(self._temp_path(filepath), filepath)
+        except OSError as e:
+            for filepath, _, _ in written.values():
+                self._temp_path(filepath).unlink(missing_ok=True)
+            raise OSError(f"Error committing batch {self._batch_id}: {e}")
+        except json.JSONDecodeError as e:
+            raise OSError(f"Error reading existing data while committing batch {self._batch_id}: {e}")
+
+        committed = {}
+        for test_name, (filepath, first_offset, records) in written.items():
+            self._update_derived(test_name, records)
+            committed[test_name] = (first_offset, records[first_offset:])
+        return committed
+
+    def load_test_data(self, test_name, validate=True):
+        """Load all saved records for a test, or an empty list if none exist
+
+        Records not yet validated by this process are checked against their
+        schema versions; invalid ones are reported but still returned.
+        """
+        filepath = self.data_dir / f"{test_name}.json"
+        try:
+            records = self._read_records(test_name)
+            if validate:
+                self._validate_loaded(test_name, records)
+            return records
+        except OSError as e:
+            raise OSError(f"Error loading data from '{filepath}': {e}")
+        except json.JSONDecodeError as e:
+            raise OSError(f"Error reading existing data from '{filepath}': {e}")
+
+    def _validate_loaded(self, test_name, records):
+        validated = self._validated.get(test_name, 0)
+        if validated > len(records):
+            # The file shrank, so earlier offsets may hold other records now
+            validated = 0
+        problems = validate_records(test_name, records, validated)
+        self._validated[test_name] = len(records)
+        if problems:
+            offset, error = problems[0]
+            print(f"{len(problems)} {test_name} records do not match their schema, "
+                  f"e.g. record {offset}: {error}; run 'python schemas.py' for all")
+
+    def iter_records(self, test_name, start=0, batch_size=500, chunk_size=1 << 20):
+        """Stream a test's saved records in batches, beginning at offset start
+
+        Yields (offset of the first record in the batch, records). The file is
+        decoded chunk by chunk, so only one chunk and one batch are in memory
+        at a time, whatever the size of the history.
+        """
+        filepath = self.data_dir / f"{test_name}.json"
+        if not filepath.exists():
+            return
+
+        decoder = json.JSONDecoder()
+        try:
+            with open(filepath, 'r') as f:
+                buffer = f.read(chunk_size).lstrip()
+                if not buffer.startswith("["):
+                    raise OSError("not a JSON array")
+                pos = 1
+                offset = 0
+                batch = []
+                at_end = False
+                while True:
+                    pos = _SEPARATORS.match(buffer, pos).end()
+                    if pos < len(buffer) and buffer[pos] == "]":
+                        break
+                    try:
+                        if pos == len(buffer):
+                            raise json.JSONDecodeError("incomplete record", buffer, pos)
+                        record, pos = decoder.raw_decode(buffer, pos)
+                    except json.JSONDecodeError:
+                        if at_end:
+                            raise
+                        # The record continues in the next chunk
+                        more = f.read(chunk_size)
+                        at_end = not more
+                        buffer = buffer[pos:] + more
+                        pos = 0
+                        continue
+
+                    if offset >= start:
+                        batch.append(record)
+                        if len(batch) == batch_size:
+                            yield offset - len(batch) + 1, batch
+                            batch = []
+                    offset += 1
+                if batch:
+                    yield offset - len(batch), batch
+        except OSError as e:
+            raise OSError(f"Error loading data from '{filepath}': {e}")
+        except json.JSONDecodeError as e:
+            raise OSError(f"Error reading existing data from '{filepath}': {e}")
+
+    def get_session_context(self, now=None, current_only=True):
+        """Load the session context set today, or None if none has been set
+
+        The slot follows the time of day of now instead of being saved, and
+        a context set on an earlier date is ignored unless current_only is
+        False, so a context nobody updated never stamps records with a day
+        or slot that has passed.
+        """
+        filepath = self.data_dir / SESSION_FILE
+        if not filepath.exists():
+            return None
+
+        now = now or datetime.now()
+        try:
+            with open(filepath, 'r') as f:
+                session = SessionContext.from_dict({**json.load(f), "slot": default_slot(now)})
+            if current_only and not session.is_current(now):
+                return None
+            return session
+        except (OSError, json.JSONDecodeError, KeyError, TypeError, ValueError) as e:
+            print(f"Ignoring unreadable session context '{filepath}': {e}")
+            return None
+
+    def set_session_context(self, session):
+        """Persist the session context that gets stamped onto records saved the same day"""
+        filepath = self.data_dir / SESSION_FILE
+        # The slot is derived from the time of each save
+        persisted = {key: value for key, value in session.to_dict().items() if key != "slot"}
+        try:
+            with open(filepath, 'w') as f:
+                json.dump(persisted, f, indent=2)
+        except OSError as e:
+            raise OSError(f"Error saving session context to '{filepath}': {e}")
+
+    def _load_session_index(self):
+        filepath = self.data_dir / SESSION_INDEX_FILE
+        if filepath.exists():
+            try:
+                with open(filepath, 'r') as f:
+                    return json.load(f)
+            except (OSError, json.JSONDecodeError):
+                pass  # Rebuilt from the records below
+        return {"counts": {}, "groups": {}}
+
+    def _write_session_index(self, index):
+        filepath = self.data_dir / SESSION_INDEX_FILE
+        try:
+            with open(filepath, 'w') as f:
+                json.dump(index, f)
+        except OSError as e:
+            raise OSError(f"Error saving session index to '{filepath}': {e}")
+
+    def _index_records(self, index, test_name, records, start):
+        for offset in range(start, len(records)):
+            session = records[offset].get("session")
+            if session is None:
+                continue
+            key = session_key(session["block_id"], session["day"], session["slot"])
+            index["groups"].setdefault(key, {}).setdefault(test_name, []).append(offset)
+        index["counts"][test_name] = len(records)
+
+    def _update_session_index(self, test_name, records):
+        """Add newly appended records of a test to the block x day x slot index"""
+        index = self._load_session_index()
+        indexed = index["counts"].get(test_name, 0)
+
+        if indexed > len(records) - 1:
+            # The file was edited behind our back; reindex this test from scratch
+            self._drop_from_index(index, test_name)
+            indexed = 0
+
+        self._index_records(index, test_name, records, indexed)
+        self._write_session_index(index)
+
+    def _drop_from_index(self, index, test_name):
+        for tests in index["groups"].values():
+            tests.pop(test_name, None)
+        index["groups"] = {key: tests for key, tests in index["groups"].items() if tests}
+        index["counts"].pop(test_name, None)
+
+    def rebuild_session_index(self, test_names):
+        """Rebuild the session index entries of the given tests from their saved records"""
+        index = self._load_session_index()
+        for test_name in test_names:
+            self._drop_from_index(index, test_name)
+            self._index_records(index, test_name, self.load_test_data(test_name), 0)
+        self._write_session_index(index)
+        return index
+
+    def group_by_session(self, test_names):
+        """Group saved records by (block_id, day, slot) in one indexed pass
+
+        Returns a dict mapping (block_id, day, slot) to {test_name: [records]}.
+        """
+        index = self._load_session_index()
+        records = {test_name: self.load_test_data(test_name) for test_name in test_names}
+
+        stale = [name for name, recs in records.items() if index["counts"].get(name, 0) != len(recs)]
+        if stale:
+            index = self.rebuild_session_index(stale)
+
+        groups = {}
+        for key, tests in index["groups"].items():
+            group = {}
+            for test_name, offsets in tests.items():
+                if test_name in records:
+                    group[test_name] = [records[test_name][offset] for offset in offsets]
+            if group:
+                groups[parse_session_key(key)] = group
+        return groups
+
     def get_data_directory_path(self):
         """Get the data directory path as string"""
         return str(self.data_dir)
\ No newline at end of file
@@ -2,13 +2,18 @@ import pygame
 import random
 import time
 from data_manager import DataManager
+from assets import get_font
+from span_procedure import LinearSpanProcedure, BayesianSpanStaircase, history_prior
+from scoring import score_digit_span
+from stimulus_timing import StimulusSchedule, present, relative_log
 
 class DigitSpanTest:
-    def __init__(self, screen, font):
+    def __init__(self, screen, font, data_manager=None, adaptive=False):
         self.screen = screen
         self.font = font
-        self.large_font = pygame.font.Font(None, 72)
-        self.small_font = pygame.font.Font(None, 24)
+        self.data_manager = data_manager or DataManager()
+        self.large_font = get_font(72)
+        self.small_font = get_font(24)
         self.running = True
 
         # Colors
@@ -20,21 +25,27 @@ class DigitSpanTest:
         self.GRAY = (128, 128, 128)
 
         # Test parameters
-        self.current_span = 4  # Start with 4 digits
+        self.adaptive = adaptive
         self.max_span = 9
         self.trials_per_span = 2
-        self.current_trial = 0
         self.forward_span = 0
         self.backward_span = 0
         self.testing_forward = True
+        # Staircase prior per direction, saved so the trials can be scored again
+        self.priors = {}
+        self.procedure = self.make_procedure()
+        self.current_span = self.procedure.current_span
 
         # Current test state
         self.current_sequence = []
         self.user_input = []
         self.phase = "instructions"  # instructions, showing, input, feedback
         self.sequence_index = 0
-        self.digit_display_time = 1.0  # 1 second per digit
-        self.digit_start_time = 0
+        # One digit per second: 0.8s on, then a 0.2s blank
+        self.digit_display_time = 0.8
+        self.digit_blank_time = 0.2
+        self.digit_visible = False
+        self.presentation = []
         self.feedback_start_time = 0
         self.feedback_duration = 1.5
         self.last_correct = False
@@ -48,6 +59,23 @@ class DigitSpanTest:
 
         self.generate_sequence()
 
+    def make_procedure(self):
+        """Create the span procedure for the current direction"""
+        direction = "forward" if self.testing_forward else "backward"
+        if not self.adaptive:
+            # Start with 4 digits forward, 3 backward
+            return LinearSpanProcedure(4 if self.testing_forward else 3, self.max_span, self.trials_per_span)
+
+        # Seed the adaptive staircase from recent sessions
+        try:
+            history = self.data_manager.load_test_data('digit_span')
+        except OSError as e:
+            print(f"Not using digit span history: {e}")
+            history = []
+        prior_mean, prior_sd = history_prior(history, direction, 6.5 if self.testing_forward else 5.0)
+        self.priors[direction] = [prior_mean, prior_sd]
+        return BayesianSpanStaircase(prior_mean, prior_sd)
+
     def generate_sequence(self):
         """Generate a random sequence of digits"""
         self.current_sequence = [random.randint(0, 9) for _ in range(self.current_span)]
@@ -72,9 +100,10 @@ class DigitSpanTest:
 
                     elif self.phase == "instructions":
                         if event.key == pygame.K_SPACE:
-                            self.phase = "showing"
-                            self.sequence_index = 0
-                            self.digit_start_time = current_time
+                            if not self.present_sequence():
+                                self.running = False
+                                return self.calculate_final_score()
+                            self.phase = "input"
 
                     elif self.phase == "input":
                         if event.key >= pygame.K_0 and event.key <= pygame.K_9:
@@ -105,15 +134,7 @@ class DigitSpanTest:
                             self.next_trial()
 
             # Handle automatic phase transitions
-            if self.phase == "showing":
-                if current_time - self.digit_start_time >= self.digit_display_time:
-                    self.sequence_index += 1
-                    if self.sequence_index >= len(self.current_sequence):
-                        self.phase = "input"
-                    else:
-                        self.digit_start_time = current_time
-
-            elif self.phase == "feedback":
+            if self.phase == "feedback":
                 if current_time - self.feedback_start_time >= self.feedback_duration:
                     self.next_trial()
 
@@ -125,6 +146,38 @@ class DigitSpanTest:
         self.save_data(score)
         return score
 
+    def present_sequence(self):
+        """Show the current sequence with flips at absolute deadlines; returns False on ESC or QUIT
+
+        The frame loop only checks the clock once per 60 FPS frame, which adds
+        up to a frame of error to every digit, so presentation runs on its own
+        schedule instead and records when each digit actually appeared.
+        """
+        self.phase = "showing"
+
+        def show_digit(i):
+            self.sequence_index = i
+            self.digit_visible = True
+            self.draw()
+
+        def show_blank(i):
+            self.digit_visible = False
+            self.draw()
+
+        def aborted():
+            for event in pygame.event.get((pygame.QUIT, pygame.KEYDOWN)):
+                if event.type == pygame.QUIT or event.key == pygame.K_ESCAPE:
+                    return True
+            return False
+
+        # Leave a frame's worth of time to draw the first digit
+        start = time.perf_counter() + 0.05
+        schedule = StimulusSchedule(len(self.current_sequence), self.digit_display_time,
+                                    self.digit_blank_time, start)
+        log, completed = present(schedule, show_digit, show_blank, aborted)
+        self.presentation = relative_log(log, start)
+        return completed
+
     def check_answer(self):
         """Check if the user's answer is correct"""
         if self.testing_forward:
@@ -140,7 +193,8 @@ class DigitSpanTest:
             'sequence': self.current_sequence.copy(),
             'user_input': self.user_input.copy(),
             'correct': self.last_correct,
-            'forward': self.testing_forward
+            'forward': self.testing_forward,
+            'presentation': self.presentation
         }
 
         if self.testing_forward:
@@ -150,54 +204,29 @@ class DigitSpanTest:
 
     def next_trial(self):
         """Move to the next trial"""
-        self.current_trial += 1
-
         if self.last_correct:
             self.consecutive_failures = 0
         else:
             self.consecutive_failures += 1
 
-        # Check if we need to change span length
-        if self.current_trial >= self.trials_per_span:
-            self.current_trial = 0
+        self.procedure.record(self.last_correct)
+        if self.testing_forward:
+            self.forward_span = self.procedure.span
+        else:
+            self.backward_span = self.procedure.span
 
-            # If got at least one correct, move to next span
+        if self.procedure.finished:
             if self.testing_forward:
-                trials_this_span = [t for t in self.results['forward_trials'] if t['span'] == self.current_span]
-            else:
-                trials_this_span = [t for t in self.results['backward_trials'] if t['span'] == self.current_span]
-
-            got_one_correct = any(t['correct'] for t in trials_this_span)
-
-            if got_one_correct:
-                if self.testing_forward:
-                    self.forward_span = self.current_span
-                else:
-                    self.backward_span = self.current_span
-
-                self.current_span += 1
-
-                if self.current_span > self.max_span:
-                    if self.testing_forward:
-                        # Switch to backward testing
-                        self.testing_forward = False
-                        self.current_span = 3
-                        self.consecutive_failures = 0
-                    else:
-                        # Test complete
-                        self.running = False
-                        return
+                # Switch to backward testing
+                self.testing_forward = False
+                self.procedure = self.make_procedure()
+                self.consecutive_failures = 0
             else:
-                # Failed both trials at this span
-                if self.testing_forward:
-                    # Switch to backward testing
-                    self.testing_forward = False
-                    self.current_span = 3
-                    self.consecutive_failures = 0
-                else:
-                    # Test complete
-                    self.running = False
-                    return
+                # Test complete
+                self.running = False
+                return
+
+        self.current_span = self.procedure.current_span
 
         # Generate new sequence
         self.generate_sequence()
@@ -215,7 +244,7 @@ class DigitSpanTest:
         self.screen.blit(title_text, title_rect)
 
         # Current span info
-        span_text = self.small_font.render(f"Span: {self.current_span} | Trial: {self.current_trial + 1}/{self.trials_per_span}", True, self.BLACK)
+        span_text = self.small_font.render(f"Span: {self.current_span} | {self.procedure.trial_label()}", True, self.BLACK)
         span_rect = span_text.get_rect()
         span_rect.x = 20
         span_rect.y = 20
@@ -258,8 +287,8 @@ class DigitSpanTest:
                 self.screen.blit(text, text_rect)
 
         elif self.phase == "showing":
-            # Show current digit
-            if self.sequence_index < len(self.current_sequence):
+            # Show current digit, or nothing during the blank between digits
+            if self.digit_visible and self.sequence_index < len(self.current_sequence):
                 digit = str(self.current_sequence[self.sequence_index])
                 digit_text = self.large_font.render(digit, True, self.BLACK)
                 digit_rect = digit_text.get_rect()
@@ -338,15 +367,23 @@ class DigitSpanTest:
             next_rect.y = center_y + 80
             self.screen.blit(next_text, next_rect)
 
+    def trial_record(self):
+        """The trials as saved, with what is needed to score them again"""
+        record = {
+            "forward_trials": self.results['forward_trials'],
+            "backward_trials": self.results['backward_trials'],
+            "procedure": self.procedure.name
+        }
+        for direction, prior in self.priors.items():
+            record[f"{direction}_span_prior"] = prior
+        return record
+
     def calculate_final_score(self):
         """Calculate the final digit span scores"""
-        return {
-            'forward_span': self.forward_span,
-            'backward_span': self.backward_span,
-            'total_span': self.forward_span + self.backward_span,
-            'forward_trials': len(self.results['forward_trials']),
-            'backward_trials': len(self.results['backward_trials'])
-        }
+        score = score_digit_span(self.trial_record())
+        score['forward_trials'] = len(self.results['forward_trials'])
+        score['backward_trials'] = len(self.results['backward_trials'])
+        return score
 
     def save_data(self, score):
         """Save test results to JSON file"""
@@ -356,18 +393,25 @@ class DigitSpanTest:
             "forward_span": score['forward_span'],
             "backward_span": score['backward_span'],
             "total_span": score['total_span'],
-            "forward_trials": self.results['forward_trials'],
-            "backward_trials": self.results['backward_trials']
+            # Presentation timing, which changed from 1.0s on without a blank
+            "stimulus_on_ms": self.digit_display_time * 1000,
+            "stimulus_blank_ms": self.digit_blank_time * 1000,
+            **self.trial_record()
         }
 
+        # Posterior span estimates of the adaptive staircase
+        for direction in ("forward", "backward"):
+            if f"{direction}_span_estimate" in score:
+                data[f"{direction}_span_estimate"] = score[f"{direction}_span_estimate"]
+                data[f"{direction}_span_sd"] = score[f"{direction}_span_sd"]
+
         # Save to file using DataManager
         try:
-            data_manager = DataManager()
-            filepath = data_manager.save_test_data('digit_span', data)
+            filepath = self.data_manager.save_test_data('digit_span', data)
             print(f"Digit span data saved to {filepath}")
         except Exception as e:
             print(f"Error saving digit span data: {e}")
 
-def run_digit_span(screen, font):
-    digit_span = DigitSpanTest(screen, font)
+def run_digit_span(screen, font, data_manager=None, adaptive=False):
+    digit_span = DigitSpanTest(screen, font, data_manager, adaptive)
     return digit_span.run()
\ No newline at end of file
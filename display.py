@@ -0,0 +1,59 @@
+import time
+import pygame
+
+# Frames flipped to measure the flip interval at startup
+FLIP_SAMPLE_FRAMES = 30
+
+def open_display(size, fullscreen=False):
+    """Open the display; returns (screen, mode)
+
+    Fullscreen uses pygame.SCALED: the tests keep drawing on a logical surface
+    of the given size (so their 800/600/400 coordinates still work) that SDL
+    scales on the GPU, and mouse positions are mapped back to logical
+    coordinates. Together with vsync this bypasses the desktop compositor.
+    Falls back to a window if the driver refuses.
+    """
+    if fullscreen:
+        try:
+            screen = pygame.display.set_mode(size, pygame.FULLSCREEN | pygame.SCALED, vsync=1)
+            return screen, "fullscreen"
+        except pygame.error as e:
+            print(f"Fullscreen with vsync not available ({e}), using a window")
+
+    return pygame.display.set_mode(size), "windowed"
+
+def set_window_visible(size, mode, visible):
+    """Show or hide the window, keeping its mode; returns the (unchanged) screen surface"""
+    flags = pygame.SHOWN if visible else pygame.HIDDEN
+    if mode == "fullscreen":
+        return pygame.display.set_mode(size, pygame.FULLSCREEN | pygame.SCALED | flags, vsync=1)
+    return pygame.display.set_mode(size, flags)
+
+def measure_flip_interval(screen, frames=FLIP_SAMPLE_FRAMES, color=(255, 255, 255)):
+    """Median and maximum time between consecutive flips of a blank frame, in ms
+
+    With vsync this is the refresh interval; without it, it is just the cost
+    of a flip and says that frames are not locked to the display.
+    """
+    times = []
+    for _ in range(frames + 1):
+        screen.fill(color)
+        pygame.display.flip()
+        times.append(time.perf_counter())
+
+    intervals = sorted((b - a) * 1000 for a, b in zip(times, times[1:]))
+    return intervals[len(intervals) // 2], intervals[-1]
+
+def describe_display(screen, mode, flip_interval_ms, max_flip_interval_ms):
+    """Display facts worth keeping next to every timing measurement"""
+    desktops = pygame.display.get_desktop_sizes()
+    return {
+        "mode": mode,
+        "driver": pygame.display.get_driver(),
+        "logical_size": list(screen.get_size()),
+        "window_size": list(pygame.display.get_window_size()),
+        "desktop_size": list(desktops[0]) if desktops else None,
+        "vsync_requested": mode == "fullscreen",
+        "flip_interval_ms": flip_interval_ms,
+        "max_flip_interval_ms": max_flip_interval_ms
+    }
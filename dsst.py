@@ -2,13 +2,16 @@ import pygame
 import random
 import time
 from data_manager import DataManager
+from assets import get_font
+from scoring import score_dsst
 
 class DigitSymbolSubstitutionTest:
-    def __init__(self, screen, font):
+    def __init__(self, screen, font, data_manager=None):
         self.screen = screen
         self.font = font
-        self.small_font = pygame.font.Font(None, 24)
-        self.large_font = pygame.font.Font(None, 48)
+        self.data_manager = data_manager or DataManager()
+        self.small_font = get_font(24)
+        self.large_font = get_font(48)
         self.running = True
         self.test_duration = 90  # seconds
         self.start_time = None
@@ -17,6 +20,8 @@ class DigitSymbolSubstitutionTest:
         self.current_position = 0
         self.total_completed = 0
         self.correct_count = 0
+        # Symbol and response of every item in completed rows
+        self.items = []
 
         # Colors
         self.WHITE = (255, 255, 255)
@@ -89,6 +94,7 @@ class DigitSymbolSubstitutionTest:
                             # If all 6 are filled, generate new symbols
                             if self.current_position >= 6:
                                 self.total_completed += 6
+                                self.items.extend(self.answered_items())
                                 self.generate_new_symbols()
 
                     # Allow backspace to go back
@@ -205,21 +211,17 @@ class DigitSymbolSubstitutionTest:
             text_rect.y = 50 + i * 20
             self.screen.blit(text, text_rect)
 
-    def calculate_score(self):
-        # Add any remaining responses from current round
-        for i in range(self.current_position):
-            if self.current_responses[i] is not None:
-                current_symbol = self.current_symbols[i]
-                if self.symbol_map[self.current_responses[i]] == current_symbol:
-                    self.correct_count += 1
+    def answered_items(self):
+        """Items answered so far in the current row"""
+        return [{"symbol": self.current_symbols[i], "response": self.current_responses[i]}
+                for i in range(self.current_position)]
 
-        total_attempted = self.total_completed + self.current_position
+    def saved_symbol_map(self):
+        # String keys, as JSON stores them
+        return {str(digit): symbol for digit, symbol in self.symbol_map.items()}
 
-        return {
-            'correct_count': self.correct_count,
-            'total_attempted': total_attempted,
-            'accuracy': self.correct_count / total_attempted if total_attempted > 0 else 0
-        }
+    def calculate_score(self):
+        return score_dsst({"items": self.items + self.answered_items(), "symbol_map": self.saved_symbol_map()})
 
     def save_data(self, score):
         # Prepare data
@@ -229,17 +231,17 @@ class DigitSymbolSubstitutionTest:
             "correct_count": score['correct_count'],
             "total_attempted": score['total_attempted'],
             "accuracy": score['accuracy'],
-            "symbol_map": self.symbol_map
+            "symbol_map": self.saved_symbol_map(),
+            "items": self.items + self.answered_items()
         }
 
         # Save to file using DataManager
         try:
-            data_manager = DataManager()
-            filepath = data_manager.save_test_data('dsst', data)
+            filepath = self.data_manager.save_test_data('dsst', data)
             print(f"DSST data saved to {filepath}")
         except Exception as e:
             print(f"Error saving DSST data: {e}")
 
-def run_dsst(screen, font):
-    dsst = DigitSymbolSubstitutionTest(screen, font)
+def run_dsst(screen, font, data_manager=None):
+    dsst = DigitSymbolSubstitutionTest(screen, font, data_manager)
     return dsst.run()
\ No newline at end of file
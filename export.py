@@ -0,0 +1,300 @@
+import sys
+import csv
+import json
+import time
+import shutil
+import argparse
+from pathlib import Path
+from data_manager import DataManager, TEST_NAMES
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    # Without pyarrow, tables are written as CSV
+    pa = None
+
+EXPORT_STATE_FILE = "export_state.json"
+FORMATS = ("parquet", "arrow", "csv")
+
+# Lists of per-trial dicts exported as a <test>_trials table, one row per trial
+TRIAL_LISTS = {
+    "pvt": ("all_responses",),
+    "digit_span": ("forward_trials", "backward_trials"),
+    "time_perception": ("trials",)
+}
+
+# Column types from narrowest to widest; a column takes the widest type of its values
+COLUMN_TYPES = ("bool", "int", "float", "string")
+_RANKS = {column_type: rank for rank, column_type in enumerate(COLUMN_TYPES)}
+_VALUE_TYPES = {bool: "bool", int: "int", float: "float", str: "string"}
+
+def _coerce(value, column_type):
+    if value is None or _VALUE_TYPES.get(type(value)) == column_type:
+        return value
+    if column_type == "string":
+        return value if isinstance(value, str) else json.dumps(value)
+    if column_type == "float":
+        return float(value)
+    if column_type == "int":
+        return int(value)
+    return value
+
+def flatten(record, prefix="", skip=()):
+    """One row of scalars: nested dicts become prefixed columns, lists JSON strings"""
+    row = {}
+    for key, value in record.items():
+        if key in skip:
+            continue
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            row.update(flatten(value, f"{name}_"))
+        elif isinstance(value, list):
+            row[name] = json.dumps(value)
+        else:
+            row[name] = value
+    return row
+
+def record_tables(test_name, offset, record):
+    """{table name: rows} for one session record"""
+    trial_lists = TRIAL_LISTS.get(test_name, ())
+    tables = {f"{test_name}_sessions": [{"record": offset, **flatten(record, skip=trial_lists)}]}
+    if trial_lists:
+        trials = []
+        for list_name in trial_lists:
+            for i, trial in enumerate(record.get(list_name) or []):
+                trials.append({"record": offset, "list": list_name, "index": i, **flatten(trial)})
+        tables[f"{test_name}_trials"] = trials
+    return tables
+
+def widen_columns(columns, rows):
+    """Add the columns and value types of rows to columns ({name: type}, in first-seen order)"""
+    for row in rows:
+        for name, value in row.items():
+            current = columns.get(name)
+            if value is None:
+                if current is None:
+                    columns[name] = None
+                continue
+            value_type = _VALUE_TYPES.get(type(value), "string")
+            if value_type != current and (current is None or _RANKS[value_type] > _RANKS[current]):
+                columns[name] = value_type
+    return columns
+
+class CsvTableWriter:
+    """Appends rows to <table>.csv, writing the header when the file is new"""
+
+    def __init__(self, output_dir, table, columns, part):
+        self.path = output_dir / f"{table}.csv"
+        self.columns = columns
+        new = part == 0 or not self.path.exists()
+        self._file = open(self.path, 'w' if new else 'a', newline='')
+        self._writer = csv.writer(self._file)
+        if new:
+            self._writer.writerow(columns)
+        self.parts = part
+
+    def write(self, rows):
+        for row in rows:
+            values = (_coerce(row.get(name), column_type) for name, column_type in self.columns.items())
+            self._writer.writerow("" if value is None else value for value in values)
+        self.parts += 1
+
+    def close(self):
+        self._file.close()
+
+ARROW_TYPES = {"bool": "bool_", "int": "int64", "float": "float64", "string": "string"}
+
+class ArrowTableWriter:
+    """Writes every batch as a part file in a <table>/ directory, readable as one dataset"""
+
+    suffix = ".arrow"
+
+    def __init__(self, output_dir, table, columns, part):
+        self.directory = output_dir / table
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.columns = columns
+        self.schema = pa.schema([(name, getattr(pa, ARROW_TYPES[column_type])())
+                                 for name, column_type in columns.items()])
+        self.parts = part
+
+    def write(self, rows):
+        arrays = [pa.array([_coerce(row.get(name), column_type) for row in rows], type=field.type)
+                  for (name, column_type), field in zip(self.columns.items(), self.schema)]
+        self._write_table(pa.Table.from_arrays(arrays, schema=self.schema),
+                          self.directory / f"part-{self.parts:05d}{self.suffix}")
+        self.parts += 1
+
+    def _write_table(self, table, path):
+        with pa.OSFile(str(path), 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+    def close(self):
+        pass
+
+class ParquetTableWriter(ArrowTableWriter):
+    suffix = ".parquet"
+
+    def _write_table(self, table, path):
+        pq.write_table(table, str(path))
+
+WRITERS = {"csv": CsvTableWriter, "arrow": ArrowTableWriter, "parquet": ParquetTableWriter}
+
+def _remove_table(output_dir, table):
+    (output_dir / f"{table}.csv").unlink(missing_ok=True)
+    shutil.rmtree(output_dir / table, ignore_errors=True)
+
+class Exporter:
+    """Streams saved records into flat typed tables
+
+    Each test is read twice in bounded batches: first to settle the columns
+    and their types, then to write. With incremental=True only records added
+    since the last export are written, unless they bring new columns or wider
+    types, or the history changed under the previous export; then that test
+    is exported again in full.
+    """
+
+    def __init__(self, data_manager, output_dir, fmt, batch_size=500):
+        if fmt != "csv" and pa is None:
+            raise ValueError(f"'{fmt}' export needs pyarrow (pip install pyarrow); use --format csv")
+        self.data_manager = data_manager
+        self.output_dir = Path(output_dir)
+        self.format = fmt
+        self.batch_size = batch_size
+
+    def load_state(self):
+        """What the last export into output_dir wrote, per test"""
+        filepath = self.output_dir / EXPORT_STATE_FILE
+        if not filepath.exists():
+            return {"format": self.format, "tests": {}}
+        try:
+            with open(filepath, 'r') as f:
+                state = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            raise OSError(f"Error reading export state from '{filepath}': {e}")
+        if state.get("format") != self.format:
+            # Parts of another format cannot be appended to
+            return {"format": self.format, "tests": {}}
+        return state
+
+    def save_state(self, state):
+        filepath = self.output_dir / EXPORT_STATE_FILE
+        try:
+            with open(filepath, 'w') as f:
+                json.dump(state, f, indent=2)
+        except OSError as e:
+            raise OSError(f"Error saving export state to '{filepath}': {e}")
+
+    def _scan(self, test_name, start, columns):
+        """Widen columns with the records from start on; returns (offset after the last record, first record)"""
+        end, first = start, None
+        for offset, records in self.data_manager.iter_records(test_name, start, self.batch_size):
+            if first is None:
+                first = records[0]
+            for i, record in enumerate(records):
+                for table, rows in record_tables(test_name, offset + i, record).items():
+                    widen_columns(columns.setdefault(table, {}), rows)
+            end = offset + len(records)
+        return end, first
+
+    def export_test(self, test_name, previous=None):
+        """Export the records of one test after those in previous; returns (new state, records exported)"""
+        start = 0
+        if previous and previous["records"]:
+            start = previous["records"]
+            columns = {table: dict(info["columns"]) for table, info in previous["tables"].items()}
+            known = json.dumps(columns)
+            # Start at the last exported record to check that the history was not changed since
+            end, last = self._scan(test_name, start - 1, columns)
+            if last is None or last.get("timestamp") != previous["last_timestamp"]:
+                start = 0
+            elif json.dumps(columns) != known:
+                # New columns or wider types: earlier parts would not match, so redo the whole test
+                start = 0
+            elif end == start:
+                return previous, 0
+
+        if not start:
+            columns = {}
+            end, _ = self._scan(test_name, 0, columns)
+            for table in columns:
+                _remove_table(self.output_dir, table)
+
+        tables = previous["tables"] if start else {}
+        writers = {}
+        state = {"records": start, "last_timestamp": previous["last_timestamp"] if start else None}
+        try:
+            for table, table_columns in columns.items():
+                table_columns = {name: column_type or "string" for name, column_type in table_columns.items()}
+                part = tables.get(table, {}).get("parts", 0)
+                writers[table] = WRITERS[self.format](self.output_dir, table, table_columns, part)
+
+            rows_written = {table: tables.get(table, {}).get("rows", 0) for table in columns}
+            for offset, records in self.data_manager.iter_records(test_name, start, self.batch_size):
+                # Records saved since the scan may not fit the columns; the next export gets them
+                records = records[:end - offset]
+                if not records:
+                    break
+                batch = {table: [] for table in columns}
+                for i, record in enumerate(records):
+                    for table, rows in record_tables(test_name, offset + i, record).items():
+                        batch[table].extend(rows)
+                for table, rows in batch.items():
+                    if rows:
+                        writers[table].write(rows)
+                        rows_written[table] += len(rows)
+                state["records"] = offset + len(records)
+                state["last_timestamp"] = records[-1].get("timestamp")
+        finally:
+            for writer in writers.values():
+                writer.close()
+
+        state["tables"] = {table: {"columns": [[name, column_type or "string"] for name, column_type in cols.items()],
+                                   "parts": writers[table].parts, "rows": rows_written[table]}
+                           for table, cols in columns.items()}
+        return state, state["records"] - start
+
+    def export(self, test_names, incremental=False):
+        """Export the given tests; returns {test: (records exported, seconds)}"""
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        state = self.load_state() if incremental else {"format": self.format, "tests": {}}
+        results = {}
+        for test_name in test_names:
+            start = time.perf_counter()
+            previous = state["tests"].get(test_name) if incremental else None
+            state["tests"][test_name], exported = self.export_test(test_name, previous)
+            results[test_name] = (exported, time.perf_counter() - start)
+            # Saved after every test so an interrupted export resumes from here
+            self.save_state(state)
+        return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export the collected data as flat tables for R, pandas and the like")
+    parser.add_argument("--output", help="output directory (default: export/ in the data directory)")
+    parser.add_argument("--format", choices=FORMATS, default="parquet" if pa is not None else "csv",
+                        help="table format (default: parquet with pyarrow installed, csv otherwise)")
+    parser.add_argument("--tests", nargs="+", choices=TEST_NAMES, default=list(TEST_NAMES))
+    parser.add_argument("--incremental", action="store_true", help="only export records added since the last export")
+    parser.add_argument("--batch-size", type=int, default=500, help="records held in memory at a time")
+    args = parser.parse_args(argv)
+
+    data_manager = DataManager()
+    output_dir = Path(args.output) if args.output else data_manager.data_dir / "export"
+    try:
+        exporter = Exporter(data_manager, output_dir, args.format, args.batch_size)
+        results = exporter.export(args.tests, incremental=args.incremental)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        return 1
+
+    total_records = sum(records for records, _ in results.values())
+    total_s = sum(seconds for _, seconds in results.values())
+    for test_name, (records, seconds) in results.items():
+        rate = records / seconds if seconds > 0 else 0.0
+        print(f"{test_name}: {records} records in {seconds:.2f}s ({rate:.0f} records/s)")
+    print(f"Exported {total_records} records as {args.format} to {output_dir} "
+          f"({total_records / total_s if total_s > 0 else 0.0:.0f} records/s)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,196 @@
+import re
+import sys
+import json
+from bisect import bisect_left
+from datetime import datetime
+from data_manager import DataManager
+
+FEELINGS_INDEX_FILE = "feelings_index.json"
+
+TOKEN_PATTERN = re.compile(r"[^\W_]+(?:'[^\W_]+)*")
+
+def tokenize(text):
+    """Split free text into lowercase terms"""
+    return TOKEN_PATTERN.findall(text.lower())
+
+class FeelingsIndex:
+    """Inverted index over subjective-feelings entries, kept up to date on every save
+
+    Maps each term to the offsets of the entries in feelings.json that contain
+    it, and keeps total and per-day term frequencies. Days are ISO dates, the
+    same keys analysis.collect_daily_metrics uses, so term counts can be joined
+    with the other tests' metrics.
+
+    The index keeps the mtime and size of feelings.json it matches. Creating
+    one reads only the index, a save adds its record without reading
+    feelings.json, and queries read that only if it changed since.
+    """
+
+    def __init__(self, data_manager=None):
+        self.data_manager = data_manager or DataManager()
+        self.filepath = self.data_manager.data_dir / FEELINGS_INDEX_FILE
+        self.count = 0
+        self.postings = {}
+        self.term_freq = {}
+        self.day_freq = {}
+        # (mtime_ns, size) of feelings.json when the index last matched it
+        self.stamp = None
+        self._sorted_terms = None
+        self._read()
+
+    def _read(self):
+        """Read the saved index alone; load() brings it in line with feelings.json"""
+        if not self.filepath.exists():
+            return
+        try:
+            with open(self.filepath, 'r') as f:
+                index = json.load(f)
+            self.count = index["count"]
+            self.postings = index["postings"]
+            self.term_freq = index["term_freq"]
+            self.day_freq = index["day_freq"]
+            self.stamp = index.get("stamp")
+        except (OSError, json.JSONDecodeError, KeyError) as e:
+            print(f"Rebuilding unreadable feelings index '{self.filepath}': {e}")
+            self.count = 0
+            self.stamp = None
+
+    def _file_stamp(self):
+        filepath = self.data_manager.data_dir / "feelings.json"
+        if not filepath.exists():
+            return None
+        stat = filepath.stat()
+        return [stat.st_mtime_ns, stat.st_size]
+
+    def load(self):
+        """Bring the index in line with feelings.json, reading that only if it changed since the index was saved"""
+        if self.stamp == self._file_stamp():
+            return
+
+        records = self.data_manager.load_test_data('feelings')
+        if len(records) < self.count or self.stamp is None:
+            # Entries were removed behind the index's back, so offsets no longer line up,
+            # or the index is missing or unreadable
+            self.rebuild(records)
+            return
+        # Entries saved while the index was not updated
+        for offset in range(self.count, len(records)):
+            self._add(offset, records[offset])
+        self.stamp = self._file_stamp()
+        self.save()
+
+    def save(self):
+        try:
+            with open(self.filepath, 'w') as f:
+                json.dump({
+                    "count": self.count,
+                    "stamp": self.stamp,
+                    "postings": self.postings,
+                    "term_freq": self.term_freq,
+                    "day_freq": self.day_freq
+                }, f)
+        except OSError as e:
+            raise OSError(f"Error saving feelings index to '{self.filepath}': {e}")
+
+    def _add(self, offset, record):
+        day = datetime.fromisoformat(record["timestamp"]).date().isoformat()
+        terms = tokenize(record.get("feeling_text", ""))
+
+        for term in terms:
+            self.term_freq[term] = self.term_freq.get(term, 0) + 1
+            days = self.day_freq.setdefault(term, {})
+            days[day] = days.get(day, 0) + 1
+
+        for term in set(terms):
+            self.postings.setdefault(term, []).append(offset)
+
+        self.count = offset + 1
+        self._sorted_terms = None
+
+    def add_saved_record(self, offset, record):
+        """Index a record just appended at offset, without reading feelings.json unless the index fell behind"""
+        if offset != self.count:
+            self.rebuild()
+            return
+        self._add(offset, record)
+        self.stamp = self._file_stamp()
+        self.save()
+
+    def rebuild(self, records=None):
+        """Reindex every entry in feelings.json from scratch"""
+        self.count = 0
+        self.postings = {}
+        self.term_freq = {}
+        self.day_freq = {}
+        self._sorted_terms = None
+        if records is None:
+            records = self.data_manager.load_test_data('feelings')
+        for offset, record in enumerate(records):
+            self._add(offset, record)
+        self.stamp = self._file_stamp()
+        self.save()
+
+    def terms_with_prefix(self, prefix):
+        """All indexed terms starting with prefix, in sorted order"""
+        self.load()
+        if self._sorted_terms is None:
+            self._sorted_terms = sorted(self.postings)
+        prefix = prefix.lower()
+        start = bisect_left(self._sorted_terms, prefix)
+        terms = []
+        for term in self._sorted_terms[start:]:
+            if not term.startswith(prefix):
+                break
+            terms.append(term)
+        return terms
+
+    def _expand(self, pattern):
+        """A query term ending in '*' matches every term with that prefix"""
+        if pattern.endswith("*"):
+            return self.terms_with_prefix(pattern[:-1])
+        return [pattern.lower()]
+
+    def search(self, *patterns):
+        """Offsets of entries containing all of the given terms (or prefixes ending in '*')"""
+        self.load()
+        result = None
+        for pattern in patterns:
+            offsets = set()
+            for term in self._expand(pattern):
+                offsets.update(self.postings.get(term, []))
+            result = offsets if result is None else result & offsets
+        return sorted(result or [])
+
+    def day_counts(self, pattern):
+        """Occurrences per ISO date of a term (or all terms matching a prefix ending in '*')"""
+        self.load()
+        counts = {}
+        for term in self._expand(pattern):
+            for day, count in self.day_freq.get(term, {}).items():
+                counts[day] = counts.get(day, 0) + count
+        return dict(sorted(counts.items()))
+
+    def records(self, offsets):
+        """Load the entries at the given offsets"""
+        entries = self.data_manager.load_test_data('feelings')
+        return [entries[offset] for offset in offsets]
+
+def main(argv=None):
+    """Print entries matching all query terms, e.g. `python feelings_index.py headache jitter*`"""
+    terms = sys.argv[1:] if argv is None else argv
+    if not terms:
+        print("Usage: python feelings_index.py TERM [TERM...]  (TERM* matches a prefix)")
+        return 1
+
+    index = FeelingsIndex()
+    for record in index.records(index.search(*terms)):
+        print(f"{record['timestamp']}: {record['feeling_text']}")
+
+    for term in terms:
+        print(f"\n{term} per day:")
+        for day, count in index.day_counts(term).items():
+            print(f"  {day}: {count}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,211 @@
+import sys
+import json
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+INTEGRITY_CHECKPOINT_FILE = "integrity_checkpoint.json"
+
+# prev_hash of the first record of a test
+GENESIS_HASH = "0" * 64
+
+# Records per verification job; smaller histories are verified in this process
+SEGMENT_SIZE = 2000
+
+def record_digest(record):
+    """SHA-256 of a record's content apart from record_hash, for a record as read from disk"""
+    content = {key: value for key, value in record.items() if key != "record_hash"}
+    canonical = json.dumps(content, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+def chain_hash(record):
+    """The hash the next record is chained to; records saved before sealing get their digest"""
+    if record is None:
+        return GENESIS_HASH
+    return record.get("record_hash") or record_digest(record)
+
+def seal_record(record, previous):
+    """Chain record to the previous record of its test and stamp its own hash"""
+    record["prev_hash"] = chain_hash(previous)
+    # Hash the record as it will read back, e.g. with integer dict keys turned into strings
+    record["record_hash"] = record_digest(json.loads(json.dumps(record)))
+    return record
+
+def _verify_segment(job):
+    """Problems in one run of consecutive records, given the chain hash and sealing of the record before"""
+    first_offset, prev_hash, prev_sealed, records = job
+    problems = []
+    legacy = 0
+    for offset, record in enumerate(records, first_offset):
+        sealed = "record_hash" in record
+        if not sealed:
+            if prev_sealed:
+                problems.append((offset, "has no record_hash although earlier records do"))
+            else:
+                legacy += 1
+        elif record_digest(record) != record["record_hash"]:
+            problems.append((offset, "content does not match record_hash"))
+        if sealed and record.get("prev_hash") != prev_hash:
+            problems.append((offset, "prev_hash does not match the record before (inserted, removed or reordered)"))
+        prev_hash = chain_hash(record)
+        prev_sealed = prev_sealed or sealed
+    return problems, legacy
+
+def _verified_prefix(data):
+    """Bytes up to the end of the last record of a JSON array file"""
+    end = data.rstrip()
+    if not end.endswith(b"]"):
+        raise ValueError("not a JSON array")
+    return len(end[:-1].rstrip())
+
+class IntegrityChecker:
+    """Verifies the hash chains of all tests, remembering what has been verified
+
+    The checkpoint stores, per test, the SHA-256 of the file bytes up to the
+    end of the last verified record. Saves rewrite the file with those bytes
+    unchanged, so if they still hash the same only records after them need
+    decoding and checking; otherwise the whole history is verified again,
+    split into segments checked in parallel.
+    """
+
+    def __init__(self, data_manager, workers=None):
+        self.data_manager = data_manager
+        self.workers = workers
+
+    def load_checkpoint(self):
+        filepath = self.data_manager.data_dir / INTEGRITY_CHECKPOINT_FILE
+        if not filepath.exists():
+            return {}
+        try:
+            with open(filepath, 'r') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Ignoring unreadable integrity checkpoint '{filepath}': {e}")
+            return {}
+
+    def save_checkpoint(self, checkpoint):
+        filepath = self.data_manager.data_dir / INTEGRITY_CHECKPOINT_FILE
+        try:
+            with open(filepath, 'w') as f:
+                json.dump(checkpoint, f, indent=2)
+        except OSError as e:
+            raise OSError(f"Error saving integrity checkpoint to '{filepath}': {e}")
+
+    def _run_segments(self, first_offset, prev_hash, prev_sealed, records):
+        jobs = []
+        for start in range(0, len(records), SEGMENT_SIZE):
+            segment = records[start:start + SEGMENT_SIZE]
+            jobs.append((first_offset + start, prev_hash, prev_sealed, segment))
+            prev_hash = chain_hash(segment[-1])
+            prev_sealed = prev_sealed or any("record_hash" in record for record in segment)
+
+        if self.workers == 1 or len(jobs) < 2:
+            outputs = [_verify_segment(job) for job in jobs]
+        else:
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                outputs = list(executor.map(_verify_segment, jobs))
+
+        problems = [problem for segment_problems, _ in outputs for problem in segment_problems]
+        return problems, sum(legacy for _, legacy in outputs)
+
+    def verify_test(self, test_name, previous=None):
+        """Verify one test, resuming after previous; returns (result, checkpoint entry)"""
+        filepath = self.data_manager.data_dir / f"{test_name}.json"
+        result = {"records": 0, "verified": 0, "legacy": 0, "problems": [], "incremental": False}
+        if not filepath.exists():
+            return result, None
+
+        try:
+            with open(filepath, 'rb') as f:
+                data = f.read()
+            end = _verified_prefix(data)
+
+            first_offset, prev_hash, prev_sealed = 0, GENESIS_HASH, False
+            if (previous and previous["prefix_bytes"] <= end and
+                    hashlib.sha256(data[:previous["prefix_bytes"]]).hexdigest() == previous["prefix_sha256"]):
+                # Only decode what was appended after the verified records
+                rest = data[previous["prefix_bytes"]:end].lstrip().lstrip(b",")
+                records = json.loads(b"[" + rest + b"]")
+                first_offset = previous["records"]
+                prev_hash, prev_sealed = previous["last_hash"], previous["last_sealed"]
+                result["incremental"] = True
+                result["legacy"] = previous["legacy"]
+            else:
+                records = json.loads(data)
+        except (OSError, ValueError) as e:
+            result["problems"].append((None, f"cannot be read: {e}"))
+            return result, None
+
+        problems, legacy = self._run_segments(first_offset, prev_hash, prev_sealed, records)
+        result.update(records=first_offset + len(records), verified=len(records), problems=problems)
+        result["legacy"] += legacy
+        if problems:
+            # Verified again from the start until the problems are fixed
+            return result, None
+
+        if records:
+            prev_hash = chain_hash(records[-1])
+            prev_sealed = prev_sealed or any("record_hash" in record for record in records)
+        return result, {
+            "records": result["records"],
+            "prefix_bytes": end,
+            "prefix_sha256": hashlib.sha256(data[:end]).hexdigest(),
+            "last_hash": prev_hash,
+            "last_sealed": prev_sealed,
+            "legacy": result["legacy"]
+        }
+
+    def verify(self, test_names=None, incremental=True):
+        """Verify the given tests (default: all); returns {test: result}"""
+        from data_manager import TEST_NAMES
+
+        checkpoint = self.load_checkpoint() if incremental else {}
+        results = {}
+        for test_name in test_names or TEST_NAMES:
+            results[test_name], entry = self.verify_test(test_name, checkpoint.get(test_name))
+            if entry is None:
+                checkpoint.pop(test_name, None)
+            else:
+                checkpoint[test_name] = entry
+        self.save_checkpoint(checkpoint)
+        return results
+
+def describe_problems(results):
+    """One line per problem found, for the console or the error screen"""
+    lines = []
+    for test_name, result in results.items():
+        for offset, message in result["problems"]:
+            where = f"{test_name}.json" if offset is None else f"{test_name}.json record {offset}"
+            lines.append(f"{where}: {message}")
+    return lines
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Verify the hash chains of the saved records")
+    parser.add_argument("--full", action="store_true", help="verify everything again, ignoring the checkpoint")
+    parser.add_argument("--workers", type=int, default=None, help="processes for verification (default: all cores)")
+    args = parser.parse_args(argv)
+
+    from data_manager import DataManager
+    checker = IntegrityChecker(DataManager(), workers=args.workers)
+    try:
+        results = checker.verify(incremental=not args.full)
+    except OSError as e:
+        print(f"Error: {e}")
+        return 1
+
+    for test_name, result in results.items():
+        if not result["records"]:
+            continue
+        how = "new records" if result["incremental"] else "all records"
+        line = f"{test_name}: {result['records']} records, verified {result['verified']} ({how})"
+        if result["legacy"]:
+            line += f", {result['legacy']} saved before hashing"
+        print(line)
+
+    problems = describe_problems(results)
+    for problem in problems:
+        print(f"DAMAGED {problem}")
+    return 1 if problems else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,240 @@
+import os
+import sys
+import time
+import select
+import struct
+import threading
+from collections import namedtuple
+from pathlib import Path
+import pygame
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: only SDL input is available
+    fcntl = None
+
+# struct input_event from linux/input.h: timeval (two longs), type, code, value
+INPUT_EVENT = struct.Struct("llHHi")
+
+EV_SYN = 0x00
+EV_KEY = 0x01
+KEY_PRESSED = 1
+
+# Keys the tests respond to: evdev key code -> pygame key
+EVDEV_KEYS = {1: pygame.K_ESCAPE, 57: pygame.K_SPACE}
+
+# ioctls for kernel timestamps on CLOCK_MONOTONIC (the clock behind perf_counter on Linux)
+EVIOCSCLOCKID = 0x400445a0
+CLOCK_MONOTONIC = 1
+
+# Posted to pygame's queue for every key press read from an evdev device
+KEY_EVENT = pygame.event.custom_type()
+
+# A key press and when it happened, in time.perf_counter_ns() units
+KeyPress = namedtuple("KeyPress", ["key", "time_ns", "source"])
+
+class SDLKeyInput:
+    """Key presses from SDL's event queue, timestamped when the test dequeues them"""
+
+    name = "sdl"
+
+    def start(self):
+        return self
+
+    def stop(self):
+        pass
+
+    def key_press(self, event):
+        """KeyPress for a pygame event, or None if it is not a key press"""
+        if event.type == pygame.KEYDOWN:
+            return KeyPress(event.key, time.perf_counter_ns(), self.name)
+        return None
+
+    def describe(self):
+        return {"backend": self.name}
+
+def keyboard_devices():
+    """Event devices under /dev/input that have a space bar, judged by their sysfs capabilities"""
+    devices = []
+    for capabilities in sorted(Path("/sys/class/input").glob("event*/device/capabilities/key")):
+        try:
+            words = capabilities.read_text().split()
+        except OSError:
+            continue
+        # Words are unsigned longs in hex, most significant first
+        bits = int("".join(word.rjust(16, "0") for word in words) or "0", 16)
+        if all(bits >> code & 1 for code in EVDEV_KEYS):
+            devices.append(Path("/dev/input") / capabilities.parent.parent.parent.name)
+    return devices
+
+class EvdevKeyInput:
+    """Key presses read straight from Linux input devices, with the kernel's timestamps
+
+    A background thread reads struct input_event records and posts a
+    KEY_EVENT for every press of a key in EVDEV_KEYS, carrying the kernel's
+    timestamp converted to perf_counter_ns. SDL's own KEYDOWN events for those
+    keys are ignored so each press counts once; other keys still come from SDL.
+    The devices are not grabbed, so they also see presses meant for other
+    windows; those are dropped while the window does not have keyboard focus.
+    """
+
+    name = "evdev"
+
+    def __init__(self, paths=None):
+        self.paths = [Path(path) for path in paths] if paths else keyboard_devices()
+        self.monotonic = False
+        self._fds = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Open the devices and start reading; raises OSError if none can be opened"""
+        if not self.paths:
+            raise OSError("no keyboard found under /dev/input")
+
+        errors = []
+        for path in self.paths:
+            try:
+                self._fds.append(os.open(path, os.O_RDONLY | os.O_NONBLOCK))
+            except OSError as e:
+                errors.append(f"{path}: {e.strerror}")
+        if not self._fds:
+            raise OSError("; ".join(errors))
+
+        try:
+            for fd in self._fds:
+                fcntl.ioctl(fd, EVIOCSCLOCKID, struct.pack("i", CLOCK_MONOTONIC))
+            self.monotonic = True
+        except OSError:
+            # Not an input device (e.g. a pipe) or an old kernel: timestamps stay on the wall clock
+            self.monotonic = False
+
+        self._thread = threading.Thread(target=self._run, name="evdev-input", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        for fd in self._fds:
+            os.close(fd)
+        self._fds = []
+
+    def _offset_ns(self):
+        """Add to a kernel timestamp to get perf_counter_ns"""
+        if self.monotonic:
+            return time.perf_counter_ns() - time.clock_gettime_ns(CLOCK_MONOTONIC)
+        return time.perf_counter_ns() - time.time_ns()
+
+    def _run(self):
+        # CLOCK_MONOTONIC and perf_counter only differ by a constant
+        offset_ns = self._offset_ns()
+        pending = {fd: b"" for fd in self._fds}
+
+        while not self._stop.is_set():
+            readable, _, _ = select.select(self._fds, [], [], 0.2)
+            for fd in readable:
+                try:
+                    data = pending[fd] + os.read(fd, INPUT_EVENT.size * 64)
+                except BlockingIOError:
+                    continue
+                except OSError as e:
+                    print(f"Stopped reading keyboard device: {e}")
+                    return
+
+                usable = len(data) - len(data) % INPUT_EVENT.size
+                pending[fd] = data[usable:]
+                for seconds, microseconds, event_type, code, value in INPUT_EVENT.iter_unpack(data[:usable]):
+                    if event_type != EV_KEY or value != KEY_PRESSED or code not in EVDEV_KEYS:
+                        continue
+                    if not self.monotonic:
+                        offset_ns = self._offset_ns()
+                    time_ns = seconds * 1_000_000_000 + microseconds * 1000 + offset_ns
+                    pygame.event.post(pygame.event.Event(KEY_EVENT, key=EVDEV_KEYS[code], time_ns=time_ns))
+
+    def key_press(self, event):
+        if event.type == KEY_EVENT:
+            if not pygame.key.get_focused():
+                return None
+            return KeyPress(event.key, event.time_ns, self.name)
+        if event.type == pygame.KEYDOWN and event.key not in EVDEV_KEYS.values():
+            return KeyPress(event.key, time.perf_counter_ns(), "sdl")
+        return None
+
+    def describe(self):
+        return {"backend": self.name, "devices": [str(path) for path in self.paths],
+                "clock": "monotonic" if self.monotonic else "realtime"}
+
+_active = None
+
+def configure_key_input(backend="sdl", paths=None):
+    """Choose the process-wide key input backend, falling back to SDL if evdev is unusable"""
+    global _active
+    if _active is not None:
+        _active.stop()
+
+    _active = SDLKeyInput()
+    if backend == "evdev":
+        if not sys.platform.startswith("linux") or fcntl is None:
+            print("evdev input is only available on Linux, using SDL")
+        else:
+            try:
+                _active = EvdevKeyInput(paths).start()
+            except OSError as e:
+                print(f"Cannot read keyboard devices ({e}), using SDL input")
+    return _active
+
+def get_key_input():
+    """The configured key input backend (SDL unless configure_key_input chose otherwise)"""
+    global _active
+    if _active is None:
+        _active = SDLKeyInput()
+    return _active
+
+# Writing to /dev/uinput, for a virtual keyboard that tests and benchmarks can type on
+UINPUT_USER_DEV = struct.Struct("80sHHHHi" + "64i" * 4)
+UI_SET_EVBIT = 0x40045564
+UI_SET_KEYBIT = 0x40045565
+UI_DEV_CREATE = 0x5501
+UI_DEV_DESTROY = 0x5502
+BUS_VIRTUAL = 0x06
+
+class VirtualKeyboard:
+    """A uinput keyboard whose presses arrive through the kernel like a real keyboard's"""
+
+    def __init__(self, name="vigila virtual keyboard", keys=tuple(EVDEV_KEYS)):
+        self.name = name
+        self.fd = os.open("/dev/uinput", os.O_WRONLY | os.O_NONBLOCK)
+        try:
+            fcntl.ioctl(self.fd, UI_SET_EVBIT, EV_KEY)
+            for code in keys:
+                fcntl.ioctl(self.fd, UI_SET_KEYBIT, code)
+            os.write(self.fd, UINPUT_USER_DEV.pack(name.encode()[:79], BUS_VIRTUAL, 1, 1, 1, 0, *([0] * 256)))
+            fcntl.ioctl(self.fd, UI_DEV_CREATE)
+        except OSError:
+            os.close(self.fd)
+            raise
+        # Give udev a moment to create the /dev/input node
+        time.sleep(0.5)
+
+    def device_path(self):
+        """The /dev/input node of this keyboard, found through its sysfs name"""
+        for name_file in Path("/sys/class/input").glob("event*/device/name"):
+            if name_file.read_text().strip() == self.name:
+                return Path("/dev/input") / name_file.parent.parent.name
+        return None
+
+    def press(self, code):
+        """Press and release a key; returns perf_counter_ns just before the press was written"""
+        sent_ns = time.perf_counter_ns()
+        os.write(self.fd, INPUT_EVENT.pack(0, 0, EV_KEY, code, 1) + INPUT_EVENT.pack(0, 0, EV_SYN, 0, 0) +
+                 INPUT_EVENT.pack(0, 0, EV_KEY, code, 0) + INPUT_EVENT.pack(0, 0, EV_SYN, 0, 0))
+        return sent_ns
+
+    def close(self):
+        try:
+            fcntl.ioctl(self.fd, UI_DEV_DESTROY)
+        finally:
+            os.close(self.fd)
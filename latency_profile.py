@@ -0,0 +1,87 @@
+import os
+import json
+import platform
+from data_manager import get_runtime_info
+
+CALIBRATION_FILE = "latency_calibration.json"
+
+def machine_id():
+    return platform.node() or "unknown"
+
+def profile_key(machine, display_mode):
+    """Profiles are per machine and display mode, since vsync changes the display delay"""
+    return f"{machine}/{display_mode or 'windowed'}"
+
+def current_profile_key():
+    display = get_runtime_info("display") or {}
+    return profile_key(get_runtime_info("machine") or machine_id(), display.get("mode"))
+
+def load_profiles(data_manager):
+    """All calibration profiles in the data directory, keyed by profile_key()"""
+    filepath = data_manager.data_dir / CALIBRATION_FILE
+    if not filepath.exists():
+        return {}
+    try:
+        with open(filepath, 'r') as f:
+            return json.load(f)["profiles"]
+    except (OSError, json.JSONDecodeError, KeyError) as e:
+        print(f"Ignoring unreadable latency calibration '{filepath}': {e}")
+        return {}
+
+def save_profile(data_manager, profile):
+    """Store a profile, replacing the previous one for the same machine and display mode"""
+    profiles = load_profiles(data_manager)
+    profiles[profile["key"]] = profile
+
+    filepath = data_manager.data_dir / CALIBRATION_FILE
+    temp_path = filepath.with_name(filepath.name + ".tmp")
+    with open(temp_path, 'w') as f:
+        json.dump({"profiles": profiles}, f, indent=2)
+    os.replace(temp_path, filepath)
+
+def current_profile(data_manager):
+    return load_profiles(data_manager).get(current_profile_key())
+
+def apply_correction(record, profile):
+    """PVT record with reaction times corrected by a profile's pipeline delay
+
+    Raw reaction times are kept; the corrected ones are added next to them.
+    Records that were already corrected when saved are returned unchanged.
+    A tone starts without waiting for a display flip, so auditory records are
+    only corrected for the input delay.
+    """
+    if profile is None or "latency_correction_ms" in record:
+        return record
+
+    auditory = record.get("stimulus") == "auditory"
+    if record.get("input_backend") == "evdev":
+        # Kernel timestamps already exclude the event queue and frame loop
+        correction = 0.0 if auditory else profile["handler_to_flip_ms"]["median"]
+    elif auditory:
+        correction = profile["queue_to_handler_ms"]["median"]
+    else:
+        correction = profile["correction_ms"]
+    return {
+        **record,
+        "latency_correction_ms": correction,
+        "latency_profile": {"key": profile["key"], "created": profile["created"]},
+        "corrected_reaction_times_ms": [rt - correction for rt in record.get("reaction_times_ms", [])]
+    }
+
+def record_profile(record, profiles):
+    """The profile that applies to a record, from the machine and display mode it was saved with"""
+    runtime = record.get("runtime") or {}
+    if "machine" not in runtime:
+        return None
+    display = runtime.get("display") or {}
+    return profiles.get(profile_key(runtime["machine"], display.get("mode")))
+
+def summarize(samples_ms):
+    ordered = sorted(samples_ms)
+    return {
+        "n": len(ordered),
+        "median": ordered[len(ordered) // 2],
+        "p95": ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))],
+        "mean": sum(ordered) / len(ordered),
+        "max": ordered[-1]
+    }
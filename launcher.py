@@ -0,0 +1,209 @@
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import threading
+from data_manager import DataManager
+
+# The resident instance listens on a Unix socket in the data directory, or on
+# a localhost TCP port (written to LAUNCHER_PORT_FILE) where Unix sockets are missing
+LAUNCHER_SOCKET = "launcher.sock"
+LAUNCHER_PORT_FILE = "launcher.port"
+
+def _unix_sockets():
+    return hasattr(socket, "AF_UNIX")
+
+def _connect(data_dir, timeout):
+    if _unix_sockets():
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        try:
+            sock.connect(str(data_dir / LAUNCHER_SOCKET))
+        except OSError:
+            sock.close()
+            raise
+        return sock
+
+    with open(data_dir / LAUNCHER_PORT_FILE, 'r') as f:
+        port = int(f.read())
+    return socket.create_connection(("127.0.0.1", port), timeout=timeout)
+
+def send_command(data_dir, command, timeout=5.0):
+    """Send a command to the resident instance; returns its reply, or None if none is running"""
+    try:
+        sock = _connect(data_dir, timeout)
+    except (OSError, ValueError):
+        return None
+
+    try:
+        with sock:
+            sock.sendall(json.dumps({"command": command}).encode() + b"\n")
+            reply = sock.makefile('r').readline()
+    except OSError:
+        return None
+    if not reply:
+        return None
+    return json.loads(reply)
+
+def process_stats():
+    """CPU seconds and resident memory of this process"""
+    rss_mb = None
+    try:
+        with open("/proc/self/status", 'r') as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    rss_mb = int(line.split()[1]) / 1024
+    except OSError:
+        # Elsewhere only the peak is available (kilobytes on Linux, bytes on macOS), and not on Windows
+        try:
+            import resource
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            rss_mb = peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+        except ImportError:
+            pass
+    return {"cpu_s": time.process_time(), "rss_mb": rss_mb}
+
+class LaunchRequest:
+    """A command received from a client, answered once with reply()"""
+
+    def __init__(self, command, conn):
+        self.command = command
+        self.received = time.perf_counter()
+        self._conn = conn
+
+    def reply(self, message):
+        if self._conn is None:
+            return
+        try:
+            self._conn.sendall(json.dumps(message).encode() + b"\n")
+        except OSError:
+            pass
+        finally:
+            self._conn.close()
+            self._conn = None
+
+class LauncherServer:
+    """Accepts commands for the resident instance on a background thread
+
+    "status" is answered right away with idle CPU and memory figures, and
+    other commands are refused while a test runs. The rest are handed to
+    on_request, which runs on the accept thread and should only pass them
+    on to the main thread.
+    """
+
+    def __init__(self, data_dir, on_request):
+        self.data_dir = data_dir
+        self.on_request = on_request
+        self.started = time.time()
+        self.launches = 0
+        self.mark_idle()
+
+        if send_command(data_dir, "status", timeout=1.0) is not None:
+            raise OSError("another resident instance is already running")
+
+        if _unix_sockets():
+            path = data_dir / LAUNCHER_SOCKET
+            if path.exists():
+                # Left behind by an instance that did not shut down cleanly
+                path.unlink()
+            self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._sock.bind(str(path))
+            os.chmod(path, 0o600)
+            self.address = str(path)
+        else:
+            self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self._sock.bind(("127.0.0.1", 0))
+            port = self._sock.getsockname()[1]
+            with open(data_dir / LAUNCHER_PORT_FILE, 'w') as f:
+                f.write(str(port))
+            self.address = f"127.0.0.1:{port}"
+
+        self._sock.listen()
+        self._closed = False
+        self._thread = threading.Thread(target=self._serve, name="launcher", daemon=True)
+        self._thread.start()
+
+    def mark_idle(self):
+        self.busy = False
+        self._idle_since = time.time()
+        self._idle_cpu = time.process_time()
+
+    def mark_busy(self):
+        self.busy = True
+        self.launches += 1
+
+    def status(self):
+        stats = process_stats()
+        status = {
+            "pid": os.getpid(),
+            "state": "busy" if self.busy else "idle",
+            "uptime_s": time.time() - self.started,
+            "launches": self.launches,
+            **stats
+        }
+        if not self.busy:
+            idle_s = time.time() - self._idle_since
+            status["idle_s"] = idle_s
+            status["idle_cpu_percent"] = (stats["cpu_s"] - self._idle_cpu) / idle_s * 100 if idle_s > 0 else 0.0
+        return status
+
+    def _serve(self):
+        while not self._closed:
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                break
+
+            try:
+                conn.settimeout(2.0)
+                line = conn.makefile('r').readline()
+                command = json.loads(line)["command"]
+            except (OSError, ValueError, KeyError):
+                conn.close()
+                continue
+
+            request = LaunchRequest(command, conn)
+            if command == "status":
+                request.reply(self.status())
+            elif self.busy:
+                request.reply({"ok": False, "error": "a test is already running"})
+            else:
+                self.on_request(request)
+
+    def close(self):
+        self._closed = True
+        self._sock.close()
+        for name in (LAUNCHER_SOCKET, LAUNCHER_PORT_FILE):
+            try:
+                (self.data_dir / name).unlink()
+            except FileNotFoundError:
+                pass
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Bring up a test in the resident instance started with 'python main.py --resident'")
+    parser.add_argument("command", help="a test (e.g. pvt, dsst, sss), 'menu', 'status' or 'stop'")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    reply = send_command(DataManager().data_dir, args.command)
+    if reply is None:
+        print("No resident instance is running; start one with 'python main.py --resident'")
+        return 1
+
+    if args.command == "status":
+        for key, value in reply.items():
+            print(f"{key}: {value:.2f}" if isinstance(value, float) else f"{key}: {value}")
+    elif reply.get("ok"):
+        if "launch_ms" in reply:
+            print(f"{args.command} up in {reply['launch_ms']:.1f}ms "
+                  f"({(time.perf_counter() - start) * 1000:.1f}ms including the request)")
+    else:
+        print(f"Error: {reply.get('error')}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,13 +1,71 @@
 import pygame
 import sys
-from data_manager import DataManager
-from pvt import run_pvt
+import time
+import argparse
+from data_manager import DataManager, set_runtime_info
+from text_layout import get_layout
+from assets import get_font, registry as font_registry
+from pvt import run_pvt, recover_checkpoint
 from dsst import run_dsst
 from digit_span import run_digit_span
 from stanford_sleepiness import run_stanford_sleepiness_scale
 from subjective_feelings import run_subjective_feelings
-
-# Initialize pygame
+from time_perception import run_time_perception
+from session_setup import run_session_setup
+from battery import run_battery
+from sync import start_sync_worker
+from audio import pre_init_mixer, get_tone
+from display import open_display, measure_flip_interval, describe_display, set_window_visible
+from calibration import run_latency_calibration
+from dashboard import run_dashboard
+from latency_profile import machine_id
+from key_input import configure_key_input
+from launcher import LauncherServer, send_command
+from integrity import IntegrityChecker, describe_problems
+
+# Menu buttons as (label, action), laid out row by row; Exit stays last
+MENU_BUTTONS = [
+    ("Start PVT", "pvt"),
+    ("PVT 10 min", "pvt_10min"),
+    ("Audio PVT", "pvt_auditory"),
+    ("Start DSST", "dsst"),
+    ("Digit Span", "digit_span"),
+    ("Quick Span", "digit_span_adaptive"),
+    ("Sleepiness", "sss"),
+    ("Feelings", "feelings"),
+    ("Time", "time_perception"),
+    ("Battery", "battery"),
+    ("Session", "session"),
+    ("Calibrate", "calibrate"),
+    ("Dashboard", "dashboard"),
+    ("Exit", "exit")
+]
+ACTIONS = [action for _, action in MENU_BUTTONS if action != "exit"]
+
+parser = argparse.ArgumentParser(description="Orexin data collection tool")
+parser.add_argument("test", nargs="?", choices=ACTIONS,
+                    help="run this test and exit, or hand it to the resident instance if one is running")
+parser.add_argument("--resident", action="store_true",
+                    help="stay in the background with the window hidden, bringing up tests sent by launcher.py")
+parser.add_argument("--fullscreen", action="store_true",
+                    help="fullscreen with vsync, bypassing the desktop compositor for lower display latency")
+parser.add_argument("--input", choices=("sdl", "evdev"), default="sdl",
+                    help="where PVT and time perception key presses come from; evdev reads /dev/input "
+                         "with kernel timestamps (Linux, needs read access to the keyboard device)")
+args = parser.parse_args()
+
+# A resident instance has everything loaded already; just hand it the test
+if args.test and not args.resident:
+    reply = send_command(DataManager().data_dir, args.test)
+    if reply is not None:
+        if not reply.get("ok"):
+            print(f"Resident instance: {reply.get('error')}")
+            sys.exit(1)
+        print(f"Started {args.test} in the resident instance ({reply['launch_ms']:.1f}ms)")
+        sys.exit(0)
+
+# Initialize pygame, with a small mixer buffer for the auditory PVT
+pre_init_mixer()
 pygame.init()
 
 # Constants
@@ -19,13 +77,22 @@ BLUE = (70, 130, 180)
 GRAY = (128, 128, 128)
 RED = (220, 20, 60)
 
-# Create the display
-screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+# Create the display; every record notes the mode and the measured flip interval
+screen, display_mode = open_display((SCREEN_WIDTH, SCREEN_HEIGHT), args.fullscreen)
 pygame.display.set_caption("Orexin Data Collection Tool")
+flip_interval_ms, max_flip_interval_ms = measure_flip_interval(screen)
+set_runtime_info("display", describe_display(screen, display_mode, flip_interval_ms, max_flip_interval_ms))
+set_runtime_info("machine", machine_id())
+
+key_input = configure_key_input(args.input)
+set_runtime_info("input", key_input.describe())
+print(f"Display: {display_mode}, flip interval {flip_interval_ms:.2f}ms (max {max_flip_interval_ms:.2f}ms)")
 
-# Font
-font = pygame.font.Font(None, 36)
-title_font = pygame.font.Font(None, 48)
+# Fonts, loaded once for the menu and every test
+preload_seconds = font_registry.preload()
+print(f"Preloaded fonts in {preload_seconds * 1000:.1f}ms")
+font = get_font(36)
+title_font = get_font(48)
 
 def draw_button(surface, text, x, y, width, height, color, text_color):
     """Draw a button with text"""
@@ -42,36 +109,24 @@ def draw_button(surface, text, x, y, width, height, color, text_color):
 # Initialize data manager
 data_manager = DataManager()
 
-def show_error_message(screen, font, title_font, error_msg):
+def show_error_message(screen, font, title_font, error_msg, title="Error", button="Exit"):
     """Display error message and exit button"""
     screen.fill((255, 255, 255))
     
     # Draw error title
-    error_title = title_font.render("Error", True, (255, 0, 0))
+    error_title = title_font.render(title, True, (255, 0, 0))
     error_rect = error_title.get_rect()
     error_rect.centerx = 400
     error_rect.y = 150
     screen.blit(error_title, error_rect)
     
     # Draw error message (word wrap)
-    words = error_msg.split()
-    lines = []
-    current_line = ""
-    
-    for word in words:
-        test_line = current_line + word + " "
-        if font.size(test_line)[0] < 600:
-            current_line = test_line
-        else:
-            if current_line:
-                lines.append(current_line.strip())
-            current_line = word + " "
-    if current_line:
-        lines.append(current_line.strip())
+    layout = get_layout(font, 600)
+    lines = layout.wrap(error_msg)
     
     y_offset = 220
     for line in lines:
-        text_surface = font.render(line, True, (0, 0, 0))
+        text_surface = layout.render(line, (0, 0, 0))
         text_rect = text_surface.get_rect()
         text_rect.centerx = 400
         text_rect.y = y_offset
@@ -83,7 +138,7 @@ def show_error_message(screen, font, title_font, error_msg):
     pygame.draw.rect(screen, (128, 128, 128), exit_button_rect)
     pygame.draw.rect(screen, (0, 0, 0), exit_button_rect, 2)
     
-    exit_text = font.render("Exit", True, (255, 255, 255))
+    exit_text = font.render(button, True, (255, 255, 255))
     exit_text_rect = exit_text.get_rect()
     exit_text_rect.center = exit_button_rect.center
     screen.blit(exit_text, exit_text_rect)
@@ -91,65 +146,114 @@ def show_error_message(screen, font, title_font, error_msg):
     pygame.display.flip()
     return exit_button_rect
 
-def main():
-    # Check data setup before starting
-    error_msg = data_manager.check_data_setup()
-    if error_msg:
-        clock = pygame.time.Clock()
-        running = True
-        
-        while running:
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    running = False
-                elif event.type == pygame.MOUSEBUTTONDOWN:
-                    if event.button == 1:
-                        exit_button_rect = show_error_message(screen, font, title_font, error_msg)
-                        if exit_button_rect.collidepoint(pygame.mouse.get_pos()):
-                            running = False
-            
-            show_error_message(screen, font, title_font, error_msg)
-            clock.tick(60)
-        
-        pygame.quit()
-        sys.exit(1)
-    
+def run_action(action):
+    """Run the test or screen behind a menu action"""
+    if action == "pvt":
+        print("Starting Psychomotor Vigilance Task...")
+        reaction_times = run_pvt(screen, font)
+        print(f"PVT completed. Reaction times: {reaction_times}")
+        print(f"Average reaction time: {sum(reaction_times)/len(reaction_times):.1f}ms" if reaction_times else "No data collected")
+
+    elif action == "pvt_10min":
+        print("Starting 10-minute Psychomotor Vigilance Task...")
+        reaction_times = run_pvt(screen, font, duration_s=600, isi_range=(2.0, 10.0))
+        print(f"PVT completed. {len(reaction_times)} responses")
+        print(f"Average reaction time: {sum(reaction_times)/len(reaction_times):.1f}ms" if reaction_times else "No data collected")
+
+    elif action == "pvt_auditory":
+        print("Starting auditory Psychomotor Vigilance Task...")
+        reaction_times = run_pvt(screen, font, stimulus="auditory")
+        print(f"PVT completed. Reaction times: {reaction_times}")
+        print(f"Average reaction time: {sum(reaction_times)/len(reaction_times):.1f}ms" if reaction_times else "No data collected")
+
+    elif action == "dsst":
+        print("Starting Digit Symbol Substitution Test...")
+        score = run_dsst(screen, font)
+        print(f"DSST completed. Score: {score['correct_count']}/{score['total_attempted']} ({score['accuracy']*100:.1f}%)")
+
+    elif action == "digit_span":
+        print("Starting Digit Span Test...")
+        score = run_digit_span(screen, font)
+        print(f"Digit Span completed. Forward: {score['forward_span']}, Backward: {score['backward_span']}, Total: {score['total_span']}")
+
+    elif action == "digit_span_adaptive":
+        print("Starting adaptive Digit Span Test...")
+        score = run_digit_span(screen, font, adaptive=True)
+        print(f"Digit Span completed. Forward: {score['forward_span']}, Backward: {score['backward_span']}, Total: {score['total_span']}")
+
+    elif action == "sss":
+        print("Starting Stanford Sleepiness Scale...")
+        rating = run_stanford_sleepiness_scale(screen, font)
+        if rating:
+            print(f"Stanford Sleepiness Scale completed. Rating: {rating}/7")
+        else:
+            print("Stanford Sleepiness Scale cancelled")
+
+    elif action == "feelings":
+        print("Starting Subjective Feelings Assessment...")
+        feeling_text = run_subjective_feelings(screen, font)
+        if feeling_text:
+            print(f"Subjective Feelings completed. Text: '{feeling_text}'")
+        else:
+            print("Subjective Feelings cancelled")
+
+    elif action == "time_perception":
+        print("Starting Time Perception Test...")
+        trials = run_time_perception(screen, font)
+        for trial in trials:
+            print(f"Time Perception: target {trial['target_s']}s, produced {trial['produced_s']:.3f}s")
+        if not trials:
+            print("Time Perception cancelled")
+
+    elif action == "battery":
+        print("Starting test battery...")
+        results = run_battery(screen, font)
+        print(f"Battery completed: {', '.join(results) if results else 'no tests run'}")
+
+    elif action == "session":
+        if not run_session_setup(screen, font):
+            print("Session setup cancelled")
+
+    elif action == "calibrate":
+        print("Starting latency calibration...")
+        profile = run_latency_calibration(screen, font)
+        if profile:
+            print(f"PVT reaction times on this machine will be corrected by {profile['correction_ms']:.2f}ms")
+
+    elif action == "dashboard":
+        run_dashboard(screen, font)
+
+def run_menu(sync_worker):
+    """Show the menu until Exit is clicked or the window is closed"""
     clock = pygame.time.Clock()
     running = True
 
-    # Button properties - 2x3 grid
+    # Button properties - 4 column grid
     button_width = 140
     button_height = 50
     button_spacing = 20
+    columns = 4
 
-    # Calculate grid positions (2 columns, 3 rows)
-    grid_width = 2 * button_width + button_spacing
-    grid_height = 3 * button_height + 2 * button_spacing
+    grid_width = columns * button_width + (columns - 1) * button_spacing
     grid_start_x = SCREEN_WIDTH // 2 - grid_width // 2
-    grid_start_y = SCREEN_HEIGHT // 2 - grid_height // 2 + 20
-
-    # Top row
-    pvt_button_x = grid_start_x
-    pvt_button_y = grid_start_y
-
-    dsst_button_x = grid_start_x + button_width + button_spacing
-    dsst_button_y = grid_start_y
+    grid_start_y = 250
 
-    # Middle row
-    digit_span_button_x = grid_start_x
-    digit_span_button_y = grid_start_y + button_height + button_spacing
+    button_rects = {}
+    for i, (label, action) in enumerate(MENU_BUTTONS):
+        row, column = divmod(i, columns)
+        button_rects[action] = pygame.Rect(grid_start_x + column * (button_width + button_spacing),
+                                           grid_start_y + row * (button_height + button_spacing),
+                                           button_width, button_height)
 
-    sss_button_x = grid_start_x + button_width + button_spacing
-    sss_button_y = grid_start_y + button_height + button_spacing
-
-    # Bottom row
-    feelings_button_x = grid_start_x
-    feelings_button_y = grid_start_y + 2 * (button_height + button_spacing)
-
-    exit_button_x = grid_start_x + button_width + button_spacing
-    exit_button_y = grid_start_y + 2 * (button_height + button_spacing)
+    session = data_manager.get_session_context()
+    session_checked = time.monotonic()
 
     while running:
+        if time.monotonic() - session_checked >= 60:
+            # The context expires at midnight and its slot follows the time of day
+            session = data_manager.get_session_context()
+            session_checked = time.monotonic()
+
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 running = False
@@ -157,47 +261,16 @@ def main():
             elif event.type == pygame.MOUSEBUTTONDOWN:
                 if event.button == 1:  # Left mouse button
                     mouse_pos = pygame.mouse.get_pos()
-                    pvt_button_rect = pygame.Rect(pvt_button_x, pvt_button_y, button_width, button_height)
-                    dsst_button_rect = pygame.Rect(dsst_button_x, dsst_button_y, button_width, button_height)
-                    digit_span_button_rect = pygame.Rect(digit_span_button_x, digit_span_button_y, button_width, button_height)
-                    sss_button_rect = pygame.Rect(sss_button_x, sss_button_y, button_width, button_height)
-                    feelings_button_rect = pygame.Rect(feelings_button_x, feelings_button_y, button_width, button_height)
-                    exit_button_rect = pygame.Rect(exit_button_x, exit_button_y, button_width, button_height)
-
-                    if pvt_button_rect.collidepoint(mouse_pos):
-                        print("Starting Psychomotor Vigilance Task...")
-                        reaction_times = run_pvt(screen, font)
-                        print(f"PVT completed. Reaction times: {reaction_times}")
-                        print(f"Average reaction time: {sum(reaction_times)/len(reaction_times):.1f}ms" if reaction_times else "No data collected")
-
-                    elif dsst_button_rect.collidepoint(mouse_pos):
-                        print("Starting Digit Symbol Substitution Test...")
-                        score = run_dsst(screen, font)
-                        print(f"DSST completed. Score: {score['correct_count']}/{score['total_attempted']} ({score['accuracy']*100:.1f}%)")
-
-                    elif digit_span_button_rect.collidepoint(mouse_pos):
-                        print("Starting Digit Span Test...")
-                        score = run_digit_span(screen, font)
-                        print(f"Digit Span completed. Forward: {score['forward_span']}, Backward: {score['backward_span']}, Total: {score['total_span']}")
-
-                    elif sss_button_rect.collidepoint(mouse_pos):
-                        print("Starting Stanford Sleepiness Scale...")
-                        rating = run_stanford_sleepiness_scale(screen, font)
-                        if rating:
-                            print(f"Stanford Sleepiness Scale completed. Rating: {rating}/7")
-                        else:
-                            print("Stanford Sleepiness Scale cancelled")
-
-                    elif feelings_button_rect.collidepoint(mouse_pos):
-                        print("Starting Subjective Feelings Assessment...")
-                        feeling_text = run_subjective_feelings(screen, font)
-                        if feeling_text:
-                            print(f"Subjective Feelings completed. Text: '{feeling_text}'")
-                        else:
-                            print("Subjective Feelings cancelled")
-
-                    elif exit_button_rect.collidepoint(mouse_pos):
+                    clicked = [action for action, rect in button_rects.items() if rect.collidepoint(mouse_pos)]
+
+                    if clicked == ["exit"]:
                         running = False
+                    elif clicked:
+                        run_action(clicked[0])
+                        session = data_manager.get_session_context()
+                        session_checked = time.monotonic()
+                        if sync_worker:
+                            sync_worker.request_sync()
 
         # Fill screen with white background
         screen.fill(WHITE)
@@ -206,38 +279,161 @@ def main():
         title_text = title_font.render("Orexin Data Collection", True, BLACK)
         title_rect = title_text.get_rect()
         title_rect.centerx = SCREEN_WIDTH // 2
-        title_rect.y = 150
+        title_rect.y = 100
         screen.blit(title_text, title_rect)
 
         # Draw subtitle
         subtitle_text = font.render("Psychological Testing Suite", True, GRAY)
         subtitle_rect = subtitle_text.get_rect()
         subtitle_rect.centerx = SCREEN_WIDTH // 2
-        subtitle_rect.y = 200
+        subtitle_rect.y = 150
         screen.blit(subtitle_text, subtitle_rect)
 
-        # Draw PVT button
-        draw_button(screen, "Start PVT", pvt_button_x, pvt_button_y, button_width, button_height, BLUE, WHITE)
+        # Draw the session that new records will be stamped with
+        session_label = session.describe() if session else "No session set - click Session"
+        session_text = font.render(session_label, True, BLUE if session else RED)
+        session_rect = session_text.get_rect()
+        session_rect.centerx = SCREEN_WIDTH // 2
+        session_rect.y = 195
+        screen.blit(session_text, session_rect)
 
-        # Draw DSST button
-        draw_button(screen, "Start DSST", dsst_button_x, dsst_button_y, button_width, button_height, BLUE, WHITE)
+        # Draw buttons (exit in a different color)
+        for label, action in MENU_BUTTONS:
+            rect = button_rects[action]
+            color = RED if action == "exit" else BLUE
+            draw_button(screen, label, rect.x, rect.y, rect.width, rect.height, color, WHITE)
 
-        # Draw Digit Span button
-        draw_button(screen, "Digit Span", digit_span_button_x, digit_span_button_y, button_width, button_height, BLUE, WHITE)
+        # Update display
+        pygame.display.flip()
+        clock.tick(60)
 
-        # Draw SSS button
-        draw_button(screen, "Sleepiness", sss_button_x, sss_button_y, button_width, button_height, BLUE, WHITE)
+# Posted to the main thread for every command a client sends to the resident instance
+LAUNCH_EVENT = pygame.event.custom_type()
 
-        # Draw Feelings button
-        draw_button(screen, "Feelings", feelings_button_x, feelings_button_y, button_width, button_height, BLUE, WHITE)
+def run_resident(sync_worker):
+    """Wait in the background with the window hidden and bring up tests on request
 
-        # Draw exit button (different color on the right)
-        draw_button(screen, "Exit", exit_button_x, exit_button_y, button_width, button_height, RED, WHITE)
+    Everything a test needs (SDL, fonts, the tone, the data directory) stays
+    initialized, so a launch only has to show the window. The main thread
+    sleeps in pygame.event.wait() between launches.
+    """
+    global screen
+    size = (SCREEN_WIDTH, SCREEN_HEIGHT)
+    # Synthesize the auditory PVT's tone now rather than at the first launch
+    get_tone()
 
-        # Update display
-        pygame.display.flip()
+    def on_request(request):
+        pygame.event.post(pygame.event.Event(LAUNCH_EVENT, request=request))
+
+    try:
+        server = LauncherServer(data_manager.data_dir, on_request)
+    except OSError as e:
+        print(f"Cannot start resident mode: {e}")
+        return
+
+    screen = set_window_visible(size, display_mode, False)
+    print(f"Resident and hidden, listening on {server.address}")
+
+    try:
+        while True:
+            event = pygame.event.wait()
+            if event.type == pygame.QUIT:
+                break
+            if event.type != LAUNCH_EVENT:
+                continue
+
+            request = event.request
+            if request.command == "stop":
+                request.reply({"ok": True})
+                break
+            if request.command not in ACTIONS + ["menu"]:
+                request.reply({"ok": False, "error": f"unknown test '{request.command}'"})
+                continue
+
+            server.mark_busy()
+            screen = set_window_visible(size, display_mode, True)
+            # Drop input that arrived while hidden
+            pygame.event.clear()
+            request.reply({"ok": True, "launch_ms": (time.perf_counter() - request.received) * 1000})
+
+            if request.command == "menu":
+                run_menu(sync_worker)
+            else:
+                run_action(request.command)
+                if sync_worker:
+                    sync_worker.request_sync()
+
+            screen = set_window_visible(size, display_mode, False)
+            server.mark_idle()
+    finally:
+        server.close()
+
+def show_integrity_warning(message):
+    """Show damaged records until the Continue button is clicked"""
+    clock = pygame.time.Clock()
+    while True:
+        button_rect = show_error_message(screen, font, title_font, message, title="Damaged data", button="Continue")
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                return
+            if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1 and button_rect.collidepoint(event.pos):
+                return
         clock.tick(60)
 
+def main():
+    # Check data setup before starting
+    error_msg = data_manager.check_data_setup()
+    if error_msg:
+        clock = pygame.time.Clock()
+        running = True
+        
+        while running:
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    running = False
+                elif event.type == pygame.MOUSEBUTTONDOWN:
+                    if event.button == 1:
+                        exit_button_rect = show_error_message(screen, font, title_font, error_msg)
+                        if exit_button_rect.collidepoint(pygame.mouse.get_pos()):
+                            running = False
+            
+            show_error_message(screen, font, title_font, error_msg)
+            clock.tick(60)
+        
+        pygame.quit()
+        sys.exit(1)
+
+    # Detect records damaged since the last start; the checkpoint limits this to new records.
+    # In-process, as worker processes would rerun this module's setup where they are spawned.
+    try:
+        problems = describe_problems(IntegrityChecker(data_manager, workers=1).verify())
+    except OSError as e:
+        problems = [str(e)]
+    if problems:
+        for problem in problems:
+            print(f"Damaged data: {problem}")
+        shown = problems[:5] + ([f"... and {len(problems) - 5} more"] if len(problems) > 5 else [])
+        show_integrity_warning(" ".join(shown) + " Run 'python integrity.py' for details.")
+
+    # Keep the partial results of a PVT session that crashed last time
+    recover_checkpoint(data_manager)
+
+    # Upload new records in the background if a collector is configured
+    sync_worker = start_sync_worker(data_manager)
+    if sync_worker:
+        sync_worker.request_sync()
+
+    if args.resident:
+        run_resident(sync_worker)
+    elif args.test:
+        run_action(args.test)
+    else:
+        run_menu(sync_worker)
+
+    if sync_worker:
+        sync_worker.stop()
+    key_input.stop()
+
     pygame.quit()
     sys.exit()
 
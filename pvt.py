@@ -2,22 +2,220 @@ import pygame
 import random
 import time
 import sys
+import json
+import os
+import queue
+import threading
+from array import array
 from data_manager import DataManager
+from audio import get_tone, mixer_settings
+from stimulus_timing import sleep_until
+from latency_profile import current_profile, apply_correction
+from key_input import get_key_input
+from scoring import score_pvt
+
+CHECKPOINT_FILE = "pvt_checkpoint.json"
+
+CORRECT = 0
+FALSE_START = 1
+RESPONSE_TYPES = {CORRECT: 'correct', FALSE_START: 'false_start'}
+
+# The frame loop runs at 60 FPS; a tone due within the next frame is waited for
+FRAME_S = 1 / 60
+
+class ResponseBuffer:
+    """Preallocated, column-wise storage of PVT responses
+
+    Each response takes 37 bytes in typed arrays instead of a dict per
+    response. The capacity doubles if a session produces more responses
+    than estimated (e.g. many false starts).
+    """
+
+    def __init__(self, capacity):
+        self.capacity = max(capacity, 16)
+        self.count = 0
+        self.trial = array('I', bytes(4 * self.capacity))
+        self.kind = array('b', bytes(self.capacity))
+        self.value_ms = array('d', bytes(8 * self.capacity))
+        self.timestamp = array('d', bytes(8 * self.capacity))
+        # When the stimulus was due and when it was actually presented (0 for false starts)
+        self.scheduled = array('d', bytes(8 * self.capacity))
+        self.onset = array('d', bytes(8 * self.capacity))
+
+    def columns(self):
+        return self.trial, self.kind, self.value_ms, self.timestamp, self.scheduled, self.onset
+
+    def append(self, trial, kind, value_ms, timestamp, scheduled=0.0, onset=0.0):
+        if self.count == self.capacity:
+            for column in self.columns():
+                column.extend(column)
+            self.capacity *= 2
+
+        i = self.count
+        self.trial[i] = trial
+        self.kind[i] = kind
+        self.value_ms[i] = value_ms
+        self.timestamp[i] = timestamp
+        self.scheduled[i] = scheduled
+        self.onset[i] = onset
+        self.count += 1
+
+    def snapshot(self):
+        """Copy the filled part of every column (a fast memcpy, safe to hand to another thread)"""
+        n = self.count
+        return tuple(column[:n] for column in self.columns())
+
+def build_record(columns, settings):
+    """Turn buffer columns into the saved PVT record"""
+    trials, kinds, values, timestamps, scheduled, onsets = columns
+    reaction_times = [value for kind, value in zip(kinds, values) if kind == CORRECT]
+    false_starts = [value for kind, value in zip(kinds, values) if kind == FALSE_START]
+
+    all_responses = []
+    for trial, kind, value, timestamp, due, onset in zip(trials, kinds, values, timestamps, scheduled, onsets):
+        response = {'trial': trial, 'type': RESPONSE_TYPES[kind]}
+        if kind == CORRECT:
+            response['reaction_time_ms'] = value
+            response['stimulus_scheduled'] = due
+            response['stimulus_onset'] = onset
+            response['stimulus_lateness_ms'] = (onset - due) * 1000
+        else:
+            response['time_since_wait_start_ms'] = value
+        response['timestamp'] = timestamp
+        all_responses.append(response)
+
+    data = {
+        "test_type": "psychomotor_vigilance_task",
+        **settings,
+        "completed_trials": len(reaction_times),
+        "false_starts": len(false_starts),
+        "total_responses": len(all_responses),
+        "reaction_times_ms": reaction_times,
+        "false_start_times_ms": false_starts,
+        "all_responses": all_responses
+    }
+
+    # Add statistics for valid reaction times
+    data.update(score_pvt(data))
+    return data
+
+class CheckpointWriter:
+    """Writes partial PVT results to disk on a background thread"""
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self._queue = queue.Queue(maxsize=1)
+        self._thread = threading.Thread(target=self._run, name="pvt-checkpoint", daemon=True)
+        self._thread.start()
+
+    def submit(self, columns, settings):
+        """Queue a snapshot; if the previous one is still being written, skip this one
+
+        The session is still running, so if it is recovered from this
+        snapshot it is saved as aborted.
+        """
+        try:
+            self._queue.put_nowait((columns, {**settings, "aborted": True}))
+        except queue.Full:
+            pass
+
+    def close(self, remove=True, final=None):
+        """Stop the writer; remove the checkpoint once the full result is saved
+
+        A final (columns, settings) snapshot is written before stopping, so a
+        session whose save failed is left complete in the checkpoint, marked
+        aborted only if its settings say so.
+        """
+        if final is not None:
+            self._queue.put(final)
+        self._queue.put(None)
+        self._thread.join()
+        if remove:
+            try:
+                self.filepath.unlink()
+            except FileNotFoundError:
+                pass
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+
+            columns, settings = item
+            record = build_record(columns, {**settings, "checkpoint_time": time.time()})
+            temp_path = self.filepath.with_name(self.filepath.name + ".tmp")
+            try:
+                with open(temp_path, 'w') as f:
+                    json.dump(record, f)
+                os.replace(temp_path, self.filepath)
+            except OSError as e:
+                print(f"Error writing PVT checkpoint: {e}")
+
+def recover_checkpoint(data_manager):
+    """Save the partial results of a PVT session that crashed before finishing"""
+    filepath = data_manager.data_dir / CHECKPOINT_FILE
+    if not filepath.exists():
+        return None
+
+    try:
+        with open(filepath, 'r') as f:
+            data = json.load(f)
+        data["recovered_from_checkpoint"] = True
+        saved_path = data_manager.save_test_data('pvt', data)
+        filepath.unlink()
+        print(f"Recovered interrupted PVT session into {saved_path}")
+        return data
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"Error recovering PVT checkpoint: {e}")
+        return None
+
+def remove_checkpoint(data_manager):
+    """Drop the checkpoint once the session it holds is saved (e.g. by a battery commit)"""
+    (data_manager.data_dir / CHECKPOINT_FILE).unlink(missing_ok=True)
 
 class PsychomotorVigilanceTask:
-    def __init__(self, screen, font):
+    def __init__(self, screen, font, data_manager=None, duration_s=None, isi_range=(1.0, 3.0),
+                 isi_distribution="uniform", max_trials=10, checkpoint_interval_s=10.0, stimulus="visual"):
         self.screen = screen
         self.font = font
+        self.data_manager = data_manager or DataManager()
+        self.key_input = get_key_input()
         self.running = True
-        self.reaction_times = []
+        self.aborted = False
         self.trial_count = 0
-        self.max_trials = 10
+        self.false_start_count = 0
+        self.rt_sum = 0.0
+        self.last_rt = None
         self.waiting_for_stimulus = False
         self.stimulus_start_time = 0
+        self.stimulus_scheduled_time = 0
         self.stimulus_shown = False
         self.wait_start_time = 0
-        self.false_starts = []
-        self.all_responses = []
+        self.start_time = 0
+
+        # Trial-bounded (default) or time-bounded (clinical 3 or 10 minute) session
+        self.duration_s = duration_s
+        self.max_trials = max_trials
+        self.isi_range = isi_range
+        self.isi_distribution = isi_distribution
+        self.checkpoint_interval_s = checkpoint_interval_s
+
+        # Visual (red circle) or auditory (tone, e.g. for eyes-closed runs) stimulus
+        self.stimulus = stimulus
+        self.tone = None
+        if stimulus == "auditory":
+            self.tone = get_tone()
+            if self.tone is None:
+                print("No audio output available, running the visual PVT instead")
+                self.stimulus = "visual"
+
+        if duration_s:
+            expected = int(duration_s / isi_range[0]) + 1
+        else:
+            expected = max_trials
+        # Room for a false start per trial before the buffer has to grow
+        self.responses = ResponseBuffer(2 * expected)
 
         # Colors
         self.WHITE = (255, 255, 255)
@@ -25,104 +223,161 @@ class PsychomotorVigilanceTask:
         self.RED = (255, 0, 0)
         self.GREEN = (0, 255, 0)
 
-        # Stimulus wait time (2-10 seconds)
-        self.next_stimulus_delay = random.uniform(1.0, 3.0)
+        self.next_stimulus_delay = self.draw_isi()
+
+    @property
+    def reaction_times(self):
+        _, kinds, values, *_ = self.responses.snapshot()
+        return [value for kind, value in zip(kinds, values) if kind == CORRECT]
+
+    def draw_isi(self):
+        """Draw the delay before the next stimulus from the configured distribution"""
+        low, high = self.isi_range
+        if self.isi_distribution == "exponential":
+            # Non-aging foreperiod: constant hazard, truncated to the range
+            return min(high, low + random.expovariate(1.0 / ((high - low) / 2)))
+        return random.uniform(low, high)
+
+    def settings(self):
+        settings = {
+            "mode": "duration" if self.duration_s else "trials",
+            "duration_s": self.duration_s,
+            "max_trials": None if self.duration_s else self.max_trials,
+            "isi_range_s": list(self.isi_range),
+            "isi_distribution": self.isi_distribution,
+            "stimulus": self.stimulus,
+            "input_backend": self.key_input.name
+        }
+        if self.tone is not None:
+            settings["audio"] = mixer_settings()
+        return settings
+
+    def record_settings(self):
+        """settings() as saved with the responses, noting a session cut short"""
+        settings = self.settings()
+        if self.aborted:
+            settings["aborted"] = True
+        return settings
+
+    def session_over(self, now):
+        if self.duration_s:
+            return now - self.start_time >= self.duration_s
+        return self.trial_count >= self.max_trials
 
     def run(self):
         clock = pygame.time.Clock()
-        self.wait_start_time = time.time()
+        self.start_time = time.time()
+        self.wait_start_time = self.start_time
+        checkpoint = CheckpointWriter(self.data_manager.data_dir / CHECKPOINT_FILE)
+        last_checkpoint = self.start_time
+
+        try:
+            self.run_trials(clock, checkpoint, last_checkpoint)
+        except BaseException:
+            # Cut short by an error: what was collected is saved as an aborted session
+            self.aborted = True
+            raise
+        finally:
+            # Save whatever was collected, including after ESC or closing the window.
+            # The checkpoint stays, to be recovered on the next start, if that fails
+            # and in a battery until the battery commits its records.
+            saved = self.save_data()
+            if not self.responses.count or (saved and not self.data_manager.in_batch()):
+                checkpoint.close()
+            else:
+                checkpoint.close(remove=False, final=(self.responses.snapshot(), self.record_settings()))
 
-        while self.running and self.trial_count < self.max_trials:
+        return self.reaction_times
+
+    def run_trials(self, clock, checkpoint, last_checkpoint):
+        while self.running and not self.session_over(time.time()):
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
                     self.running = False
-                    return self.reaction_times
+                    self.aborted = True
+                    return
 
-                elif event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_SPACE:
-                        current_time = time.time()
+                press = self.key_input.key_press(event)
+                if press is not None:
+                    if press.key == pygame.K_SPACE:
+                        # Wall-clock time of the press itself, which may precede this frame
+                        current_time = time.time() - (time.perf_counter_ns() - press.time_ns) / 1e9
 
-                        if self.stimulus_shown:
+                        # Classified by when the key went down, not when the press is read: with
+                        # evdev a press just before onset may only be dequeued after it
+                        if self.stimulus_shown and current_time >= self.stimulus_start_time:
                             # Calculate reaction time
                             reaction_time = (current_time - self.stimulus_start_time) * 1000
-                            self.reaction_times.append(reaction_time)
-                            self.all_responses.append({
-                                'trial': self.trial_count + 1,
-                                'type': 'correct',
-                                'reaction_time_ms': reaction_time,
-                                'timestamp': current_time
-                            })
+                            self.responses.append(self.trial_count + 1, CORRECT, reaction_time, current_time,
+                                                  self.stimulus_scheduled_time, self.stimulus_start_time)
+                            self.rt_sum += reaction_time
+                            self.last_rt = reaction_time
                             self.trial_count += 1
 
                             # Reset for next trial
                             self.stimulus_shown = False
                             self.waiting_for_stimulus = False
-                            self.next_stimulus_delay = random.uniform(1.0, 3.0)
+                            self.next_stimulus_delay = self.draw_isi()
                             self.wait_start_time = current_time
 
                         else:
                             # Premature response (false start)
                             false_start_time = current_time - self.wait_start_time
-                            self.false_starts.append(false_start_time * 1000)
-                            self.all_responses.append({
-                                'trial': self.trial_count + 1,
-                                'type': 'false_start',
-                                'time_since_wait_start_ms': false_start_time * 1000,
-                                'timestamp': current_time
-                            })
-
-                            # Reset wait time for this trial
+                            self.responses.append(self.trial_count + 1, FALSE_START, false_start_time * 1000, current_time)
+                            self.false_start_count += 1
+
+                            # Reset wait time for this trial, withdrawing a stimulus shown after the press
+                            self.stimulus_shown = False
                             self.wait_start_time = current_time
-                            self.next_stimulus_delay = random.uniform(1.0, 3.0)
+                            self.next_stimulus_delay = self.draw_isi()
 
-                    elif event.key == pygame.K_ESCAPE:
+                    elif press.key == pygame.K_ESCAPE:
                         self.running = False
-                        return self.reaction_times
+                        self.aborted = True
+                        return
 
             # Check if it's time to show stimulus
+            now = time.time()
             if not self.stimulus_shown and not self.waiting_for_stimulus:
-                if time.time() - self.wait_start_time >= self.next_stimulus_delay:
+                scheduled = self.wait_start_time + self.next_stimulus_delay
+                if self.tone is not None and scheduled - now < FRAME_S:
+                    # Play the tone on time instead of at the next frame
+                    sleep_until(time.perf_counter() + (scheduled - now))
+                    now = time.time()
+                if now >= scheduled:
                     self.stimulus_shown = True
+                    self.stimulus_scheduled_time = scheduled
                     self.stimulus_start_time = time.time()
+                    if self.tone is not None:
+                        self.tone.play()
+
+            # Hand a copy of the responses to the checkpoint thread now and then
+            if now - last_checkpoint >= self.checkpoint_interval_s and self.responses.count:
+                checkpoint.submit(self.responses.snapshot(), self.settings())
+                last_checkpoint = now
 
             # Draw screen
             self.draw()
             pygame.display.flip()
             clock.tick(60)
 
-        self.save_data()
-        return self.reaction_times
-
     def save_data(self):
-        if not self.reaction_times and not self.false_starts:
-            return
-
-        # Prepare data
-        data = {
-            "test_type": "psychomotor_vigilance_task",
-            "completed_trials": len(self.reaction_times),
-            "false_starts": len(self.false_starts),
-            "total_responses": len(self.all_responses),
-            "reaction_times_ms": self.reaction_times,
-            "false_start_times_ms": self.false_starts,
-            "all_responses": self.all_responses
-        }
+        """Save the session's responses; returns whether they are safely saved"""
+        if not self.responses.count:
+            return True
 
-        # Add statistics for valid reaction times
-        if self.reaction_times:
-            data.update({
-                "mean_rt_ms": sum(self.reaction_times) / len(self.reaction_times),
-                "min_rt_ms": min(self.reaction_times),
-                "max_rt_ms": max(self.reaction_times)
-            })
+        data = build_record(self.responses.snapshot(), self.record_settings())
+        # Subtract this machine's measured input and display delay, if calibrated
+        data = apply_correction(data, current_profile(self.data_manager))
 
         # Save to file using DataManager
         try:
-            data_manager = DataManager()
-            filepath = data_manager.save_test_data('pvt', data)
+            filepath = self.data_manager.save_test_data('pvt', data)
             print(f"PVT data saved to {filepath}")
+            return True
         except Exception as e:
             print(f"Error saving PVT data: {e}")
+            return False
 
     def draw(self):
         self.screen.fill(self.WHITE)
@@ -136,11 +391,18 @@ class PsychomotorVigilanceTask:
 
         # Instructions
         if self.trial_count == 0:
-            instructions = [
-                "Press SPACE as quickly as possible when you see the red circle",
-                "Do NOT press before the circle appears",
-                "ESC to quit"
-            ]
+            if self.tone is not None:
+                instructions = [
+                    "Press SPACE as quickly as possible when you hear the tone",
+                    "Do NOT press before the tone (eyes may stay closed)",
+                    "ESC to quit"
+                ]
+            else:
+                instructions = [
+                    "Press SPACE as quickly as possible when you see the red circle",
+                    "Do NOT press before the circle appears",
+                    "ESC to quit"
+                ]
             for i, instruction in enumerate(instructions):
                 text = self.font.render(instruction, True, self.BLACK)
                 text_rect = text.get_rect()
@@ -148,15 +410,26 @@ class PsychomotorVigilanceTask:
                 text_rect.y = 150 + i * 30
                 self.screen.blit(text, text_rect)
 
-        # Trial counter
-        trial_text = self.font.render(f"Trial: {self.trial_count + 1}/{self.max_trials}", True, self.BLACK)
+        # Trial counter, or remaining time in a time-bounded session
+        if self.duration_s:
+            remaining = max(0, self.duration_s - (time.time() - self.start_time))
+            counter = f"Time left: {int(remaining) // 60}:{int(remaining) % 60:02d}"
+        else:
+            counter = f"Trial: {self.trial_count + 1}/{self.max_trials}"
+        trial_text = self.font.render(counter, True, self.BLACK)
         trial_rect = trial_text.get_rect()
         trial_rect.x = 20
         trial_rect.y = 20
         self.screen.blit(trial_text, trial_rect)
 
-        # Show stimulus (red circle) or waiting message
-        if self.stimulus_shown:
+        # Show stimulus (red circle) or waiting message; the auditory mode shows no stimulus
+        if self.tone is not None:
+            wait_text = self.font.render("Listen for the tone...", True, self.BLACK)
+            wait_rect = wait_text.get_rect()
+            wait_rect.centerx = self.screen.get_width() // 2
+            wait_rect.y = self.screen.get_height() // 2
+            self.screen.blit(wait_text, wait_rect)
+        elif self.stimulus_shown:
             pygame.draw.circle(self.screen, self.RED,
                              (self.screen.get_width() // 2, self.screen.get_height() // 2), 50)
 
@@ -173,21 +446,23 @@ class PsychomotorVigilanceTask:
             self.screen.blit(wait_text, wait_rect)
 
         # Show recent reaction times
-        if self.reaction_times:
-            recent_text = self.font.render(f"Last RT: {self.reaction_times[-1]:.0f}ms", True, self.BLACK)
+        if self.last_rt is not None:
+            recent_text = self.font.render(f"Last RT: {self.last_rt:.0f}ms", True, self.BLACK)
             recent_rect = recent_text.get_rect()
             recent_rect.x = 20
             recent_rect.y = 50
             self.screen.blit(recent_text, recent_rect)
 
-            if len(self.reaction_times) > 1:
-                avg_rt = sum(self.reaction_times) / len(self.reaction_times)
+            if self.trial_count > 1:
+                avg_rt = self.rt_sum / self.trial_count
                 avg_text = self.font.render(f"Avg RT: {avg_rt:.0f}ms", True, self.BLACK)
                 avg_rect = avg_text.get_rect()
                 avg_rect.x = 20
                 avg_rect.y = 80
                 self.screen.blit(avg_text, avg_rect)
 
-def run_pvt(screen, font):
-    pvt = PsychomotorVigilanceTask(screen, font)
-    return pvt.run()
\ No newline at end of file
+def run_pvt(screen, font, data_manager=None, duration_s=None, isi_range=(1.0, 3.0), isi_distribution="uniform",
+            stimulus="visual"):
+    pvt = PsychomotorVigilanceTask(screen, font, data_manager, duration_s, isi_range, isi_distribution,
+                                   stimulus=stimulus)
+    return pvt.run()
@@ -0,0 +1,275 @@
+import os
+import sys
+import html
+import json
+import time
+import hashlib
+import argparse
+import statistics
+from datetime import datetime
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from data_manager import DataManager
+from latency_profile import load_profiles
+from scoring import ScoreCache
+from analysis import scored_sessions
+from series import (SERIES_METRICS, SERIES_TESTS, CONDITIONS, BLINDED, load_condition_lookup, session_points,
+                    lttb, group_color)
+
+# Rendered charts, one SVG file per content hash
+REPORT_CACHE_DIR = "report_cache"
+
+# Part of every chart's hash; bump when render_chart draws differently so cached charts are redrawn
+CHART_VERSION = 1
+
+# Points per line in the overview charts; block charts show every session
+OVERVIEW_POINTS = 400
+
+# Block of records saved without session metadata
+UNSTAMPED_BLOCK = "unstamped"
+
+CHART_WIDTH = 360
+CHART_HEIGHT = 200
+
+STYLE = """
+body { font-family: sans-serif; margin: 2em auto; max-width: 1150px; color: #222; }
+h2 { border-bottom: 1px solid #ccc; padding-bottom: 0.2em; margin-top: 2em; }
+.charts { display: flex; flex-wrap: wrap; gap: 10px; }
+table { border-collapse: collapse; margin: 1em 0; font-size: 0.9em; }
+th, td { border: 1px solid #ddd; padding: 4px 8px; text-align: right; }
+th:first-child, td:first-child { text-align: left; }
+.legend span { margin-right: 1.5em; }
+.swatch { display: inline-block; width: 20px; height: 3px; vertical-align: middle; margin-right: 4px; }
+.meta { color: #666; }
+"""
+
+def collect_sessions(data_manager, workers=None):
+    """{metric: [(block, group, time, value)]} for every session of the plotted tests"""
+    lookup = load_condition_lookup(data_manager.data_dir)
+    profiles = load_profiles(data_manager)
+    cache = ScoreCache(data_manager, workers)
+    sessions = {}
+    for test_name in SERIES_TESTS:
+        records = scored_sessions(cache, test_name, data_manager.load_test_data(test_name), profiles)
+        for metric, group, when, value, record in session_points(test_name, records, lookup):
+            block = (record.get("session") or {}).get("block_id") or UNSTAMPED_BLOCK
+            sessions.setdefault(metric, []).append((block, group, when.timestamp(), value))
+    cache.save()
+    return sessions
+
+def _series(points):
+    """{group: [[time, value]]} sorted by time"""
+    series = {}
+    for _, group, timestamp, value in sorted(points, key=lambda point: point[2]):
+        series.setdefault(group, []).append([timestamp, value])
+    return series
+
+def _block_order(block):
+    # Unstamped records last, numbered blocks in numeric order
+    return (block == UNSTAMPED_BLOCK, not block.isdigit(), int(block) if block.isdigit() else 0, block)
+
+def chart_specs(sessions):
+    """{section: [chart spec]}: an overview section, then one per block
+
+    A spec holds everything its chart is drawn from, so its hash changes
+    exactly when the chart would.
+    """
+    sections = {"Overview": []}
+    blocks = sorted({point[0] for points in sessions.values() for point in points}, key=_block_order)
+    for block in blocks:
+        sections[block] = []
+
+    for metric, label, _ in SERIES_METRICS:
+        points = sessions.get(metric, [])
+        if not points:
+            continue
+        overview = {group: lttb(series, OVERVIEW_POINTS) for group, series in _series(points).items()}
+        sections["Overview"].append({"title": label, "series": overview})
+        for block in blocks:
+            block_points = [point for point in points if point[0] == block]
+            if block_points:
+                sections[block].append({"title": f"{label}, block {block}", "series": _series(block_points)})
+    return sections
+
+def chart_key(spec):
+    canonical = json.dumps([CHART_VERSION, spec], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+def _format_value(value):
+    return f"{value:.0f}" if abs(value) >= 100 or value == int(value) else f"{value:.1f}"
+
+def render_chart(spec):
+    """SVG line chart of a spec, one line per condition/slot group"""
+    left, right, top, bottom = 44, 10, 24, 22
+    plot_width = CHART_WIDTH - left - right
+    plot_height = CHART_HEIGHT - top - bottom
+
+    points = [point for series in spec["series"].values() for point in series]
+    x_low, x_high = min(x for x, _ in points), max(x for x, _ in points)
+    y_low, y_high = min(y for _, y in points), max(y for _, y in points)
+    if x_high == x_low:
+        x_low, x_high = x_low - 43200, x_high + 43200
+    if y_high == y_low:
+        y_low, y_high = y_low - 1, y_high + 1
+
+    def position(x, y):
+        return (left + (x - x_low) / (x_high - x_low) * plot_width,
+                top + plot_height - (y - y_low) / (y_high - y_low) * plot_height)
+
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{CHART_WIDTH}" height="{CHART_HEIGHT}" '
+        f'viewBox="0 0 {CHART_WIDTH} {CHART_HEIGHT}" font-family="sans-serif" font-size="11">',
+        f'<text x="4" y="14" font-size="13" font-weight="bold">{html.escape(spec["title"])}</text>',
+        f'<path d="M{left},{top} V{top + plot_height} H{left + plot_width}" stroke="#888" fill="none"/>',
+        f'<text x="{left - 4}" y="{top + 4}" text-anchor="end" fill="#666">{_format_value(y_high)}</text>',
+        f'<text x="{left - 4}" y="{top + plot_height}" text-anchor="end" fill="#666">{_format_value(y_low)}</text>'
+    ]
+    for x, anchor in ((x_low, "start"), (x_high, "end")):
+        label = datetime.fromtimestamp(x).strftime("%Y-%m-%d")
+        parts.append(f'<text x="{position(x, y_low)[0]:.1f}" y="{CHART_HEIGHT - 6}" text-anchor="{anchor}" '
+                     f'fill="#666">{label}</text>')
+
+    for group, series in sorted(spec["series"].items()):
+        color = "rgb({},{},{})".format(*group_color(group))
+        coordinates = [position(x, y) for x, y in series]
+        if len(coordinates) > 1:
+            path = " ".join(f"{x:.1f},{y:.1f}" for x, y in coordinates)
+            parts.append(f'<polyline points="{path}" stroke="{color}" stroke-width="1.5" fill="none"/>')
+        else:
+            x, y = coordinates[0]
+            parts.append(f'<circle cx="{x:.1f}" cy="{y:.1f}" r="3" fill="{color}"/>')
+    parts.append("</svg>")
+    return "\n".join(parts)
+
+def render_charts(specs, cache_dir, workers=None, use_cache=True):
+    """{key: SVG} for specs, rendering in parallel only charts not in cache_dir; returns (charts, rendered)"""
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    charts = {}
+    missing = {}
+    for spec in specs:
+        key = chart_key(spec)
+        filepath = cache_dir / f"{key}.svg"
+        if use_cache and filepath.exists():
+            charts[key] = filepath.read_text()
+        else:
+            missing[key] = spec
+
+    jobs = list(missing.items())
+    if workers == 1 or len(jobs) < 2:
+        rendered = [render_chart(spec) for _, spec in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            chunksize = max(1, len(jobs) // (4 * (workers or os.cpu_count() or 1)))
+            rendered = list(executor.map(render_chart, [spec for _, spec in jobs], chunksize=chunksize))
+
+    for (key, _), svg in zip(jobs, rendered):
+        try:
+            (cache_dir / f"{key}.svg").write_text(svg)
+        except OSError as e:
+            raise OSError(f"Error saving chart to '{cache_dir}': {e}")
+        charts[key] = svg
+
+    # Charts of data that changed since are not needed again
+    for filepath in cache_dir.glob("*.svg"):
+        if filepath.stem not in charts:
+            filepath.unlink()
+    return charts, len(jobs)
+
+def _summary(values):
+    if not values:
+        return ""
+    spread = f" ± {_format_value(statistics.stdev(values))}" if len(values) > 1 else ""
+    return f"{_format_value(statistics.mean(values))}{spread} (n={len(values)})"
+
+def summary_table(sessions, block=None):
+    """HTML table of mean ± SD per metric and group, with the orexin − placebo difference once unblinded"""
+    values = {}
+    for metric, points in sessions.items():
+        for point_block, group, _, value in points:
+            if block is None or point_block == block:
+                values.setdefault(metric, {}).setdefault(group, []).append(value)
+    groups = sorted({group for metric_values in values.values() for group in metric_values})
+    unblinded = all(any(group.startswith(f"{condition}/") for group in groups) for condition in CONDITIONS)
+
+    header = "".join(f"<th>{html.escape(group)}</th>" for group in groups)
+    if unblinded:
+        header += "<th>orexin − placebo</th>"
+    rows = [f"<tr><th>Metric</th>{header}</tr>"]
+    for metric, label, _ in SERIES_METRICS:
+        if metric not in values:
+            continue
+        cells = "".join(f"<td>{_summary(values[metric].get(group, []))}</td>" for group in groups)
+        if unblinded:
+            means = {}
+            for condition in CONDITIONS:
+                pooled = [value for group, group_values in values[metric].items()
+                          if group.startswith(f"{condition}/") for value in group_values]
+                means[condition] = statistics.mean(pooled) if pooled else None
+            difference = (means["orexin"] - means["placebo"]
+                          if None not in means.values() else None)
+            cells += f"<td>{'' if difference is None else f'{difference:+.2f}'}</td>"
+        rows.append(f"<tr><td>{html.escape(label)}</td>{cells}</tr>")
+    return "<table>" + "\n".join(rows) + "</table>"
+
+def _date_range(points):
+    days = [datetime.fromtimestamp(point[2]).date() for point in points]
+    return f"{min(days)} to {max(days)}" if days else ""
+
+def build_report(data_manager, workers=None, use_cache=True):
+    """The report as one self-contained HTML page; returns (page, charts, charts rendered)"""
+    sessions = collect_sessions(data_manager, workers)
+    sections = chart_specs(sessions)
+    specs = [spec for section in sections.values() for spec in section]
+    charts, rendered = render_charts(specs, data_manager.data_dir / REPORT_CACHE_DIR, workers, use_cache)
+
+    all_points = [point for points in sessions.values() for point in points]
+    groups = sorted({point[1] for point in all_points})
+    legend = "".join('<span><span class="swatch" style="background: rgb({},{},{})"></span>{}</span>'
+                     .format(*group_color(group), html.escape(group)) for group in groups)
+    meta = f"Generated {datetime.now():%Y-%m-%d %H:%M}, sessions from {_date_range(all_points)}."
+    if all(group.startswith(f"{BLINDED}/") for group in groups):
+        meta += " Conditions stay blinded until the assignment is in assignment.json in the data directory."
+    body = [
+        "<h1>Orexin study report</h1>",
+        f'<p class="meta">{meta}</p>',
+        f'<p class="legend">{legend}</p>'
+    ]
+    for section, section_specs in sections.items():
+        block = None if section == "Overview" else section
+        section_points = [point for point in all_points if block is None or point[0] == block]
+        title = "Overview" if block is None else f"Block {block}"
+        body.append(f"<h2>{html.escape(title)}</h2>")
+        body.append(f'<p class="meta">{_date_range(section_points)}</p>')
+        body.append(summary_table(sessions, block))
+        body.append('<div class="charts">' + "".join(charts[chart_key(spec)] for spec in section_specs) + "</div>")
+
+    page = ("<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\"><title>Orexin study report</title>"
+            f"<style>{STYLE}</style></head><body>\n" + "\n".join(body) + "\n</body></html>\n")
+    return page, len(specs), rendered
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build a self-contained HTML report of the collected data")
+    parser.add_argument("--output", help="HTML file to write (default: report.html in the data directory)")
+    parser.add_argument("--workers", type=int, default=None, help="processes scoring records and rendering charts (default: all cores)")
+    parser.add_argument("--no-cache", action="store_true", help="render every chart again")
+    args = parser.parse_args(argv)
+
+    data_manager = DataManager()
+    output = Path(args.output) if args.output else data_manager.data_dir / "report.html"
+    start = time.perf_counter()
+    try:
+        page, total, rendered = build_report(data_manager, args.workers, use_cache=not args.no_cache)
+        temp_path = output.with_name(output.name + ".tmp")
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(page)
+        os.replace(temp_path, output)
+    except OSError as e:
+        print(f"Error: {e}")
+        return 1
+
+    print(f"Report written to {output}: {total} charts, {rendered} rendered, {total - rendered} from cache "
+          f"({time.perf_counter() - start:.2f}s)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,352 @@
+import sys
+import time
+import argparse
+
+# Version stamped into every record saved from now on. Records saved before
+# versioning are version 1, which only requires the fields records had from
+# the start; fields added later are required from the version given in 'since'.
+SCHEMA_VERSION = 2
+
+class SchemaError(ValueError):
+    """Raised when a record does not match the schema of its test"""
+
+# Field types: "int", "number" (int or float), "str", "bool", "any", or one of the following
+def nullable(spec):
+    return ("nullable", spec)
+
+def list_of(spec):
+    return ("list", spec)
+
+def map_of(spec):
+    """A dict with string keys and values of spec"""
+    return ("map", spec)
+
+def one_of(*values):
+    """One of these strings"""
+    return ("enum", values)
+
+def obj(fields, optional=(), since=None):
+    """A dict with exactly these fields; optional ones may be missing, 'since' ones before that version"""
+    return ("obj", fields, frozenset(optional), since or {})
+
+SESSION = obj({
+    "block_id": "str",
+    "day": "int",
+    "slot": one_of("morning", "evening"),
+    "sleep_hours": nullable("number"),
+    "administration_time": nullable("str"),
+    "set_at": "str"
+})
+
+# Stamped by DataManager into every record; prev_hash and record_hash are added
+# after validation and checked by integrity.py
+COMMON_FIELDS = {
+    "timestamp": "str",
+    "schema_version": "int",
+    "session": SESSION,
+    "runtime": map_of("any"),
+    "battery_id": "str",
+    "prev_hash": "str",
+    "record_hash": "str"
+}
+COMMON_OPTIONAL = ("session", "runtime", "battery_id", "prev_hash", "record_hash")
+COMMON_SINCE = {"schema_version": 2}
+
+def test_record(test_type, fields, optional=(), since=None):
+    return obj({**COMMON_FIELDS, "test_type": one_of(test_type), **fields},
+               optional=COMMON_OPTIONAL + tuple(optional), since={**COMMON_SINCE, **(since or {})})
+
+PVT_RESPONSE = obj({
+    "trial": "int",
+    "type": one_of("correct", "false_start"),
+    "reaction_time_ms": "number",
+    "time_since_wait_start_ms": "number",
+    "stimulus_scheduled": "number",
+    "stimulus_onset": "number",
+    "stimulus_lateness_ms": "number",
+    "timestamp": "number"
+}, optional=("reaction_time_ms", "time_since_wait_start_ms", "stimulus_scheduled", "stimulus_onset",
+             "stimulus_lateness_ms"))
+
+DIGIT_PRESENTATION = obj({
+    "onset_ms": "number",
+    "offset_ms": "number",
+    "onset_error_ms": "number",
+    "duration_ms": "number"
+})
+
+DIGIT_SPAN_TRIAL = obj({
+    "span": "int",
+    "sequence": list_of("int"),
+    "user_input": list_of("int"),
+    "correct": "bool",
+    "forward": "bool",
+    "presentation": list_of(DIGIT_PRESENTATION)
+}, since={"presentation": 2})
+
+# Symbol shown and digit typed for one DSST item
+DSST_ITEM = obj({
+    "symbol": "str",
+    "response": "int"
+})
+
+TIME_PERCEPTION_TRIAL = obj({
+    "trial": "int",
+    "target_s": "number",
+    "produced_s": "number",
+    "error_s": "number",
+    "ratio": "number",
+    "start_ns": "int",
+    "end_ns": "int"
+})
+
+SCHEMAS = {
+    "pvt": test_record("psychomotor_vigilance_task", {
+        "mode": one_of("duration", "trials"),
+        "duration_s": nullable("number"),
+        "max_trials": nullable("int"),
+        "isi_range_s": list_of("number"),
+        "isi_distribution": "str",
+        "stimulus": one_of("visual", "auditory"),
+        "input_backend": "str",
+        "audio": map_of("any"),
+        "aborted": "bool",
+        "checkpoint_time": "number",
+        "recovered_from_checkpoint": "bool",
+        "completed_trials": "int",
+        "false_starts": "int",
+        "total_responses": "int",
+        "reaction_times_ms": list_of("number"),
+        "false_start_times_ms": list_of("number"),
+        "all_responses": list_of(PVT_RESPONSE),
+        "mean_rt_ms": "number",
+        "median_rt_ms": "number",
+        "min_rt_ms": "number",
+        "max_rt_ms": "number",
+        "lapses": "int",
+        "latency_correction_ms": "number",
+        "latency_profile": obj({"key": "str", "created": "str"}),
+        "corrected_reaction_times_ms": list_of("number")
+    }, optional=("audio", "aborted", "checkpoint_time", "recovered_from_checkpoint", "mean_rt_ms", "median_rt_ms",
+                 "min_rt_ms", "max_rt_ms", "lapses", "latency_correction_ms", "latency_profile",
+                 "corrected_reaction_times_ms"),
+       since={"mode": 2, "duration_s": 2, "max_trials": 2, "isi_range_s": 2, "isi_distribution": 2,
+              "stimulus": 2, "input_backend": 2}),
+
+    "dsst": test_record("digit_symbol_substitution_test", {
+        "duration_seconds": "number",
+        "correct_count": "int",
+        "total_attempted": "int",
+        "accuracy": "number",
+        "symbol_map": map_of("str"),
+        "items": list_of(DSST_ITEM)
+    }, optional=("items",)),
+
+    "digit_span": test_record("digit_span", {
+        "forward_span": "int",
+        "backward_span": "int",
+        "total_span": "int",
+        "forward_trials": list_of(DIGIT_SPAN_TRIAL),
+        "backward_trials": list_of(DIGIT_SPAN_TRIAL),
+        "procedure": one_of("linear", "adaptive"),
+        "forward_span_estimate": "number",
+        "forward_span_sd": "number",
+        "backward_span_estimate": "number",
+        "backward_span_sd": "number",
+        "forward_span_prior": list_of("number"),
+        "backward_span_prior": list_of("number"),
+        # Missing before they were recorded: 1000ms on without a blank, or 800ms + 200ms
+        # in records whose trials carry a presentation log
+        "stimulus_on_ms": "number",
+        "stimulus_blank_ms": "number"
+    }, optional=("forward_span_estimate", "forward_span_sd", "backward_span_estimate", "backward_span_sd",
+                 "forward_span_prior", "backward_span_prior", "stimulus_on_ms", "stimulus_blank_ms"),
+       since={"procedure": 2}),
+
+    "sss": test_record("stanford_sleepiness_scale", {
+        "rating": "int",
+        "description": "str"
+    }),
+
+    "feelings": test_record("subjective_feelings", {
+        "feeling_text": "str",
+        "character_count": "int"
+    }),
+
+    "time_perception": test_record("time_perception", {
+        "completed_trials": "int",
+        "planned_trials": "int",
+        "input_backend": "str",
+        "trials": list_of(TIME_PERCEPTION_TRIAL),
+        "mean_abs_error_s": "number",
+        "mean_ratio": "number"
+    }, since={"input_backend": 2})
+}
+
+# Conditions failing for values not of a field type, over the expression {v}
+TYPE_CHECKS = {
+    "int": "type({v}) is not int",
+    "number": "type({v}) is not float and type({v}) is not int",
+    "str": "type({v}) is not str",
+    "bool": "type({v}) is not bool"
+}
+
+class _Compiler:
+    """Generates the source of a function checking one schema version with inline type tests"""
+
+    def __init__(self, version):
+        self.version = version
+        self.lines = []
+        self.constants = {}
+        self._names = 0
+
+    def name(self, prefix):
+        self._names += 1
+        return f"{prefix}{self._names}"
+
+    def constant(self, value):
+        name = self.name("C")
+        self.constants[name] = value
+        return name
+
+    def emit(self, depth, line):
+        self.lines.append("    " * depth + line)
+
+    def fail(self, depth, path, message):
+        self.emit(depth, f"return f\"{path or 'record'}: {message}\"")
+
+    def check(self, spec, v, path, depth):
+        if spec == "any":
+            return
+        if isinstance(spec, str):
+            self.emit(depth, f"if {TYPE_CHECKS[spec].format(v=v)}:")
+            self.fail(depth + 1, path, f"expected {spec}, got {{type({v}).__name__}}")
+            return
+
+        kind = spec[0]
+        if kind == "nullable":
+            self.emit(depth, f"if {v} is not None:")
+            self.check(spec[1], v, path, depth + 1)
+            self.emit(depth + 1, "pass")
+        elif kind == "enum":
+            # Checking the type first keeps unhashable values out of the set lookup
+            values = self.constant(frozenset(spec[1]))
+            self.emit(depth, f"if type({v}) is not str or {v} not in {values}:")
+            self.fail(depth + 1, path, f"expected one of {sorted(spec[1])}, got {{{v}!r}}")
+        elif kind == "list":
+            index, item = self.name("i"), self.name("x")
+            self.emit(depth, f"if type({v}) is not list:")
+            self.fail(depth + 1, path, f"expected list, got {{type({v}).__name__}}")
+            self.emit(depth, f"for {index}, {item} in enumerate({v}):")
+            self.check(spec[1], item, f"{path}[{{{index}}}]", depth + 1)
+            # An empty loop body is not valid Python
+            self.emit(depth + 1, "pass")
+        elif kind == "map":
+            key, item = self.name("k"), self.name("x")
+            self.emit(depth, f"if type({v}) is not dict:")
+            self.fail(depth + 1, path, f"expected dict, got {{type({v}).__name__}}")
+            self.emit(depth, f"for {key}, {item} in {v}.items():")
+            self.emit(depth + 1, f"if type({key}) is not str:")
+            self.fail(depth + 2, path, f"expected string keys, got {{{key}!r}}")
+            self.check(spec[1], item, f"{path}.{{{key}}}", depth + 1)
+        elif kind == "obj":
+            self.check_obj(spec, v, path, depth)
+        else:
+            raise ValueError(f"Unknown schema type {spec!r}")
+
+    def check_obj(self, spec, v, path, depth):
+        _, fields, optional, since = spec
+        keys = self.constant(frozenset(fields))
+        self.emit(depth, f"if type({v}) is not dict:")
+        self.fail(depth + 1, path, f"expected dict, got {{type({v}).__name__}}")
+        self.emit(depth, f"if not {keys}.issuperset({v}):")
+        self.fail(depth + 1, path, f"unexpected fields {{sorted(set({v}) - {keys})}}")
+
+        prefix = f"{path}." if path else ""
+        for field, field_spec in fields.items():
+            value = self.name("f")
+            self.emit(depth, f"{value} = {v}.get({field!r}, MISSING)")
+            if field in optional or self.version < since.get(field, 0):
+                self.emit(depth, f"if {value} is not MISSING:")
+                self.check(field_spec, value, prefix + field, depth + 1)
+                self.emit(depth + 1, "pass")
+            else:
+                self.emit(depth, f"if {value} is MISSING:")
+                self.fail(depth + 1, prefix + field, "missing")
+                self.check(field_spec, value, prefix + field, depth)
+
+def compile_validator(spec, version, name="validate"):
+    """A function returning None for a valid record and an error message otherwise
+
+    The schema is turned into Python source once, with the type checks of
+    every field inlined, so checking a record runs no per-field dispatch.
+    """
+    compiler = _Compiler(version)
+    compiler.emit(0, f"def {name}(record):")
+    compiler.check(spec, "record", "", 1)
+    compiler.emit(1, "return None")
+    source = "\n".join(compiler.lines)
+
+    namespace = {"MISSING": object(), **compiler.constants}
+    exec(compile(source, f"<schema {name}>", "exec"), namespace)
+    validator = namespace[name]
+    validator.source = source
+    return validator
+
+_validators = {}
+
+def get_validator(test_name, version):
+    """The compiled validator of a test's schema version, or None for tests without a schema"""
+    key = (test_name, version)
+    if key not in _validators:
+        spec = SCHEMAS.get(test_name)
+        _validators[key] = compile_validator(spec, version, f"validate_{test_name}_v{version}") if spec else None
+    return _validators[key]
+
+def record_version(record):
+    version = record.get("schema_version", 1)
+    return version if type(version) is int and 1 <= version <= SCHEMA_VERSION else SCHEMA_VERSION
+
+def validate_record(test_name, record):
+    """Error message for a record that does not match its schema version, or None"""
+    validator = get_validator(test_name, record_version(record))
+    return validator(record) if validator else None
+
+def validate_records(test_name, records, start=0):
+    """(offset, error) for every invalid record from start on"""
+    if test_name not in SCHEMAS:
+        return []
+    validators = {version: get_validator(test_name, version) for version in range(1, SCHEMA_VERSION + 1)}
+    problems = []
+    for offset in range(start, len(records)):
+        record = records[offset]
+        error = validators[record_version(record) if type(record) is dict else SCHEMA_VERSION](record)
+        if error is not None:
+            problems.append((offset, error))
+    return problems
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check all saved records against their schemas")
+    parser.add_argument("--show-source", metavar="TEST", help="print the generated validator of a test")
+    args = parser.parse_args(argv)
+
+    if args.show_source:
+        print(get_validator(args.show_source, SCHEMA_VERSION).source)
+        return 0
+
+    from data_manager import DataManager
+    data_manager = DataManager()
+    invalid = 0
+    for test_name in SCHEMAS:
+        records = data_manager.load_test_data(test_name, validate=False)
+        start = time.perf_counter()
+        problems = validate_records(test_name, records)
+        elapsed = time.perf_counter() - start
+        invalid += len(problems)
+        print(f"{test_name}: {len(records)} records, {len(problems)} invalid ({elapsed * 1000:.1f}ms)")
+        for offset, error in problems:
+            print(f"  record {offset}: {error}")
+    return 1 if invalid else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
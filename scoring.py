@@ -0,0 +1,246 @@
+import sys
+import json
+import math
+import time
+import statistics
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from integrity import chain_hash
+from span_procedure import LinearSpanProcedure, BayesianSpanStaircase, replay, record_procedure
+
+SCORE_CACHE_FILE = "score_cache.json"
+
+# Records per scoring job; fewer records are scored in this process
+CHUNK_SIZE = 500
+
+# Responses at or above this reaction time count as lapses
+LAPSE_THRESHOLD_MS = 500
+
+# Trials per span of the linear digit span procedure, as DigitSpanTest runs it
+LINEAR_TRIALS_PER_SPAN = 2
+
+def score_pvt(record):
+    """Summary statistics of the reaction times of correct responses"""
+    reaction_times = record.get("reaction_times_ms") or []
+    if not reaction_times:
+        return {}
+    return {
+        "mean_rt_ms": sum(reaction_times) / len(reaction_times),
+        "median_rt_ms": statistics.median(reaction_times),
+        "min_rt_ms": min(reaction_times),
+        "max_rt_ms": max(reaction_times),
+        "lapses": sum(1 for rt in reaction_times if rt >= LAPSE_THRESHOLD_MS)
+    }
+
+def score_dsst(record):
+    """Correct and attempted items; records saved before items were kept are scored from their counts"""
+    items = record.get("items")
+    if items is None:
+        correct, attempted = record["correct_count"], record["total_attempted"]
+    else:
+        symbol_map = record["symbol_map"]
+        correct = sum(1 for item in items if symbol_map.get(str(item["response"])) == item["symbol"])
+        attempted = len(items)
+    return {
+        "correct_count": correct,
+        "total_attempted": attempted,
+        "accuracy": correct / attempted if attempted > 0 else 0
+    }
+
+def _span_estimate(record, direction):
+    outcomes = [(trial["span"], trial["correct"]) for trial in record.get(f"{direction}_trials") or []]
+    if not outcomes:
+        # Aborted before the first trial in this direction
+        return {"span": 0, "trials": 0}
+    if record_procedure(record) == "adaptive":
+        prior = record.get(f"{direction}_span_prior")
+        if prior is None:
+            # Saved before the staircase prior was kept, so it cannot be replayed
+            estimate = {"span": record.get(f"{direction}_span", 0)}
+            if f"{direction}_span_estimate" in record:
+                estimate.update(span_estimate=record[f"{direction}_span_estimate"],
+                                span_sd=record[f"{direction}_span_sd"])
+            return estimate
+        procedure = BayesianSpanStaircase(*prior)
+    else:
+        procedure = LinearSpanProcedure(outcomes[0][0], trials_per_span=LINEAR_TRIALS_PER_SPAN)
+    return replay(procedure, outcomes).estimate()
+
+def score_digit_span(record):
+    """Forward and backward span, replaying the saved trials through the record's procedure
+
+    For the adaptive procedure the spans are the rounded threshold estimates,
+    not longest passed spans; readers tell the two apart by 'procedure'.
+    """
+    score = {}
+    for direction in ("forward", "backward"):
+        estimate = _span_estimate(record, direction)
+        score[f"{direction}_span"] = estimate["span"]
+        if "span_estimate" in estimate:
+            score[f"{direction}_span_estimate"] = estimate["span_estimate"]
+            score[f"{direction}_span_sd"] = estimate["span_sd"]
+    score["total_span"] = score["forward_span"] + score["backward_span"]
+    return score
+
+# Data file name -> (version, scorer). Bump a version whenever its scorer's rules
+# change; the records of that test are then scored again on the next rescore.
+SCORERS = {
+    "pvt": (2, score_pvt),
+    "dsst": (1, score_dsst),
+    "digit_span": (1, score_digit_span)
+}
+
+def score_record(test_name, record):
+    """Score of one record by the current scorer of its test"""
+    _, scorer = SCORERS[test_name]
+    return scorer(record)
+
+def _score_chunk(job):
+    test_name, records = job
+    _, scorer = SCORERS[test_name]
+    return [scorer(record) for record in records]
+
+def _differs(saved, scored):
+    if isinstance(saved, float) or isinstance(scored, float):
+        return saved is None or not math.isclose(saved, scored, rel_tol=1e-9, abs_tol=1e-9)
+    return saved != scored
+
+def changed_fields(record, score):
+    """Score fields whose saved value differs from the current scorer's"""
+    return [field for field, value in score.items() if _differs(record.get(field), value)]
+
+class ScoreCache:
+    """Scores of saved records by the current scorers, memoized in the data directory
+
+    Entries are keyed by the record's content hash and the scorer version,
+    so each record is scored once per version of its scorer. After a
+    version is bumped only that test's records are scored again, in chunks
+    across a process pool.
+    """
+
+    def __init__(self, data_manager, workers=None):
+        self.data_manager = data_manager
+        self.workers = workers
+        self.filepath = data_manager.data_dir / SCORE_CACHE_FILE
+        self._memo = None
+        self._dirty = False
+
+    def load(self):
+        """{'<test>/<version>': {record hash: score}}"""
+        if not self.filepath.exists():
+            return {}
+        try:
+            with open(self.filepath, 'r') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Ignoring unreadable score cache '{self.filepath}': {e}")
+            return {}
+
+    def save(self):
+        """Write the memo if scores were added or dropped since it was read"""
+        if not self._dirty:
+            return
+        try:
+            with open(self.filepath, 'w') as f:
+                # dumps runs in C; dump would encode piece by piece in Python
+                f.write(json.dumps(self._memo))
+        except OSError as e:
+            raise OSError(f"Error saving score cache to '{self.filepath}': {e}")
+        self._dirty = False
+
+    def scores(self, test_name, records, prune=True):
+        """Current scores of records, in order; returns (scores, records scored now)
+
+        With prune, as when records are all of a test's records, the memo keeps
+        only their scores; without it, as for a batch of new records, the
+        scores of the test's other records are kept too.
+        """
+        if self._memo is None:
+            self._memo = self.load()
+        version, _ = SCORERS[test_name]
+        table_name = f"{test_name}/{version}"
+        table = self._memo.get(table_name, {})
+
+        keys = [chain_hash(record) for record in records]
+        missing = {}
+        for key, record in zip(keys, records):
+            if key not in table and key not in missing:
+                missing[key] = record
+
+        jobs = []
+        missing_keys = list(missing)
+        for start in range(0, len(missing_keys), CHUNK_SIZE):
+            jobs.append((test_name, [missing[key] for key in missing_keys[start:start + CHUNK_SIZE]]))
+        if self.workers == 1 or len(jobs) < 2:
+            outputs = [_score_chunk(job) for job in jobs]
+        else:
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                outputs = list(executor.map(_score_chunk, jobs))
+        table.update(zip(missing_keys, (score for output in outputs for score in output)))
+
+        # Only the current version of the test's scorer is kept
+        stale = [name for name in self._memo if name.split("/")[0] == test_name and name != table_name]
+        for name in stale:
+            del self._memo[name]
+        if prune and len(table) != len(keys):
+            table = {key: table[key] for key in keys}
+            self._dirty = True
+        if missing or stale:
+            self._dirty = True
+        self._memo[table_name] = table
+        return [table[key] for key in keys], len(missing)
+
+    def scored(self, test_name, records, prune=True):
+        """Records with their score fields replaced by the current scorer's; tests without a scorer are kept as saved"""
+        if test_name not in SCORERS:
+            return list(records)
+        scores, _ = self.scores(test_name, records, prune)
+        return [{**record, **score} for record, score in zip(records, scores)]
+
+    def scored_records(self, test_name):
+        """A test's records with their score fields replaced by the current scorer's"""
+        records = self.scored(test_name, self.data_manager.load_test_data(test_name))
+        self.save()
+        return records
+
+    def rescore(self, test_names=None):
+        """Bring the memo up to date; returns {test: (records, scores, records scored now, seconds)}"""
+        results = {}
+        for test_name in test_names or SCORERS:
+            start = time.perf_counter()
+            records = self.data_manager.load_test_data(test_name)
+            scores, computed = self.scores(test_name, records)
+            self.save()
+            results[test_name] = (records, scores, computed, time.perf_counter() - start)
+        return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score all saved records with the current scorers")
+    parser.add_argument("--tests", nargs="+", choices=list(SCORERS), default=list(SCORERS))
+    parser.add_argument("--workers", type=int, default=None, help="processes for scoring (default: all cores)")
+    parser.add_argument("--show-changes", action="store_true",
+                        help="list every record whose saved scores differ from the current scorer's")
+    args = parser.parse_args(argv)
+
+    from data_manager import DataManager
+    cache = ScoreCache(DataManager(), workers=args.workers)
+    try:
+        results = cache.rescore(args.tests)
+    except OSError as e:
+        print(f"Error: {e}")
+        return 1
+
+    for test_name, (records, scores, computed, seconds) in results.items():
+        changes = [(offset, changed_fields(record, score))
+                   for offset, (record, score) in enumerate(zip(records, scores))]
+        changes = [(offset, fields) for offset, fields in changes if fields]
+        version, _ = SCORERS[test_name]
+        print(f"{test_name} (scorer v{version}): {len(records)} records, {computed} scored, "
+              f"{len(records) - computed} cached ({seconds:.2f}s), {len(changes)} differ from their saved scores")
+        if args.show_changes:
+            for offset, fields in changes:
+                print(f"  record {offset}: {', '.join(fields)}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,372 @@
+import os
+import sys
+import json
+import math
+import argparse
+from datetime import datetime
+from pathlib import Path
+from data_manager import DataManager
+from latency_profile import load_profiles
+from scoring import ScoreCache
+from analysis import (METRIC_EXTRACTORS, CONDITIONS, load_assignment, collect_daily_metrics, scored_sessions,
+                      _add_metrics, _day_key)
+from series import ASSIGNMENT_FILE
+
+SEQUENTIAL_STATE_FILE = "sequential_state.json"
+SEQUENTIAL_CONFIG_FILE = "sequential.json"
+SEQUENTIAL_STATE_VERSION = 2
+
+# Stopping rule, overridable in sequential.json in the data directory:
+# stop once P(difference > 0) or P(difference < 0) reaches threshold, or once
+# P(|difference| < rope) does for metrics with a region of practical
+# equivalence, but not before min_blocks blocks are in.
+DEFAULT_RULE = {"threshold": 0.975, "min_blocks": 4, "rope": {}}
+
+# Normal-inverse-gamma prior on the mean and variance of the per-block
+# differences. These values are the limit of the reference prior, under which
+# the posterior of the mean is a t distribution around the mean difference with
+# n - 1 degrees of freedom and scale SD / sqrt(n).
+PRIOR = {"mu": 0.0, "kappa": 0.0, "alpha": -0.5, "beta": 0.0}
+
+def _betainc(a, b, x):
+    """Regularized incomplete beta function I_x(a, b), by Lentz's continued fraction"""
+    if x <= 0:
+        return 0.0
+    if x >= 1:
+        return 1.0
+    if x > (a + 1) / (a + b + 2):
+        return 1.0 - _betainc(b, a, 1.0 - x)
+
+    front = math.exp(math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b) + a * math.log(x) + b * math.log1p(-x)) / a
+    tiny = 1e-300
+    c, d = 1.0, 1.0 - (a + b) * x / (a + 1)
+    d = 1.0 / (d if abs(d) > tiny else tiny)
+    result = d
+    for m in range(1, 300):
+        for numerator in (m * (b - m) * x / ((a + 2 * m - 1) * (a + 2 * m)),
+                          -(a + m) * (a + b + m) * x / ((a + 2 * m) * (a + 2 * m + 1))):
+            d = 1.0 + numerator * d
+            d = 1.0 / (d if abs(d) > tiny else tiny)
+            c = 1.0 + numerator / c
+            c = c if abs(c) > tiny else tiny
+            result *= c * d
+        if abs(c * d - 1.0) < 1e-12:
+            break
+    return front * result
+
+def t_cdf(t, dof):
+    """CDF of Student's t distribution"""
+    tail = 0.5 * _betainc(dof / 2, 0.5, dof / (dof + t * t))
+    return 1.0 - tail if t > 0 else tail
+
+def t_quantile(p, dof):
+    """Inverse of t_cdf, by bisection"""
+    low, high = -1e6, 1e6
+    for _ in range(200):
+        middle = (low + high) / 2
+        if t_cdf(middle, dof) < p:
+            low = middle
+        else:
+            high = middle
+    return (low + high) / 2
+
+def fold(stats, difference):
+    """Add one block's difference to a metric's (n, mean, m2) in O(1), by Welford's update"""
+    n = stats["n"] + 1
+    delta = difference - stats["mean"]
+    mean = stats["mean"] + delta / n
+    return {"n": n, "mean": mean, "m2": stats["m2"] + delta * (difference - mean)}
+
+def posterior(stats, prior=PRIOR):
+    """Posterior of the mean difference as (location, scale, degrees of freedom), or None if still improper"""
+    n, mean, m2 = stats["n"], stats["mean"], stats["m2"]
+    kappa = prior["kappa"] + n
+    alpha = prior["alpha"] + n / 2
+    if kappa <= 0 or alpha <= 0:
+        return None
+    mu = (prior["kappa"] * prior["mu"] + n * mean) / kappa
+    beta = prior["beta"] + m2 / 2 + prior["kappa"] * n * (mean - prior["mu"]) ** 2 / (2 * kappa)
+    if beta <= 0:
+        return None
+    return mu, math.sqrt(beta / (alpha * kappa)), 2 * alpha
+
+def summarize(metric, stats, rule, credibility=0.95):
+    """Posterior summary and stopping-rule status of one metric"""
+    summary = {"n_blocks": stats["n"], "mean_difference": stats["mean"] if stats["n"] else None}
+    params = posterior(stats)
+    if params is None:
+        summary["status"] = "continue (needs at least 2 blocks)" if stats["n"] < 2 else "continue (no spread between blocks yet)"
+        return summary
+
+    location, scale, dof = params
+    half = t_quantile(0.5 + credibility / 2, dof) * scale
+    summary.update(posterior_mean=location, ci_low=location - half, ci_high=location + half,
+                   credibility=credibility, p_positive=1.0 - t_cdf(-location / scale, dof))
+
+    rope = rule["rope"].get(metric)
+    if rope is not None:
+        summary["p_equivalent"] = t_cdf((rope - location) / scale, dof) - t_cdf((-rope - location) / scale, dof)
+
+    threshold = rule["threshold"]
+    if stats["n"] < rule["min_blocks"]:
+        summary["status"] = f"continue ({rule['min_blocks'] - stats['n']} more blocks before stopping is allowed)"
+    elif summary["p_positive"] >= threshold:
+        summary["status"] = "stop: orexin higher"
+    elif 1.0 - summary["p_positive"] >= threshold:
+        summary["status"] = "stop: orexin lower"
+    elif summary.get("p_equivalent", 0.0) >= threshold:
+        summary["status"] = "stop: no practical difference"
+    else:
+        summary["status"] = "continue"
+    return summary
+
+def load_rule(data_manager):
+    """Stopping rule from sequential.json in the data directory, or the default one"""
+    filepath = data_manager.data_dir / SEQUENTIAL_CONFIG_FILE
+    if not filepath.exists():
+        return dict(DEFAULT_RULE)
+    try:
+        with open(filepath, 'r') as f:
+            return {**DEFAULT_RULE, **json.load(f)}
+    except (OSError, json.JSONDecodeError, TypeError) as e:
+        print(f"Ignoring unreadable sequential analysis config '{filepath}': {e}")
+        return dict(DEFAULT_RULE)
+
+def _record_days(record):
+    """Calendar date and, for stamped records, (block, protocol day) a record counts towards"""
+    days = {datetime.fromisoformat(record["timestamp"]).date().isoformat()}
+    session = record.get("session")
+    if session:
+        days.add((str(session["block_id"]), int(session["day"])))
+    return days
+
+def entry_daily_metrics(data_manager, entries):
+    """{metric: {day: mean}} like collect_daily_metrics, for only the days of assignment entries
+
+    The data files are streamed once, a batch at a time, and only the
+    records of those days are scored and averaged.
+    """
+    wanted = {_day_key(entry, condition) for entry in entries for condition in CONDITIONS}
+    profiles = load_profiles(data_manager)
+    cache = ScoreCache(data_manager)
+    sums = {}
+    for test_name, extract in METRIC_EXTRACTORS.items():
+        for _, records in data_manager.iter_records(test_name):
+            matched = []
+            for record in records:
+                days = _record_days(record) & wanted
+                if days:
+                    matched.append((record, days))
+            if not matched:
+                continue
+            scored = scored_sessions(cache, test_name, [record for record, _ in matched], profiles, prune=False)
+            for record, (_, days) in zip(scored, matched):
+                for day in days:
+                    _add_metrics(sums, day, extract, record)
+    cache.save()
+
+    daily = {}
+    for (metric, day), (total, count) in sums.items():
+        daily.setdefault(metric, {})[day] = total / count
+    return daily
+
+def _fold_entry(state, entry, daily, folded=None):
+    """Fold an assignment entry's differences not folded in yet into the state; returns whether any were
+
+    A metric that only one of the entry's days has so far is noted under
+    'waiting'; one that neither day has is not waited for.
+    """
+    block = str(entry["block"])
+    orexin, placebo = _day_key(entry, "orexin"), _day_key(entry, "placebo")
+    added = False
+    missing = []
+    for metric, by_day in sorted(daily.items()):
+        if orexin in by_day and placebo in by_day:
+            if block in state["folded"].get(metric, ()):
+                continue
+            if folded is not None and block not in folded.get(metric, ()):
+                continue
+            stats = state["metrics"].get(metric, {"n": 0, "mean": 0.0, "m2": 0.0})
+            state["metrics"][metric] = fold(stats, by_day[orexin] - by_day[placebo])
+            state["folded"].setdefault(metric, []).append(block)
+            added = True
+        elif orexin in by_day or placebo in by_day:
+            missing.append(metric)
+
+    if missing:
+        state["waiting"][block] = missing
+    else:
+        state["waiting"].pop(block, None)
+    if added and block not in state["blocks"]:
+        state["blocks"].append(block)
+    return added
+
+def _empty_state(rule):
+    return {"version": SEQUENTIAL_STATE_VERSION, "rule": rule, "blocks": [], "metrics": {}, "folded": {},
+            "waiting": {}}
+
+class SequentialAnalysis:
+    """Posterior of the orexin - placebo difference per metric, updated block by block
+
+    The state holds the stopping rule it was started with, the blocks folded
+    in so far and, per metric, the count, mean and sum of squared deviations
+    of the block differences, which is all the conjugate posterior needs,
+    and the blocks folded into it. A block is folded into each metric once
+    both its days have that metric, so a test recorded late is still counted.
+    update() only looks at pending blocks, and reads nothing when there are
+    none. Otherwise it decodes the data files once in a stream, but scores
+    and averages only the records of the pending blocks' days and folds
+    each difference in constant time, so its work is O(pending days), not
+    a re-analysis of the history. The posterior and stopping status come
+    from the state alone. rebuild() recomputes the state from all data,
+    like analysis.py.
+    """
+
+    def __init__(self, data_manager, assignment_path=None):
+        self.data_manager = data_manager
+        self.filepath = data_manager.data_dir / SEQUENTIAL_STATE_FILE
+        self.assignment_path = Path(assignment_path) if assignment_path else data_manager.data_dir / ASSIGNMENT_FILE
+
+    def load_state(self):
+        if not self.filepath.exists():
+            return None
+        try:
+            with open(self.filepath, 'r') as f:
+                state = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            raise OSError(f"Error reading sequential analysis state from '{self.filepath}': {e}")
+        if state.get("version") == 1:
+            # Saved before the blocks of each metric were kept: recomputed for the same blocks and rule
+            return self.rebuild(state["blocks"], state["rule"])
+        return state if state.get("version") == SEQUENTIAL_STATE_VERSION else None
+
+    def save_state(self, state):
+        state["updated"] = datetime.now().isoformat()
+        temp_path = self.filepath.with_name(self.filepath.name + ".tmp")
+        try:
+            with open(temp_path, 'w') as f:
+                json.dump(state, f, indent=2)
+            os.replace(temp_path, self.filepath)
+        except OSError as e:
+            raise OSError(f"Error saving sequential analysis state to '{self.filepath}': {e}")
+
+    def update(self):
+        """Fold in the pending blocks' new differences; returns (state, blocks folded, blocks waiting for data)
+
+        Pending are the unblinded blocks not folded in yet and those waiting
+        for a metric that only one of their days has, e.g. the DSST recorded
+        on the orexin day but not yet on the placebo day.
+        """
+        state = self.load_state() or _empty_state(load_rule(self.data_manager))
+        entries = [entry for entry in load_assignment(self.assignment_path)
+                   if str(entry["block"]) not in state["blocks"] or str(entry["block"]) in state["waiting"]]
+        if not entries:
+            return state, [], []
+
+        daily = entry_daily_metrics(self.data_manager, entries)
+        waiting_before = dict(state["waiting"])
+        added = [str(entry["block"]) for entry in entries if _fold_entry(state, entry, daily)]
+        waiting = [str(entry["block"]) for entry in entries
+                   if str(entry["block"]) not in state["blocks"] or str(entry["block"]) in state["waiting"]]
+        if added or state["waiting"] != waiting_before:
+            self.save_state(state)
+        return state, added, waiting
+
+    def rebuild(self, blocks=None, rule=None, folded=None):
+        """State recomputed from all data for the given blocks (default: every unblinded block)
+
+        folded limits each metric to the blocks saved for it, as verify() needs.
+        """
+        state = _empty_state(rule or load_rule(self.data_manager))
+        entries = load_assignment(self.assignment_path)
+        if blocks is not None:
+            order = {block: i for i, block in enumerate(blocks)}
+            entries = sorted((entry for entry in entries if str(entry["block"]) in order),
+                             key=lambda entry: order[str(entry["block"])])
+        daily = collect_daily_metrics(self.data_manager)
+        for entry in entries:
+            _fold_entry(state, entry, daily, folded)
+        if blocks is not None:
+            state["blocks"] = list(blocks)
+        return state
+
+    def verify(self):
+        """Compare the saved state with one rebuilt from all data; returns a list of mismatches"""
+        state = self.load_state()
+        if state is None:
+            return ["no saved state"]
+        rebuilt = self.rebuild(state["blocks"], state["rule"], state["folded"])
+        mismatches = []
+        for metric in sorted(set(state["metrics"]) | set(rebuilt["metrics"])):
+            saved = state["metrics"].get(metric, {"n": 0, "mean": 0.0, "m2": 0.0})
+            expected = rebuilt["metrics"].get(metric, {"n": 0, "mean": 0.0, "m2": 0.0})
+            for key in ("n", "mean", "m2"):
+                if not math.isclose(saved[key], expected[key], rel_tol=1e-9, abs_tol=1e-9):
+                    mismatches.append(f"{metric}: saved {key} {saved[key]!r}, data gives {expected[key]!r}")
+        return mismatches
+
+def format_status(state, rule):
+    rule_text = f"P >= {state['rule']['threshold']} after at least {state['rule']['min_blocks']} blocks"
+    if state["rule"]["rope"]:
+        rule_text += ", equivalence within " + ", ".join(f"{metric} ±{rope}"
+                                                         for metric, rope in sorted(state["rule"]["rope"].items()))
+    lines = [f"Blocks folded in: {', '.join(state['blocks']) or 'none'}", f"Stopping rule: {rule_text}"]
+    if rule != state["rule"]:
+        lines.append("Note: sequential.json changed since the analysis started; the original rule still applies "
+                     "(rebuild to adopt the new one)")
+    lines.append(f"{'metric':<28}{'n':>4}{'diff':>10}   {'95% CrI':<22}{'P(>0)':>7}   status")
+    for metric, stats in sorted(state["metrics"].items()):
+        summary = summarize(metric, stats, state["rule"])
+        if "posterior_mean" in summary:
+            interval = f"[{summary['ci_low']:.2f}, {summary['ci_high']:.2f}]"
+            lines.append(f"{metric:<28}{stats['n']:>4}{summary['posterior_mean']:>10.2f}   {interval:<22}"
+                         f"{summary['p_positive']:>7.3f}   {summary['status']}")
+        else:
+            mean = f"{summary['mean_difference']:.2f}" if summary["mean_difference"] is not None else "-"
+            lines.append(f"{metric:<28}{stats['n']:>4}{mean:>10}   {'-':<22}{'-':>7}   {summary['status']}")
+    return "\n".join(lines)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sequential Bayesian orexin vs. placebo analysis, updated per block")
+    parser.add_argument("command", nargs="?", default="status", choices=("status", "update", "verify", "rebuild"),
+                        help="status: posterior from the saved state (default); update: fold in newly unblinded "
+                             "blocks; verify: compare the state with all data; rebuild: recompute it from all data")
+    parser.add_argument("--assignment", help="unblinded assignment file (default: assignment.json in the data directory)")
+    parser.add_argument("--json", action="store_true", help="print the posterior summaries as JSON")
+    args = parser.parse_args(argv)
+
+    analysis = SequentialAnalysis(DataManager(), args.assignment)
+    try:
+        if args.command == "update":
+            state, added, waiting = analysis.update()
+            print(f"Folded in {len(added)} new blocks{': ' + ', '.join(added) if added else ''}")
+            if waiting:
+                print(f"Waiting for data: {', '.join(waiting)}")
+        elif args.command == "rebuild":
+            state = analysis.rebuild()
+            analysis.save_state(state)
+            print(f"Rebuilt from {len(state['blocks'])} blocks")
+        elif args.command == "verify":
+            mismatches = analysis.verify()
+            for mismatch in mismatches:
+                print(f"MISMATCH {mismatch}")
+            print("State matches the data" if not mismatches else f"{len(mismatches)} mismatches")
+            return 1 if mismatches else 0
+        else:
+            state = analysis.load_state()
+    except (OSError, ValueError) as e:
+        print(e)
+        return 1
+
+    if state is None:
+        print("No sequential analysis yet; run 'python sequential.py update' once a block is unblinded")
+        return 1
+    if args.json:
+        print(json.dumps({metric: summarize(metric, stats, state["rule"])
+                          for metric, stats in sorted(state["metrics"].items())}, indent=2))
+    else:
+        print(format_status(state, load_rule(analysis.data_manager)))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
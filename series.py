@@ -0,0 +1,245 @@
+import os
+import json
+from datetime import datetime
+from analysis import METRIC_EXTRACTORS, CONDITIONS, load_assignment, scored_sessions, _day_key
+from latency_profile import load_profiles
+from scoring import SCORERS, ScoreCache
+
+SERIES_CACHE_FILE = "dashboard_series.json"
+SERIES_CACHE_VERSION = 1
+
+# Unblinded condition of each block, in the format analysis.py reads
+ASSIGNMENT_FILE = "assignment.json"
+BLINDED = "blinded"
+
+# Sessions without a stamped slot count as evening from this hour on
+EVENING_FROM_HOUR = 14
+
+# Zoom levels as (label, days up to the latest session, or None for all history)
+ZOOM_LEVELS = (("All", None), ("90 days", 90), ("30 days", 30), ("7 days", 7))
+
+# Points kept per series and zoom level, about one per three pixels of a dashboard chart
+TARGET_POINTS = 80
+
+# Plotted metrics as (metric, label, data file name), in dashboard order
+SERIES_METRICS = (
+    ("pvt_median_rt_ms", "PVT median RT (ms)", "pvt"),
+    ("pvt_lapses", "PVT lapses", "pvt"),
+    ("dsst_correct", "DSST score", "dsst"),
+    ("digit_span_forward", "Forward span", "digit_span"),
+    ("digit_span_backward", "Backward span", "digit_span"),
+    ("sss_rating", "Sleepiness (SSS)", "sss")
+)
+
+# Data files with plotted metrics, read through analysis.py's extractors
+SERIES_TESTS = tuple(dict.fromkeys(test_name for _, _, test_name in SERIES_METRICS))
+
+# Line color per condition; evening sessions are drawn in a lighter shade
+CONDITION_COLORS = {
+    "orexin": (200, 70, 50),
+    "placebo": (60, 110, 200),
+    BLINDED: (70, 70, 70)
+}
+
+def group_color(group):
+    """RGB color of a '<condition>/<slot>' group"""
+    condition, _, slot = group.partition("/")
+    color = CONDITION_COLORS.get(condition, CONDITION_COLORS[BLINDED])
+    if slot == "evening":
+        return tuple((channel + 255) // 2 for channel in color)
+    return color
+
+def lttb(points, threshold):
+    """Largest-Triangle-Three-Buckets downsampling of (x, y) points sorted by x
+
+    Keeps the first and last point and, from each of threshold - 2 buckets in
+    between, the point forming the largest triangle with the point kept from
+    the previous bucket and the average of the next bucket. Peaks and dips
+    survive, unlike with averaging or striding.
+    """
+    n = len(points)
+    if threshold >= n or threshold < 3:
+        return list(points)
+
+    sampled = [points[0]]
+    bucket = (n - 2) / (threshold - 2)
+    previous = 0
+    for i in range(threshold - 2):
+        start = int(i * bucket) + 1
+        end = int((i + 1) * bucket) + 1
+        following = points[end:min(int((i + 2) * bucket) + 1, n)] or points[-1:]
+        avg_x = sum(x for x, _ in following) / len(following)
+        avg_y = sum(y for _, y in following) / len(following)
+
+        ax, ay = points[previous]
+        best, best_area = start, -1.0
+        for j in range(start, end):
+            x, y = points[j]
+            area = abs((ax - avg_x) * (y - ay) - (ax - x) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = j, area
+        sampled.append(points[best])
+        previous = best
+    sampled.append(points[-1])
+    return sampled
+
+def load_condition_lookup(data_dir):
+    """Date or (block, protocol day) -> condition, from the assignment file if the data is unblinded"""
+    filepath = data_dir / ASSIGNMENT_FILE
+    if not filepath.exists():
+        return {}
+    lookup = {}
+    try:
+        for block in load_assignment(filepath):
+            for condition in CONDITIONS:
+                lookup[_day_key(block, condition)] = condition
+    except (OSError, ValueError, AttributeError, KeyError, TypeError) as e:
+        print(f"Ignoring unreadable condition assignment '{filepath}': {e}")
+        return {}
+    return lookup
+
+def record_group(record, when, lookup):
+    """'<condition>/<slot>' of a record, e.g. 'orexin/morning' or 'blinded/evening'"""
+    session = record.get("session") or {}
+    condition = (lookup.get((session.get("block_id"), session.get("day"))) or
+                 lookup.get(when.date().isoformat()) or BLINDED)
+    slot = session.get("slot") or ("morning" if when.hour < EVENING_FROM_HOUR else "evening")
+    return f"{condition}/{slot}"
+
+def session_points(test_name, records, lookup):
+    """(metric, group, time, value, record) for every plotted value of a test's scored records"""
+    extract = METRIC_EXTRACTORS[test_name]
+    plotted = {metric for metric, _, metric_test in SERIES_METRICS if metric_test == test_name}
+    for record in records:
+        try:
+            when = datetime.fromisoformat(record["timestamp"])
+            values = extract(record)
+        except (KeyError, TypeError, ValueError):
+            continue
+        group = record_group(record, when, lookup)
+        for metric, value in values.items():
+            if metric in plotted:
+                yield metric, group, when, value, record
+
+def _empty_state(assignment_stamp, scorers):
+    return {"version": SERIES_CACHE_VERSION, "assignment": assignment_stamp, "scorers": scorers, "files": {},
+            "raw": {}, "levels": {}, "latest": {}}
+
+class SeriesCache:
+    """Dashboard series, kept in the data directory and brought up to date incrementally
+
+    For every metric and condition/slot group it stores the raw (time,
+    value) points, one per session, and a copy downsampled with LTTB for
+    each zoom level. Each data file is streamed from the offset saved at
+    the last update, so only the sessions saved since then are extracted;
+    the downsampled copies are recomputed when points were added. Charts
+    draw from the downsampled copies, so their cost does not grow with the
+    history.
+    """
+
+    def __init__(self, data_manager):
+        self.data_manager = data_manager
+        self.filepath = data_manager.data_dir / SERIES_CACHE_FILE
+        # Scored in this thread: new records come in small batches
+        self.score_cache = ScoreCache(data_manager, workers=1)
+
+    def load(self):
+        """The cached series, or None if there are none yet"""
+        if not self.filepath.exists():
+            return None
+        try:
+            with open(self.filepath, 'r') as f:
+                state = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Ignoring unreadable dashboard series '{self.filepath}': {e}")
+            return None
+        return state if state.get("version") == SERIES_CACHE_VERSION else None
+
+    def save(self, state):
+        temp_path = self.filepath.with_name(self.filepath.name + ".tmp")
+        try:
+            with open(temp_path, 'w') as f:
+                json.dump(state, f)
+            os.replace(temp_path, self.filepath)
+        except OSError as e:
+            raise OSError(f"Error saving dashboard series to '{self.filepath}': {e}")
+
+    def _stamp(self, filepath):
+        if not filepath.exists():
+            return None
+        stat = filepath.stat()
+        return [stat.st_mtime_ns, stat.st_size]
+
+    def update(self):
+        """Add the sessions saved since the last update; returns the up-to-date series"""
+        data_dir = self.data_manager.data_dir
+        assignment_stamp = self._stamp(data_dir / ASSIGNMENT_FILE)
+        scorers = {test_name: version for test_name, (version, _) in SCORERS.items()}
+        state = self.load()
+        if state is None or state["assignment"] != assignment_stamp or state.get("scorers") != scorers:
+            # Unblinding changes the group of every point, a new scorer version its value
+            state = _empty_state(assignment_stamp, scorers)
+
+        lookup = None
+        profiles = None
+        changed = False
+        for test_name in SERIES_TESTS:
+            stamp = self._stamp(data_dir / f"{test_name}.json")
+            known = state["files"].get(test_name)
+            if stamp is None or (known and known[:2] == stamp):
+                continue
+
+            if lookup is None:
+                lookup = load_condition_lookup(data_dir)
+                profiles = load_profiles(self.data_manager)
+            start = known[2] if known else 0
+            count = self._read_points(state, test_name, start, lookup, profiles)
+            if count is None and start:
+                # Nothing past the saved offset although the file changed, so it shrank or was
+                # edited, e.g. restored from a backup: read it again from the start
+                count = self._read_points(state, test_name, 0, lookup, profiles)
+            state["files"][test_name] = stamp + [count or 0]
+            changed = True
+
+        if changed:
+            self._downsample(state)
+            self.save(state)
+            self.score_cache.save()
+        return state
+
+    def _read_points(self, state, test_name, start, lookup, profiles):
+        """Add the points of a test's records from offset start on; returns the record count, None if none were read"""
+        if start == 0:
+            for metric, _, metric_test in SERIES_METRICS:
+                if metric_test == test_name:
+                    state["raw"].pop(metric, None)
+
+        count = None
+        for offset, records in self.data_manager.iter_records(test_name, start):
+            scored = scored_sessions(self.score_cache, test_name, records, profiles, prune=False)
+            for metric, group, when, value, _ in session_points(test_name, scored, lookup):
+                state["raw"].setdefault(metric, {}).setdefault(group, []).append([when.timestamp(), value])
+            count = offset + len(records)
+        return count
+
+    def _downsample(self, state):
+        for groups in state["raw"].values():
+            for points in groups.values():
+                points.sort()
+
+        ends = [points[-1][0] for groups in state["raw"].values() for points in groups.values() if points]
+        end = max(ends) if ends else 0.0
+        state["levels"] = {}
+        for label, days in ZOOM_LEVELS:
+            since = end - days * 86400 if days else float("-inf")
+            state["levels"][label] = {
+                metric: {group: lttb([point for point in points if point[0] >= since], TARGET_POINTS)
+                         for group, points in groups.items()}
+                for metric, groups in state["raw"].items()
+            }
+
+        state["latest"] = {}
+        for metric, groups in state["raw"].items():
+            last = max((points[-1] for points in groups.values() if points), default=None)
+            if last is not None:
+                state["latest"][metric] = last
@@ -0,0 +1,76 @@
+from datetime import datetime
+
+SLOTS = ("morning", "evening")
+PROTOCOL_DAYS = (1, 2, 3, 4)
+
+
+class SessionContext:
+    """Protocol position (block, day, slot) and sleep/administration details for a session"""
+
+    def __init__(self, block_id, day, slot, sleep_hours=None, administration_time=None, set_at=None):
+        if day not in PROTOCOL_DAYS:
+            raise ValueError(f"Protocol day must be one of {PROTOCOL_DAYS}, got {day!r}")
+        if slot not in SLOTS:
+            raise ValueError(f"Slot must be one of {SLOTS}, got {slot!r}")
+        if administration_time:
+            # Validate the HH:MM format early rather than at analysis time
+            datetime.strptime(administration_time, "%H:%M")
+
+        self.block_id = str(block_id)
+        self.day = day
+        self.slot = slot
+        self.sleep_hours = sleep_hours
+        self.administration_time = administration_time or None
+        self.set_at = set_at or datetime.now().isoformat()
+
+    def is_current(self, now=None):
+        """Whether the context was set on the calendar date of now; it only applies to that protocol day"""
+        now = now or datetime.now()
+        return datetime.fromisoformat(self.set_at).date() == now.date()
+
+    def key(self):
+        """Index key grouping records by block x day x slot"""
+        return session_key(self.block_id, self.day, self.slot)
+
+    def to_dict(self):
+        return {
+            "block_id": self.block_id,
+            "day": self.day,
+            "slot": self.slot,
+            "sleep_hours": self.sleep_hours,
+            "administration_time": self.administration_time,
+            "set_at": self.set_at
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            data["block_id"],
+            data["day"],
+            data["slot"],
+            data.get("sleep_hours"),
+            data.get("administration_time"),
+            data.get("set_at")
+        )
+
+    def describe(self):
+        """Short human-readable summary for the menu"""
+        text = f"Block {self.block_id} | Day {self.day} | {self.slot}"
+        if self.sleep_hours is not None:
+            text += f" | {self.sleep_hours:g}h sleep"
+        return text
+
+
+def session_key(block_id, day, slot):
+    return f"{block_id}|{day}|{slot}"
+
+
+def parse_session_key(key):
+    block_id, day, slot = key.split("|")
+    return block_id, int(day), slot
+
+
+def default_slot(now=None):
+    """Guess the measurement slot from the time of day (evening runs are ~16:00)"""
+    now = now or datetime.now()
+    return "evening" if now.hour >= 14 else "morning"
@@ -0,0 +1,162 @@
+import pygame
+from data_manager import DataManager
+from assets import get_font
+from session import SessionContext, default_slot
+
+class SessionSetup:
+    def __init__(self, screen, font):
+        self.screen = screen
+        self.font = font
+        self.small_font = get_font(24)
+        self.large_font = get_font(48)
+        self.running = True
+        self.data_manager = DataManager()
+        self.error_message = ""
+
+        # Colors
+        self.WHITE = (255, 255, 255)
+        self.BLACK = (0, 0, 0)
+        self.BLUE = (70, 130, 180)
+        self.GRAY = (128, 128, 128)
+        self.LIGHT_BLUE = (173, 216, 230)
+        self.RED = (220, 20, 60)
+
+        # Editable fields, prefilled from the previous session if there is one; the
+        # slot is not among them, it follows the time of day of each save
+        current = self.data_manager.get_session_context(current_only=False)
+        self.fields = [
+            ["Block", "block_id", current.block_id if current else ""],
+            ["Day (1-4)", "day", str(current.day) if current else "1"],
+            ["Sleep hours", "sleep_hours", f"{current.sleep_hours:g}" if current and current.sleep_hours is not None else ""],
+            ["Administered (HH:MM)", "administration_time", (current.administration_time or "") if current else ""]
+        ]
+        self.selected_field = 0
+
+    def run(self):
+        clock = pygame.time.Clock()
+
+        while self.running:
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    self.running = False
+                    return None
+
+                elif event.type == pygame.KEYDOWN:
+                    if event.key == pygame.K_ESCAPE:
+                        self.running = False
+                        return None
+
+                    elif event.key == pygame.K_RETURN:
+                        session = self.build_session()
+                        if session is not None:
+                            self.save_data(session)
+                            self.running = False
+                            return session
+
+                    elif event.key in (pygame.K_TAB, pygame.K_DOWN):
+                        self.selected_field = (self.selected_field + 1) % len(self.fields)
+
+                    elif event.key == pygame.K_UP:
+                        self.selected_field = (self.selected_field - 1) % len(self.fields)
+
+                    elif event.key == pygame.K_BACKSPACE:
+                        self.fields[self.selected_field][2] = self.fields[self.selected_field][2][:-1]
+
+                    elif event.unicode.isprintable() and len(self.fields[self.selected_field][2]) < 20:
+                        self.fields[self.selected_field][2] += event.unicode
+
+                elif event.type == pygame.MOUSEBUTTONDOWN:
+                    if event.button == 1:
+                        for i in range(len(self.fields)):
+                            if self.get_field_rect(i).collidepoint(event.pos):
+                                self.selected_field = i
+
+            self.draw()
+            pygame.display.flip()
+            clock.tick(60)
+
+        return None
+
+    def build_session(self):
+        """Validate the entered values, returning a SessionContext or None"""
+        values = {key: value.strip() for _, key, value in self.fields}
+
+        if not values["block_id"]:
+            self.error_message = "Block must not be empty"
+            return None
+
+        try:
+            day = int(values["day"])
+            sleep_hours = float(values["sleep_hours"]) if values["sleep_hours"] else None
+            return SessionContext(values["block_id"], day, default_slot(), sleep_hours, values["administration_time"])
+        except ValueError as e:
+            self.error_message = f"Invalid value: {e}"
+            return None
+
+    def get_field_rect(self, index):
+        """Get the rectangle of an input field"""
+        return pygame.Rect(self.screen.get_width() // 2 - 20, 150 + index * 60, 260, 40)
+
+    def draw(self):
+        self.screen.fill(self.WHITE)
+
+        # Title
+        title_text = self.large_font.render("Session Setup", True, self.BLACK)
+        title_rect = title_text.get_rect()
+        title_rect.centerx = self.screen.get_width() // 2
+        title_rect.y = 50
+        self.screen.blit(title_text, title_rect)
+
+        # Fields
+        for i, (label, key, value) in enumerate(self.fields):
+            field_rect = self.get_field_rect(i)
+
+            label_text = self.font.render(label, True, self.BLACK)
+            label_rect = label_text.get_rect()
+            label_rect.right = field_rect.x - 20
+            label_rect.centery = field_rect.centery
+            self.screen.blit(label_text, label_rect)
+
+            background = self.LIGHT_BLUE if i == self.selected_field else self.WHITE
+            pygame.draw.rect(self.screen, background, field_rect)
+            pygame.draw.rect(self.screen, self.BLACK, field_rect, 2)
+
+            value_text = self.font.render(value, True, self.BLACK)
+            value_rect = value_text.get_rect()
+            value_rect.x = field_rect.x + 10
+            value_rect.centery = field_rect.centery
+            self.screen.blit(value_text, value_rect)
+
+        # Validation errors
+        if self.error_message:
+            error_text = self.small_font.render(self.error_message, True, self.RED)
+            error_rect = error_text.get_rect()
+            error_rect.centerx = self.screen.get_width() // 2
+            error_rect.y = 460
+            self.screen.blit(error_text, error_rect)
+
+        # Instructions at bottom
+        instructions = [
+            "TAB/arrows to move between fields; the slot follows the time of day",
+            "The session applies until midnight and is set again each protocol day",
+            "ENTER to save, ESC to cancel"
+        ]
+
+        for i, instruction in enumerate(instructions):
+            text = self.small_font.render(instruction, True, self.GRAY)
+            text_rect = text.get_rect()
+            text_rect.centerx = self.screen.get_width() // 2
+            text_rect.y = self.screen.get_height() - 85 + i * 25
+            self.screen.blit(text, text_rect)
+
+    def save_data(self, session):
+        """Persist the session context so that all following records are stamped with it"""
+        try:
+            self.data_manager.set_session_context(session)
+            print(f"Session set: {session.describe()}")
+        except Exception as e:
+            print(f"Error saving session context: {e}")
+
+def run_session_setup(screen, font):
+    session_setup = SessionSetup(screen, font)
+    return session_setup.run()
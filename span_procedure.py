@@ -0,0 +1,190 @@
+import math
+
+class LinearSpanProcedure:
+    """The classic procedure: walk spans upward, a fixed number of trials per span
+
+    A span is passed when at least one of its trials is correct; the test
+    stops at the first failed span or after max_span.
+    """
+
+    name = "linear"
+
+    def __init__(self, start_span, max_span=9, trials_per_span=2):
+        self.current_span = start_span
+        self.max_span = max_span
+        self.trials_per_span = trials_per_span
+        self.trial_in_span = 0
+        self.span = 0
+        self.trials = 0
+        self.finished = False
+        self._outcomes = []
+
+    def record(self, correct):
+        """Record the outcome of a trial at current_span"""
+        self.trials += 1
+        self.trial_in_span += 1
+        self._outcomes.append(correct)
+
+        if self.trial_in_span >= self.trials_per_span:
+            self.trial_in_span = 0
+            if any(self._outcomes):
+                self.span = self.current_span
+                self.current_span += 1
+                if self.current_span > self.max_span:
+                    self.finished = True
+            else:
+                self.finished = True
+            self._outcomes = []
+
+    def fold(self, span, correct):
+        """Fold in a saved trial at span, as when it was recorded"""
+        self.current_span = span
+        self.record(correct)
+
+    def trial_label(self):
+        return f"Trial: {self.trial_in_span + 1}/{self.trials_per_span}"
+
+    def estimate(self):
+        """Span estimate as a dict; the linear procedure gives no uncertainty"""
+        return {"span": self.span, "trials": self.trials}
+
+# (min_span, max_span, slope, lapse, resolution) -> likelihood table of BayesianSpanStaircase
+_likelihood_tables = {}
+
+class BayesianSpanStaircase:
+    """Adaptive staircase keeping a grid posterior over the participant's span
+
+    The probability of recalling a sequence of length L is modelled as a
+    logistic function that is 50% at the span threshold. Each trial uses the
+    length with the highest expected information about the threshold, and
+    the procedure stops once the posterior SD is below target_sd.
+    """
+
+    name = "adaptive"
+
+    def __init__(self, prior_mean, prior_sd, min_span=2, max_span=12, slope=1.5, lapse=0.03,
+                 target_sd=0.75, min_trials=4, max_trials=10, resolution=0.1):
+        self.min_span = min_span
+        self.max_span = max_span
+        self.slope = slope
+        self.lapse = lapse
+        self.target_sd = target_sd
+        self.min_trials = min_trials
+        self.max_trials = max_trials
+        self.trials = 0
+        self.finished = False
+
+        steps = int(round((max_span - min_span + 1) / resolution))
+        self.grid = [min_span - 0.5 + i * resolution for i in range(steps + 1)]
+        weights = [math.exp(-0.5 * ((theta - prior_mean) / prior_sd) ** 2) for theta in self.grid]
+        total = sum(weights)
+        self.posterior = [w / total for w in weights]
+
+        # P(correct | length, threshold) for every candidate length, shared by staircases with the same model
+        key = (min_span, max_span, slope, lapse, resolution)
+        if key not in _likelihood_tables:
+            _likelihood_tables[key] = {
+                length: [self._p_correct(length, theta) for theta in self.grid]
+                for length in range(min_span, max_span + 1)
+            }
+        self._likelihood = _likelihood_tables[key]
+        self._current_span = None
+
+    @property
+    def current_span(self):
+        """Length of the next trial, chosen when first asked for (replaying saved trials never asks)"""
+        if self._current_span is None:
+            self._current_span = self._choose_length()
+        return self._current_span
+
+    def _p_correct(self, length, theta):
+        return self.lapse + (1 - 2 * self.lapse) / (1 + math.exp(self.slope * (length - theta)))
+
+    def _entropy(self, weights):
+        total = sum(weights)
+        return -sum(w / total * math.log(w / total) for w in weights if w > 0)
+
+    def _choose_length(self):
+        """Length whose outcome is expected to shrink posterior entropy the most"""
+        best_length = None
+        best_entropy = None
+        for length, p_correct in self._likelihood.items():
+            correct = [p * w for p, w in zip(p_correct, self.posterior)]
+            incorrect = [(1 - p) * w for p, w in zip(p_correct, self.posterior)]
+            p = sum(correct)
+            expected = p * self._entropy(correct) + (1 - p) * self._entropy(incorrect)
+            if best_entropy is None or expected < best_entropy:
+                best_length, best_entropy = length, expected
+        return best_length
+
+    def mean_sd(self):
+        mean = sum(theta * w for theta, w in zip(self.grid, self.posterior))
+        variance = sum((theta - mean) ** 2 * w for theta, w in zip(self.grid, self.posterior))
+        return mean, math.sqrt(variance)
+
+    def fold(self, span, correct):
+        """Update the posterior with a trial at span, without picking the next length"""
+        p_correct = self._likelihood[span]
+        updated = [(p if correct else 1 - p) * w for p, w in zip(p_correct, self.posterior)]
+        total = sum(updated)
+        self.posterior = [w / total for w in updated]
+        self.trials += 1
+
+    def record(self, correct):
+        """Fold in the outcome of a trial at current_span and pick the next length"""
+        self.fold(self.current_span, correct)
+
+        _, sd = self.mean_sd()
+        if self.trials >= self.max_trials or (self.trials >= self.min_trials and sd <= self.target_sd):
+            self.finished = True
+        else:
+            self._current_span = None
+
+    @property
+    def span(self):
+        """Rounded threshold estimate, saved as the record's integer span (not a longest passed span)"""
+        mean, _ = self.mean_sd()
+        return max(0, int(round(mean)))
+
+    def trial_label(self):
+        return f"Trial: {self.trials + 1}/{self.max_trials}"
+
+    def estimate(self):
+        mean, sd = self.mean_sd()
+        return {"span": self.span, "trials": self.trials, "span_estimate": mean, "span_sd": sd}
+
+def replay(procedure, outcomes):
+    """Fold saved (span, correct) trial outcomes into a procedure; returns it"""
+    for span, correct in outcomes:
+        procedure.fold(span, correct)
+    return procedure
+
+def record_procedure(record):
+    """Name of the procedure a digit span record comes from; records saved before there was a choice are linear"""
+    return record.get("procedure", LinearSpanProcedure.name)
+
+def history_prior(records, direction, default_mean, default_sd=2.0, recent=10):
+    """Prior (mean, sd) for a direction from the participant's most recent adaptive sessions
+
+    Only the staircase's threshold estimates are used; the linear procedure's
+    longest passed span measures something else.
+    """
+    spans = []
+    for record in reversed(records):
+        if record_procedure(record) != BayesianSpanStaircase.name:
+            continue
+        value = record.get(f"{direction}_span_estimate")
+        if value is not None:
+            spans.append(value)
+            if len(spans) == recent:
+                break
+
+    if not spans:
+        return default_mean, default_sd
+
+    mean = sum(spans) / len(spans)
+    if len(spans) < 2:
+        return mean, default_sd
+    sd = math.sqrt(sum((s - mean) ** 2 for s in spans) / (len(spans) - 1))
+    # Keep the prior wide enough for real day-to-day (and drug) effects
+    return mean, max(sd, 1.0)
@@ -1,12 +1,15 @@
 import pygame
 from data_manager import DataManager
+from assets import get_font
+from text_layout import get_layout
 
 class StanfordSleepinessScale:
-    def __init__(self, screen, font):
+    def __init__(self, screen, font, data_manager=None):
         self.screen = screen
         self.font = font
-        self.small_font = pygame.font.Font(None, 24)
-        self.large_font = pygame.font.Font(None, 48)
+        self.data_manager = data_manager or DataManager()
+        self.small_font = get_font(24)
+        self.large_font = get_font(48)
         self.running = True
         self.selected_rating = None
         self.hovering_rating = None
@@ -147,30 +150,13 @@ class StanfordSleepinessScale:
             description = self.scale_descriptions[display_rating]
 
             # Split long descriptions into multiple lines
-            words = description.split()
-            lines = []
-            current_line = []
-            max_width = 600
-
-            for word in words:
-                test_line = ' '.join(current_line + [word])
-                test_surface = self.font.render(test_line, True, self.BLACK)
-                if test_surface.get_width() <= max_width:
-                    current_line.append(word)
-                else:
-                    if current_line:
-                        lines.append(' '.join(current_line))
-                        current_line = [word]
-                    else:
-                        lines.append(word)
-
-            if current_line:
-                lines.append(' '.join(current_line))
+            layout = get_layout(self.font, 600)
+            lines = layout.wrap(description)
 
             # Draw description
             description_y = self.screen.get_height() // 2 + 120
             for i, line in enumerate(lines):
-                desc_text = self.font.render(line, True, self.BLACK)
+                desc_text = layout.render(line, self.BLACK)
                 desc_rect = desc_text.get_rect()
                 desc_rect.centerx = self.screen.get_width() // 2
                 desc_rect.y = description_y + i * 30
@@ -200,12 +186,11 @@ class StanfordSleepinessScale:
 
         # Save to file using DataManager
         try:
-            data_manager = DataManager()
-            filepath = data_manager.save_test_data('sss', data)
+            filepath = self.data_manager.save_test_data('sss', data)
             print(f"Stanford Sleepiness Scale data saved to {filepath}")
         except Exception as e:
             print(f"Error saving Stanford Sleepiness Scale data: {e}")
 
-def run_stanford_sleepiness_scale(screen, font):
-    sss = StanfordSleepinessScale(screen, font)
+def run_stanford_sleepiness_scale(screen, font, data_manager=None):
+    sss = StanfordSleepinessScale(screen, font, data_manager)
     return sss.run()
\ No newline at end of file
@@ -0,0 +1,82 @@
+import time
+import pygame
+
+# Sleep coarsely until this close to a deadline, then spin on the clock
+SPIN_MARGIN_S = 0.002
+
+# Longest coarse sleep, so that the poll callback still runs regularly
+POLL_INTERVAL_S = 0.01
+
+def sleep_until(deadline, poll=None):
+    """Wait until perf_counter() reaches deadline; returns False if poll() asked to abort"""
+    while True:
+        remaining = deadline - time.perf_counter()
+        if remaining <= 0:
+            return True
+        if remaining > SPIN_MARGIN_S:
+            if poll is not None and poll():
+                return False
+            time.sleep(min(remaining - SPIN_MARGIN_S, POLL_INTERVAL_S))
+
+class StimulusSchedule:
+    """Absolute onset and offset deadlines for a sequence of stimuli
+
+    Stimulus i is shown from start + i * (on_s + blank_s) for on_s seconds,
+    followed by a blank, so deadlines never drift with frame timing.
+    """
+
+    def __init__(self, count, on_s, blank_s, start):
+        self.count = count
+        self.on_s = on_s
+        self.blank_s = blank_s
+        self.start = start
+
+    def onset(self, i):
+        return self.start + i * (self.on_s + self.blank_s)
+
+    def offset(self, i):
+        return self.onset(i) + self.on_s
+
+def present(schedule, draw_stimulus, draw_blank, poll=None, flip=None):
+    """Show every stimulus of a schedule, flipping exactly at its deadlines
+
+    Each frame is drawn into the back buffer ahead of its deadline, so only
+    the flip happens on time. Returns (log, completed), where log holds the
+    scheduled and actual flip times (perf_counter seconds) of each stimulus.
+    """
+    flip = flip or pygame.display.flip
+    log = []
+
+    for i in range(schedule.count):
+        draw_stimulus(i)
+        if not sleep_until(schedule.onset(i), poll):
+            return log, False
+        flip()
+        onset = time.perf_counter()
+
+        draw_blank(i)
+        if not sleep_until(schedule.offset(i), poll):
+            return log, False
+        flip()
+        offset = time.perf_counter()
+
+        log.append({
+            'scheduled_onset': schedule.onset(i),
+            'actual_onset': onset,
+            'scheduled_offset': schedule.offset(i),
+            'actual_offset': offset
+        })
+
+    return log, True
+
+def relative_log(log, start):
+    """Express a presentation log in ms relative to the sequence start, with onset errors"""
+    return [
+        {
+            'onset_ms': (entry['actual_onset'] - start) * 1000,
+            'offset_ms': (entry['actual_offset'] - start) * 1000,
+            'onset_error_ms': (entry['actual_onset'] - entry['scheduled_onset']) * 1000,
+            'duration_ms': (entry['actual_offset'] - entry['actual_onset']) * 1000
+        }
+        for entry in log
+    ]
@@ -1,12 +1,16 @@
 import pygame
 from data_manager import DataManager
+from assets import get_font
+from feelings_index import FeelingsIndex
+from text_layout import get_layout
 
 class SubjectiveFeelingsTest:
-    def __init__(self, screen, font):
+    def __init__(self, screen, font, data_manager=None):
         self.screen = screen
         self.font = font
-        self.large_font = pygame.font.Font(None, 48)
-        self.small_font = pygame.font.Font(None, 24)
+        self.data_manager = data_manager or DataManager()
+        self.large_font = get_font(48)
+        self.small_font = get_font(24)
         self.running = True
         self.input_text = ""
         self.cursor_visible = True
@@ -28,6 +32,7 @@ class SubjectiveFeelingsTest:
         self.text_box_x = (800 - self.text_box_width) // 2
         self.text_box_y = 300
         self.text_box_rect = pygame.Rect(self.text_box_x, self.text_box_y, self.text_box_width, self.text_box_height)
+        self.text_layout = get_layout(self.font, self.text_box_width - 20)  # 20px padding
         
         # Button properties
         self.button_width = 120
@@ -174,23 +179,7 @@ class SubjectiveFeelingsTest:
 
     def draw_text_with_cursor(self):
         """Draw text with word wrapping and cursor"""
-        words = self.input_text.split(' ')
-        lines = []
-        current_line = ""
-        
-        for word in words:
-            test_line = current_line + word + " "
-            text_width = self.font.size(test_line)[0]
-            
-            if text_width < self.text_box_width - 20:  # 20px padding
-                current_line = test_line
-            else:
-                if current_line:
-                    lines.append(current_line.rstrip())
-                current_line = word + " "
-        
-        if current_line:
-            lines.append(current_line.rstrip())
+        lines = self.text_layout.wrap(self.input_text)
         
         # Draw text lines
         y_offset = self.text_box_y + 10
@@ -200,7 +189,7 @@ class SubjectiveFeelingsTest:
             if y_offset + line_height > self.text_box_y + self.text_box_height - 10:
                 break  # Don't overflow text box
             
-            text_surface = self.font.render(line, True, self.BLACK)
+            text_surface = self.text_layout.render(line, self.BLACK)
             self.screen.blit(text_surface, (self.text_box_x + 10, y_offset))
             y_offset += line_height
         
@@ -224,12 +213,15 @@ class SubjectiveFeelingsTest:
         }
         
         try:
-            data_manager = DataManager()
-            filepath = data_manager.save_test_data('feelings', data)
+            filepath = self.data_manager.save_test_data('feelings', data)
             print(f"Subjective feelings data saved to {filepath}")
+
+            # Batched saves are indexed when the batch is committed
+            if self.data_manager.last_saved_offset is not None:
+                FeelingsIndex(self.data_manager).add_saved_record(self.data_manager.last_saved_offset, self.data_manager.last_saved_record)
         except Exception as e:
             print(f"Error saving subjective feelings data: {e}")
 
-def run_subjective_feelings(screen, font):
-    feelings_test = SubjectiveFeelingsTest(screen, font)
+def run_subjective_feelings(screen, font, data_manager=None):
+    feelings_test = SubjectiveFeelingsTest(screen, font, data_manager)
     return feelings_test.run()
\ No newline at end of file
@@ -0,0 +1,239 @@
+import sys
+import json
+import gzip
+import time
+import uuid
+import threading
+import http.client
+from urllib.parse import urlsplit
+from data_manager import DataManager, TEST_NAMES
+
+SYNC_CONFIG_FILE = "sync_config.json"
+SYNC_STATE_FILE = "sync_state.json"
+
+class SyncError(Exception):
+    """Raised when a batch could not be delivered to the collector"""
+
+class SyncClient:
+    """Uploads records that the collector has not seen yet, in compressed batches"""
+
+    def __init__(self, url, client_id, data_manager=None, batch_size=200, max_retries=5, backoff=0.5, timeout=10):
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https"):
+            raise ValueError(f"Unsupported collector URL '{url}'")
+
+        self.scheme = parts.scheme
+        self.host = parts.hostname
+        self.port = parts.port
+        self.path = (parts.path.rstrip("/") or "") + "/upload"
+        self.client_id = client_id
+        self.data_manager = data_manager or DataManager()
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self._connection = None
+        self.bytes_sent = 0
+
+    def _get_connection(self):
+        """Reuse one keep-alive connection across batches, reconnecting after errors"""
+        if self._connection is None:
+            connection_class = http.client.HTTPSConnection if self.scheme == "https" else http.client.HTTPConnection
+            self._connection = connection_class(self.host, self.port, timeout=self.timeout)
+        return self._connection
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def load_state(self):
+        """Number of records already uploaded per test"""
+        filepath = self.data_manager.data_dir / SYNC_STATE_FILE
+        if not filepath.exists():
+            return {}
+        try:
+            with open(filepath, 'r') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            raise OSError(f"Error reading sync state from '{filepath}': {e}")
+
+    def save_state(self, state):
+        filepath = self.data_manager.data_dir / SYNC_STATE_FILE
+        try:
+            with open(filepath, 'w') as f:
+                json.dump(state, f, indent=2)
+        except OSError as e:
+            raise OSError(f"Error saving sync state to '{filepath}': {e}")
+
+    def _post(self, body):
+        """POST one compressed batch, retrying with exponential backoff"""
+        delay = self.backoff
+        for attempt in range(self.max_retries + 1):
+            try:
+                connection = self._get_connection()
+                connection.request("POST", self.path, body=body, headers={
+                    "Content-Type": "application/json",
+                    "Content-Encoding": "gzip"
+                })
+                response = connection.getresponse()
+                payload = response.read()
+                if response.status in (200, 409):
+                    # 409 means the collector is missing earlier records and says where to resume
+                    self.bytes_sent += len(body)
+                    return json.loads(payload)
+                if response.status < 500:
+                    # Client errors won't go away by retrying
+                    raise SyncError(f"Collector rejected batch: {response.status} {payload[:200]!r}")
+                error = f"HTTP {response.status}"
+            except (OSError, http.client.HTTPException) as e:
+                self.close()
+                error = str(e)
+
+            if attempt < self.max_retries:
+                time.sleep(delay)
+                delay *= 2
+
+        raise SyncError(f"Giving up after {self.max_retries + 1} attempts: {error}")
+
+    def _upload_test(self, test_name, start, state):
+        """Send a test's records from offset start; returns (records uploaded, offset to resume from, or None)"""
+        uploaded = 0
+        for offset, batch in self.data_manager.iter_records(test_name, start, self.batch_size):
+            body = gzip.compress(json.dumps({
+                "client_id": self.client_id,
+                "test_name": test_name,
+                "start": offset,
+                "records": batch
+            }).encode("utf-8"))
+            reply = self._post(body)
+
+            # The collector reports how many records of this test it holds and how
+            # many of the batch it stored, which makes a retried batch harmless
+            uploaded += reply.get("stored", 0)
+            state[test_name] = reply["next"]
+            self.save_state(state)
+            if reply["next"] != offset + len(batch):
+                # The collector holds more or fewer records than were sent, e.g. after a
+                # lost reply or a lost sync state: continue from where it stands
+                return uploaded, reply["next"]
+        return uploaded, None
+
+    def sync(self):
+        """Upload all new records; returns the number of records uploaded
+
+        Each test's file is streamed from the offset the collector last
+        acknowledged, so only the records after it are kept and sent.
+        """
+        state = self.load_state()
+        uploaded = 0
+
+        for test_name in TEST_NAMES:
+            start = state.get(test_name, 0)
+            while start is not None:
+                stored, start = self._upload_test(test_name, start, state)
+                uploaded += stored
+
+        return uploaded
+
+class SyncWorker:
+    """Runs SyncClient.sync on a background thread so the pygame loop never waits on the network"""
+
+    def __init__(self, client):
+        self.client = client
+        self.last_status = "Not synced yet"
+        self._requested = threading.Event()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="vigila-sync", daemon=True)
+        self._thread.start()
+
+    def request_sync(self):
+        """Ask for a sync soon; returns immediately"""
+        self._requested.set()
+
+    def stop(self):
+        self._stopped = True
+        self._requested.set()
+        self._thread.join(timeout=1)
+
+    def _run(self):
+        while True:
+            self._requested.wait()
+            self._requested.clear()
+            if self._stopped:
+                break
+
+            try:
+                count = self.client.sync()
+                self.last_status = f"Synced {count} new records"
+            except (SyncError, OSError) as e:
+                self.last_status = f"Sync failed: {e}"
+            print(self.last_status)
+
+        self.client.close()
+
+def load_sync_config(data_manager):
+    """Load the collector URL and client id, or None if syncing is not configured
+
+    The config lives in sync_config.json in the data directory:
+
+        {"url": "http://collector.example.org:8750"}
+
+    A random client id is generated and stored on first use.
+    """
+    filepath = data_manager.data_dir / SYNC_CONFIG_FILE
+    if not filepath.exists():
+        return None
+
+    try:
+        with open(filepath, 'r') as f:
+            config = json.load(f)
+        if "client_id" not in config:
+            config["client_id"] = uuid.uuid4().hex
+            with open(filepath, 'w') as f:
+                json.dump(config, f, indent=2)
+        return config
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"Ignoring unreadable sync config '{filepath}': {e}")
+        return None
+
+def start_sync_worker(data_manager=None):
+    """Start a background sync worker if a collector is configured, else return None
+
+    The worker reads through its own DataManager on the same directory, since
+    the caller's instance keeps read caches that the UI thread mutates.
+    """
+    data_manager = data_manager or DataManager()
+    config = load_sync_config(data_manager)
+    if config is None:
+        return None
+
+    try:
+        client = SyncClient(config["url"], config["client_id"], DataManager(data_manager.data_dir))
+    except (KeyError, ValueError) as e:
+        print(f"Invalid sync config: {e}")
+        return None
+    return SyncWorker(client)
+
+def main():
+    """Sync once from the command line"""
+    data_manager = DataManager()
+    config = load_sync_config(data_manager)
+    if config is None:
+        print(f"No {SYNC_CONFIG_FILE} in {data_manager.get_data_directory_path()}")
+        return 1
+
+    client = SyncClient(config["url"], config["client_id"], data_manager)
+    try:
+        count = client.sync()
+    except (SyncError, OSError) as e:
+        print(f"Sync failed: {e}")
+        return 1
+    finally:
+        client.close()
+
+    print(f"Uploaded {count} records ({client.bytes_sent} compressed bytes)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,38 @@
+import os
+import threading
+import pytest
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+import battery
+from battery import BatteryRunner, load_battery_sequence
+from data_manager import DataManager
+
+@pytest.fixture
+def screen():
+    pygame.init()
+    yield pygame.display.set_mode((800, 600))
+    pygame.quit()
+
+def test_default_sequence_leaves_out_tests_added_later(tmp_path):
+    sequence = load_battery_sequence(DataManager(tmp_path))
+    assert sequence == ["pvt", "dsst", "digit_span", "sss", "feelings"]
+
+def test_tests_are_built_on_the_main_thread(screen, tmp_path, monkeypatch):
+    built_on = []
+
+    class Test:
+        def __init__(self, screen, font, data_manager):
+            built_on.append(threading.current_thread())
+
+        def run(self):
+            return {}
+
+    monkeypatch.setattr(battery, "BATTERY_TESTS", {"sss": (Test, "SSS"), "feelings": (Test, "Feelings")})
+    monkeypatch.setattr(battery, "DataManager", lambda: DataManager(tmp_path))
+    monkeypatch.setattr(BatteryRunner, "show_transition", lambda self, position: True)
+    BatteryRunner(screen, pygame.font.Font(None, 24), ["sss", "feelings"]).run()
+
+    assert built_on == [threading.main_thread()] * 2
@@ -0,0 +1,31 @@
+import pytest
+import data_manager as data_manager_module
+from data_manager import DataManager
+
+@pytest.fixture
+def data_manager(tmp_path):
+    return DataManager(tmp_path)
+
+@pytest.fixture
+def broken_trial_store(monkeypatch):
+    def fail(data_dir, test_name, records):
+        raise OSError("No space left on device")
+    monkeypatch.setattr(data_manager_module, "update_trial_store", fail)
+
+def rating(value):
+    return {"test_type": "stanford_sleepiness_scale", "rating": value, "description": f"rating {value}"}
+
+def test_failing_trial_store_does_not_fail_a_save(data_manager, broken_trial_store, capsys):
+    data_manager.save_test_data("sss", rating(3))
+
+    assert [record["rating"] for record in data_manager.load_test_data("sss")] == [3]
+    assert "Could not update the trial store for 'sss'" in capsys.readouterr().out
+
+def test_failing_trial_store_does_not_fail_a_batch_commit(data_manager, broken_trial_store):
+    data_manager.begin_batch("battery-1")
+    data_manager.save_test_data("sss", rating(2))
+    data_manager.save_test_data("sss", rating(5))
+    committed = data_manager.commit_batch()
+
+    assert committed["sss"][0] == 0
+    assert [record["rating"] for record in data_manager.load_test_data("sss")] == [2, 5]
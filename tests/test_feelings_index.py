@@ -0,0 +1,32 @@
+import pytest
+from data_manager import DataManager
+from feelings_index import FeelingsIndex
+
+@pytest.fixture
+def data_manager(tmp_path):
+    return DataManager(tmp_path)
+
+def save_feeling(data_manager, text):
+    data_manager.save_test_data("feelings", {"test_type": "subjective_feelings", "feeling_text": text,
+                                             "character_count": len(text)})
+    FeelingsIndex(data_manager).add_saved_record(data_manager.last_saved_offset, data_manager.last_saved_record)
+
+def test_saves_are_indexed_without_reading_the_history(data_manager, monkeypatch):
+    save_feeling(data_manager, "calm and awake")
+
+    def fail(test_name, validate=True):
+        raise AssertionError("feelings.json was read to index a save")
+    monkeypatch.setattr(data_manager, "load_test_data", fail)
+    save_feeling(data_manager, "headache, jittery")
+    save_feeling(data_manager, "awake again")
+
+    assert FeelingsIndex(data_manager).search("awake") == [0, 2]
+
+def test_entries_saved_behind_the_index_are_caught_up(data_manager):
+    save_feeling(data_manager, "calm")
+    data_manager.save_test_data("feelings", {"test_type": "subjective_feelings", "feeling_text": "calm again",
+                                             "character_count": 10})
+
+    index = FeelingsIndex(data_manager)
+    assert index.search("calm") == [0, 1]
+    assert index.count == 2
@@ -0,0 +1,47 @@
+import os
+import time
+import pytest
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+from data_manager import DataManager
+from latency_profile import current_profile_key, save_profile
+from pvt import PsychomotorVigilanceTask, CORRECT
+
+PROFILE = {
+    "created": "2026-01-01T00:00:00",
+    "queue_to_handler_ms": {"median": 4.0},
+    "handler_to_flip_ms": {"median": 16.0},
+    "correction_ms": 20.0
+}
+
+@pytest.fixture
+def data_manager(tmp_path):
+    pygame.init()
+    data_manager = DataManager(tmp_path)
+    save_profile(data_manager, {**PROFILE, "key": current_profile_key()})
+    yield data_manager
+    pygame.quit()
+
+def saved_record(data_manager, stimulus):
+    screen = pygame.display.set_mode((800, 600))
+    task = PsychomotorVigilanceTask(screen, pygame.font.Font(None, 24), data_manager, stimulus=stimulus)
+    if task.stimulus != stimulus:
+        pytest.skip("no audio output for the auditory PVT")
+    now = time.time()
+    task.responses.append(1, CORRECT, 300.0, now, now, now)
+    assert task.save_data()
+    return data_manager.load_test_data("pvt")[-1]
+
+def test_visual_record_is_corrected_for_input_and_display(data_manager):
+    record = saved_record(data_manager, "visual")
+    assert record["latency_correction_ms"] == 20.0
+    assert record["corrected_reaction_times_ms"] == [280.0]
+
+def test_auditory_record_is_only_corrected_for_input(data_manager):
+    record = saved_record(data_manager, "auditory")
+    assert record["stimulus"] == "auditory"
+    assert record["latency_correction_ms"] == 4.0
+    assert record["corrected_reaction_times_ms"] == [296.0]
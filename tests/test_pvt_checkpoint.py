@@ -0,0 +1,60 @@
+import os
+import time
+import pytest
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+from data_manager import DataManager
+from pvt import PsychomotorVigilanceTask, CheckpointWriter, recover_checkpoint, CHECKPOINT_FILE, CORRECT
+
+@pytest.fixture
+def data_manager(tmp_path):
+    pygame.init()
+    yield DataManager(tmp_path)
+    pygame.quit()
+
+def make_task(data_manager, run_trials):
+    screen = pygame.display.set_mode((800, 600))
+    task = PsychomotorVigilanceTask(screen, pygame.font.Font(None, 24), data_manager, max_trials=2)
+
+    def respond(clock, checkpoint, last_checkpoint):
+        now = time.time()
+        for trial in (1, 2):
+            task.responses.append(trial, CORRECT, 280.0, now, now, now)
+        run_trials(task)
+    task.run_trials = respond
+    return task
+
+def test_completed_run_kept_for_a_battery_is_not_recovered_as_aborted(data_manager):
+    data_manager.begin_batch("battery-1")
+    make_task(data_manager, lambda task: None).run()
+    # The battery dies before it commits
+    assert (data_manager.data_dir / CHECKPOINT_FILE).exists()
+
+    record = recover_checkpoint(DataManager(data_manager.data_dir))
+    assert record["recovered_from_checkpoint"]
+    assert "aborted" not in record
+    assert record["completed_trials"] == 2
+
+def test_run_cut_short_by_an_error_is_saved_as_aborted(data_manager):
+    def crash(task):
+        raise RuntimeError("display lost")
+
+    with pytest.raises(RuntimeError):
+        make_task(data_manager, crash).run()
+
+    [record] = data_manager.load_test_data("pvt")
+    assert record["aborted"]
+
+def test_snapshot_taken_mid_run_is_recovered_as_aborted(data_manager):
+    task = make_task(data_manager, lambda task: None)
+    now = time.time()
+    task.responses.append(1, CORRECT, 300.0, now, now, now)
+    writer = CheckpointWriter(data_manager.data_dir / CHECKPOINT_FILE)
+    writer.submit(task.responses.snapshot(), task.record_settings())
+    writer.close(remove=False)
+
+    record = recover_checkpoint(data_manager)
+    assert record["aborted"]
@@ -0,0 +1,100 @@
+import os
+import sys
+import time
+import pytest
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+from data_manager import DataManager
+from key_input import KEY_EVENT, EvdevKeyInput, VirtualKeyboard
+from pvt import PsychomotorVigilanceTask, CORRECT, FALSE_START
+
+KEY_SPACE = 57
+KEY_ESC = 1
+
+@pytest.fixture
+def task(tmp_path, monkeypatch):
+    pygame.init()
+    # The dummy video driver never gives the window keyboard focus
+    monkeypatch.setattr(pygame.key, "get_focused", lambda: True)
+    screen = pygame.display.set_mode((800, 600))
+    task = PsychomotorVigilanceTask(screen, pygame.font.Font(None, 24), DataManager(tmp_path))
+    # The evdev backend, fed with KEY_EVENTs posted here instead of read from a device
+    task.key_input = EvdevKeyInput(paths=["/dev/null"])
+    yield task
+    pygame.quit()
+
+def show_stimulus(task):
+    """Put the task in the state of a stimulus presented just now"""
+    task.stimulus_shown = True
+    task.stimulus_start_time = time.time()
+    task.stimulus_scheduled_time = task.stimulus_start_time
+    return time.perf_counter_ns()
+
+def post_press(key, time_ns):
+    pygame.event.post(pygame.event.Event(KEY_EVENT, key=key, time_ns=time_ns))
+
+def run_frame(task):
+    """Handle the posted presses; an ESC posted last ends run_trials"""
+    post_press(pygame.K_ESCAPE, time.perf_counter_ns())
+    task.run_trials(pygame.time.Clock(), None, time.time())
+
+def responses(task):
+    _, kinds, values, *_ = task.responses.snapshot()
+    return list(zip(kinds, values))
+
+def test_press_before_onset_read_after_it_is_a_false_start(task):
+    onset_ns = show_stimulus(task)
+    post_press(pygame.K_SPACE, onset_ns - 30_000_000)
+    run_frame(task)
+
+    [(kind, _)] = responses(task)
+    assert kind == FALSE_START
+    assert task.trial_count == 0
+    assert not task.stimulus_shown
+
+def test_reaction_time_comes_from_the_press_timestamp(task):
+    onset_ns = show_stimulus(task)
+    post_press(pygame.K_SPACE, onset_ns + 250_000_000)
+    # Read well after the press happened
+    time.sleep(0.35)
+    run_frame(task)
+
+    [(kind, reaction_time)] = responses(task)
+    assert kind == CORRECT
+    assert reaction_time == pytest.approx(250, abs=5)
+
+def test_presses_while_another_window_has_focus_are_ignored(task, monkeypatch):
+    monkeypatch.setattr(pygame.key, "get_focused", lambda: False)
+    event = pygame.event.Event(KEY_EVENT, key=pygame.K_SPACE, time_ns=time.perf_counter_ns())
+    assert task.key_input.key_press(event) is None
+
+def uinput_available():
+    return sys.platform.startswith("linux") and os.access("/dev/uinput", os.W_OK)
+
+@pytest.mark.skipif(not uinput_available(), reason="needs write access to /dev/uinput")
+def test_virtual_keyboard_press_is_timestamped_by_the_kernel(task):
+    keyboard = VirtualKeyboard()
+    try:
+        path = keyboard.device_path()
+        if path is None or not os.access(path, os.R_OK):
+            pytest.skip("virtual keyboard device is not readable")
+        task.key_input = EvdevKeyInput([path]).start()
+        try:
+            show_stimulus(task)
+            sent_ns = keyboard.press(KEY_SPACE)
+            time.sleep(0.2)
+            keyboard.press(KEY_ESC)
+            time.sleep(0.1)
+            task.run_trials(pygame.time.Clock(), None, time.time())
+        finally:
+            task.key_input.stop()
+    finally:
+        keyboard.close()
+
+    [(kind, reaction_time)] = responses(task)
+    assert kind == CORRECT
+    # The kernel stamps the press when it is written, not when the frame loop reads it 200ms later
+    assert reaction_time < (time.perf_counter_ns() - sent_ns) / 1e6 - 150
@@ -0,0 +1,67 @@
+import json
+import pytest
+from data_manager import DataManager
+from session import SessionContext
+from sequential import SequentialAnalysis
+
+@pytest.fixture
+def data_manager(tmp_path):
+    data_manager = DataManager(tmp_path / "data")
+    data_manager.data_dir.mkdir()
+    with open(data_manager.data_dir / "assignment.json", 'w') as f:
+        json.dump({"blocks": [{"block": "1", "orexin": 1, "placebo": 3},
+                              {"block": "2", "orexin": 3, "placebo": 1}]}, f)
+    return data_manager
+
+def save_session(data_manager, block, day, rating=None, dsst_correct=None):
+    data_manager.set_session_context(SessionContext(block, day, "morning"))
+    if rating is not None:
+        data_manager.save_test_data("sss", {"test_type": "stanford_sleepiness_scale", "rating": rating,
+                                            "description": f"rating {rating}"})
+    if dsst_correct is not None:
+        data_manager.save_test_data("dsst", {"test_type": "digit_symbol_substitution_test", "duration_seconds": 90,
+                                             "correct_count": dsst_correct, "total_attempted": dsst_correct,
+                                             "accuracy": 1.0, "symbol_map": {}})
+
+def test_update_folds_a_test_recorded_late(data_manager):
+    analysis = SequentialAnalysis(data_manager)
+    save_session(data_manager, 1, 1, rating=2, dsst_correct=50)
+    save_session(data_manager, 1, 3, rating=4)
+    save_session(data_manager, 2, 1, rating=3, dsst_correct=40)
+    save_session(data_manager, 2, 3, rating=3, dsst_correct=45)
+
+    state, added, waiting = analysis.update()
+    assert added == ["1", "2"]
+    assert waiting == ["1"]
+    assert state["folded"]["dsst_correct"] == ["2"]
+
+    # The DSST of block 1's placebo day comes in after the block was first folded in
+    save_session(data_manager, 1, 3, dsst_correct=44)
+    state, added, waiting = analysis.update()
+    assert added == ["1"]
+    assert waiting == []
+    assert state["metrics"]["dsst_correct"]["n"] == 2
+    assert state["metrics"]["dsst_correct"]["mean"] == pytest.approx((6 + 5) / 2)
+    assert state["metrics"]["sss_rating"]["n"] == 2
+    assert analysis.verify() == []
+
+    _, added, _ = analysis.update()
+    assert added == []
+
+def test_update_reads_only_pending_blocks(data_manager, monkeypatch):
+    analysis = SequentialAnalysis(data_manager)
+    # Block 2 never gets a DSST, which must not keep it waiting
+    save_session(data_manager, 1, 1, rating=2, dsst_correct=50)
+    save_session(data_manager, 1, 3, rating=4, dsst_correct=44)
+    save_session(data_manager, 2, 1, rating=3)
+    save_session(data_manager, 2, 3, rating=3)
+
+    _, added, waiting = analysis.update()
+    assert added == ["1", "2"]
+    assert waiting == []
+
+    def fail(*args, **kwargs):
+        raise AssertionError("update read the data files with no block pending")
+    monkeypatch.setattr(data_manager, "iter_records", fail)
+    _, added, waiting = analysis.update()
+    assert (added, waiting) == ([], [])
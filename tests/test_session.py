@@ -0,0 +1,31 @@
+import json
+from datetime import datetime, timedelta
+import pytest
+from data_manager import DataManager, SESSION_FILE
+from session import SessionContext
+
+@pytest.fixture
+def data_manager(tmp_path):
+    return DataManager(tmp_path)
+
+def rating(value):
+    return {"test_type": "stanford_sleepiness_scale", "rating": value, "description": f"rating {value}"}
+
+def test_context_is_not_stamped_after_the_day_it_was_set(data_manager):
+    yesterday = (datetime.now() - timedelta(days=1)).isoformat()
+    data_manager.set_session_context(SessionContext("1", 2, "morning", set_at=yesterday))
+    data_manager.save_test_data("sss", rating(3))
+
+    [record] = data_manager.load_test_data("sss")
+    assert "session" not in record
+    assert data_manager.get_session_context() is None
+    assert data_manager.get_session_context(current_only=False).day == 2
+
+def test_slot_follows_the_time_of_day(data_manager):
+    data_manager.set_session_context(SessionContext("1", 2, "morning", set_at="2026-03-04T07:30:00"))
+    with open(data_manager.data_dir / SESSION_FILE, 'r') as f:
+        assert "slot" not in json.load(f)
+
+    assert data_manager.get_session_context(datetime(2026, 3, 4, 9, 0)).slot == "morning"
+    assert data_manager.get_session_context(datetime(2026, 3, 4, 16, 0)).slot == "evening"
+    assert data_manager.get_session_context(datetime(2026, 3, 5, 9, 0)) is None
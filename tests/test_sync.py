@@ -0,0 +1,143 @@
+import json
+import gzip
+import threading
+import http.client
+import pytest
+from collector import CollectorHandler, make_collector
+from data_manager import DataManager
+from sync import SyncClient, SYNC_STATE_FILE
+
+CLIENT_ID = "test-client"
+
+@pytest.fixture
+def collector(tmp_path):
+    server = make_collector(tmp_path / "collector", port=0, quiet=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def data_manager(tmp_path):
+    data_manager = DataManager(tmp_path / "data")
+    data_manager.data_dir.mkdir()
+    return data_manager
+
+def save_ratings(data_manager, ratings):
+    for rating in ratings:
+        data_manager.save_test_data("sss", {"test_type": "stanford_sleepiness_scale", "rating": rating,
+                                            "description": f"rating {rating}"})
+
+def make_client(collector, data_manager, **kwargs):
+    url = f"http://127.0.0.1:{collector.server_address[1]}"
+    return SyncClient(url, CLIENT_ID, data_manager, batch_size=2, backoff=0.01, **kwargs)
+
+def held_ratings(collector):
+    path = collector.store.directory / CLIENT_ID / "sss.jsonl"
+    with open(path, 'r') as f:
+        return [json.loads(line)["rating"] for line in f]
+
+def test_sync_resumes_from_saved_offset(collector, data_manager):
+    save_ratings(data_manager, [1, 2, 3, 4, 5])
+    client = make_client(collector, data_manager)
+    try:
+        assert client.sync() == 5
+        save_ratings(data_manager, [6, 7])
+        assert client.sync() == 2
+    finally:
+        client.close()
+
+    assert held_ratings(collector) == [1, 2, 3, 4, 5, 6, 7]
+    with open(data_manager.data_dir / SYNC_STATE_FILE, 'r') as f:
+        assert json.load(f)["sss"] == 7
+
+def test_sync_retries_after_dropped_connection(collector, data_manager):
+    class DroppingHandler(CollectorHandler):
+        """Stores the first batch, then hangs up before replying"""
+        dropped = []
+
+        def do_POST(self):
+            if not self.dropped:
+                self.dropped.append(self.path)
+                body = gzip.decompress(self.rfile.read(int(self.headers["Content-Length"])))
+                batch = json.loads(body)
+                self.server.store.append(batch["client_id"], batch["test_name"], batch["start"], batch["records"])
+                self.close_connection = True
+                return
+            super().do_POST()
+
+    collector.RequestHandlerClass = DroppingHandler
+    save_ratings(data_manager, [1, 2, 3])
+    client = make_client(collector, data_manager)
+    try:
+        client.sync()
+    finally:
+        client.close()
+
+    assert DroppingHandler.dropped
+    assert held_ratings(collector) == [1, 2, 3]
+    with open(data_manager.data_dir / SYNC_STATE_FILE, 'r') as f:
+        assert json.load(f)["sss"] == 3
+
+def test_resent_batches_are_not_duplicated(collector, data_manager):
+    save_ratings(data_manager, [1, 2, 3])
+    client = make_client(collector, data_manager)
+    try:
+        client.sync()
+        # Lose the sync state, so every batch goes out again
+        (data_manager.data_dir / SYNC_STATE_FILE).unlink()
+        assert client.sync() == 0
+    finally:
+        client.close()
+
+    assert held_ratings(collector) == [1, 2, 3]
+
+def post_batch(collector, batch):
+    body = gzip.compress(json.dumps(batch).encode("utf-8"))
+    connection = http.client.HTTPConnection("127.0.0.1", collector.server_address[1], timeout=5)
+    try:
+        connection.request("POST", "/upload", body=body, headers={"Content-Encoding": "gzip"})
+        response = connection.getresponse()
+        response.read()
+    finally:
+        connection.close()
+    return response.status
+
+@pytest.mark.parametrize("client_id, test_name", [
+    ("../escape", "sss"),
+    ("a\\b", "sss"),
+    ("", "sss"),
+    (CLIENT_ID, "../../x"),
+    (CLIENT_ID, "settings")
+])
+def test_collector_rejects_unsafe_names(collector, client_id, test_name):
+    status = post_batch(collector, {"client_id": client_id, "test_name": test_name, "start": 0,
+                                    "records": [{"rating": 1}]})
+
+    assert status == 400
+    assert [path.name for path in collector.store.directory.rglob("*")] == []
+
+@pytest.mark.parametrize("start", [-1, "0", 1.5, None, True])
+def test_collector_rejects_invalid_start(collector, start):
+    status = post_batch(collector, {"client_id": CLIENT_ID, "test_name": "sss", "start": start,
+                                    "records": [{"rating": 1}, {"rating": 2}]})
+
+    assert status == 400
+    assert [path.name for path in collector.store.directory.rglob("*")] == []
+
+def test_sync_streams_records_after_the_acknowledged_offset(collector, data_manager, monkeypatch):
+    save_ratings(data_manager, [1, 2, 3])
+    client = make_client(collector, data_manager)
+    try:
+        client.sync()
+        save_ratings(data_manager, [4])
+
+        def fail(test_name, validate=True):
+            raise AssertionError("sync loaded a whole test file")
+        monkeypatch.setattr(data_manager, "load_test_data", fail)
+        assert client.sync() == 1
+    finally:
+        client.close()
+
+    assert held_ratings(collector) == [1, 2, 3, 4]
@@ -0,0 +1,96 @@
+import re
+from collections import OrderedDict
+
+WORD_PATTERN = re.compile(r"\S+")
+
+class TextLayout:
+    """Word wrapping for one font and line width, cached across frames
+
+    Wrapped layouts are kept in a small LRU keyed by text. When the text
+    only grew or shrank at the end since the last call (typing, backspace),
+    the lines before the edit are reused and only the tail is re-wrapped.
+    """
+
+    def __init__(self, font, max_width, cache_size=64):
+        self.font = font
+        self.max_width = max_width
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._surfaces = OrderedDict()
+        self._last_text = None
+        self._last_spans = []
+
+    def _wrap_from(self, text, spans, position):
+        """Greedily wrap the words of text starting at position, appending (start, end) spans"""
+        line_start = None
+        line_end = None
+
+        for match in WORD_PATTERN.finditer(text, position):
+            if line_start is None:
+                line_start, line_end = match.start(), match.end()
+            elif self.font.size(text[line_start:match.end()])[0] <= self.max_width:
+                line_end = match.end()
+            else:
+                spans.append((line_start, line_end))
+                line_start, line_end = match.start(), match.end()
+
+        if line_start is not None:
+            spans.append((line_start, line_end))
+        return spans
+
+    def _spans(self, text):
+        last = self._last_text
+        if last is not None and self._last_spans and (text.startswith(last) or last.startswith(text)):
+            edit_position = min(len(text), len(last))
+
+            # A shortened word may now fit on the previous line, so re-wrap from there
+            line = 0
+            while line + 1 < len(self._last_spans) and self._last_spans[line + 1][0] <= edit_position:
+                line += 1
+            restart = max(0, line - 1)
+
+            spans = self._last_spans[:restart]
+            return self._wrap_from(text, spans, self._last_spans[restart][0])
+
+        return self._wrap_from(text, [], 0)
+
+    def wrap(self, text):
+        """Return the wrapped lines of text"""
+        lines = self._cache.get(text)
+        if lines is not None:
+            self._cache.move_to_end(text)
+            return lines
+
+        spans = self._spans(text)
+        self._last_text = text
+        self._last_spans = spans
+
+        lines = [text[start:end] for start, end in spans]
+        self._cache[text] = lines
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return lines
+
+    def render(self, line, color):
+        """Render one wrapped line, reusing the surface from earlier frames"""
+        key = (line, color)
+        surface = self._surfaces.get(key)
+        if surface is None:
+            surface = self.font.render(line, True, color)
+            self._surfaces[key] = surface
+            if len(self._surfaces) > self.cache_size:
+                self._surfaces.popitem(last=False)
+        else:
+            self._surfaces.move_to_end(key)
+        return surface
+
+_layouts = {}
+
+def get_layout(font, max_width):
+    """Shared TextLayout for a font and width, so caches survive across screens"""
+    key = (font, max_width)
+    layout = _layouts.get(key)
+    if layout is None:
+        layout = TextLayout(font, max_width)
+        _layouts[key] = layout
+    return layout
@@ -0,0 +1,191 @@
+import json
+import pygame
+from data_manager import DataManager
+from assets import get_font
+from key_input import get_key_input
+
+TIME_PERCEPTION_CONFIG_FILE = "time_perception.json"
+
+# Interval lengths in seconds, and how often each is produced in a sitting
+DEFAULT_TARGETS = (60,)
+DEFAULT_TRIALS_PER_TARGET = 1
+
+def load_time_perception_config(data_manager):
+    """Targets and trials per target from time_perception.json in the data directory, or the defaults
+
+    The file looks like {"targets": [10, 30, 60], "trials_per_target": 2}.
+    """
+    filepath = data_manager.data_dir / TIME_PERCEPTION_CONFIG_FILE
+    if not filepath.exists():
+        return DEFAULT_TARGETS, DEFAULT_TRIALS_PER_TARGET
+
+    try:
+        with open(filepath, 'r') as f:
+            config = json.load(f)
+        targets = tuple(config.get("targets", DEFAULT_TARGETS))
+        trials_per_target = config.get("trials_per_target", DEFAULT_TRIALS_PER_TARGET)
+        if not targets or not all(isinstance(t, (int, float)) and t > 0 for t in targets):
+            raise ValueError(f"targets must be positive numbers of seconds, got {list(targets)}")
+        if not isinstance(trials_per_target, int) or trials_per_target < 1:
+            raise ValueError(f"trials_per_target must be a positive integer, got {trials_per_target!r}")
+    except (OSError, json.JSONDecodeError, AttributeError, TypeError, ValueError) as e:
+        print(f"Ignoring unreadable time perception config '{filepath}': {e}")
+        return DEFAULT_TARGETS, DEFAULT_TRIALS_PER_TARGET
+    return targets, trials_per_target
+
+class TimePerceptionTest:
+    def __init__(self, screen, font, data_manager=None, targets=None, trials_per_target=None):
+        self.screen = screen
+        self.font = font
+        self.data_manager = data_manager or DataManager()
+        if targets is None or trials_per_target is None:
+            config_targets, config_trials = load_time_perception_config(self.data_manager)
+            targets = targets or config_targets
+            trials_per_target = trials_per_target or config_trials
+        self.key_input = get_key_input()
+        self.small_font = get_font(24)
+        self.large_font = get_font(48)
+        self.running = True
+
+        # Colors
+        self.WHITE = (255, 255, 255)
+        self.BLACK = (0, 0, 0)
+        self.BLUE = (70, 130, 180)
+        self.GRAY = (128, 128, 128)
+
+        # One trial per (target, repetition), in order
+        self.trial_targets = [target for target in targets for _ in range(trials_per_target)]
+        self.trial_index = 0
+        self.phase = "instructions"  # instructions, timing
+        self.start_ns = 0
+        self.trials = []
+
+    def run(self):
+        # Nothing on screen changes while timing, so instead of a 60 FPS loop the
+        # test redraws only on state changes and sleeps in pygame.event.wait().
+        # Presses are timestamped with perf_counter_ns as soon as they are dequeued,
+        # or by the kernel when the evdev input backend is active.
+        self.draw()
+        pygame.display.flip()
+
+        # Mouse movement would only wake the loop for nothing
+        pygame.event.set_blocked(pygame.MOUSEMOTION)
+        try:
+            self.wait_for_presses()
+        finally:
+            pygame.event.set_allowed(pygame.MOUSEMOTION)
+
+        # Keep completed trials even if the sitting was cut short
+        self.save_data()
+        return self.trials
+
+    def wait_for_presses(self):
+        while self.running:
+            event = pygame.event.wait()
+            press = self.key_input.key_press(event)
+
+            if event.type == pygame.QUIT:
+                self.running = False
+                break
+
+            elif press is not None:
+                now_ns = press.time_ns
+                if press.key == pygame.K_ESCAPE:
+                    self.running = False
+                    break
+
+                elif press.key == pygame.K_SPACE:
+                    if self.phase == "instructions":
+                        self.start_ns = now_ns
+                        self.phase = "timing"
+                    else:
+                        self.record_trial(self.start_ns, now_ns)
+                        self.trial_index += 1
+                        self.phase = "instructions"
+                        if self.trial_index >= len(self.trial_targets):
+                            self.running = False
+                            break
+
+            self.draw()
+            pygame.display.flip()
+
+    def record_trial(self, start_ns, end_ns):
+        target = self.trial_targets[self.trial_index]
+        produced = (end_ns - start_ns) / 1e9
+        self.trials.append({
+            'trial': self.trial_index + 1,
+            'target_s': target,
+            'produced_s': produced,
+            'error_s': produced - target,
+            'ratio': produced / target,
+            'start_ns': start_ns,
+            'end_ns': end_ns
+        })
+
+    def draw(self):
+        self.screen.fill(self.WHITE)
+
+        # Title
+        title_text = self.large_font.render("Time Perception", True, self.BLACK)
+        title_rect = title_text.get_rect()
+        title_rect.centerx = self.screen.get_width() // 2
+        title_rect.y = 50
+        self.screen.blit(title_text, title_rect)
+
+        # Trial counter
+        trial_text = self.small_font.render(f"Trial: {min(self.trial_index + 1, len(self.trial_targets))}/{len(self.trial_targets)}", True, self.BLACK)
+        trial_rect = trial_text.get_rect()
+        trial_rect.x = 20
+        trial_rect.y = 20
+        self.screen.blit(trial_text, trial_rect)
+
+        if self.trial_index >= len(self.trial_targets):
+            return
+
+        target = self.trial_targets[self.trial_index]
+        if self.phase == "instructions":
+            lines = [
+                "Don't count aloud or look at a clock.",
+                "Press SPACE to start the interval, then press",
+                f"SPACE again when you think {target} seconds have passed.",
+                "ESC to quit"
+            ]
+            if self.trials:
+                lines.insert(0, f"Last estimate: {self.trials[-1]['produced_s']:.1f}s")
+        else:
+            lines = [
+                "Timing...",
+                f"Press SPACE when {target} seconds have passed"
+            ]
+
+        for i, line in enumerate(lines):
+            text = self.font.render(line, True, self.BLUE if self.phase == "timing" else self.BLACK)
+            text_rect = text.get_rect()
+            text_rect.centerx = self.screen.get_width() // 2
+            text_rect.y = 200 + i * 40
+            self.screen.blit(text, text_rect)
+
+    def save_data(self):
+        if not self.trials:
+            return
+
+        data = {
+            "test_type": "time_perception",
+            "completed_trials": len(self.trials),
+            "planned_trials": len(self.trial_targets),
+            "input_backend": self.key_input.name,
+            "trials": self.trials,
+            "mean_abs_error_s": sum(abs(t['error_s']) for t in self.trials) / len(self.trials),
+            "mean_ratio": sum(t['ratio'] for t in self.trials) / len(self.trials)
+        }
+
+        # Save to file using DataManager
+        try:
+            filepath = self.data_manager.save_test_data('time_perception', data)
+            print(f"Time perception data saved to {filepath}")
+        except Exception as e:
+            print(f"Error saving time perception data: {e}")
+
+def run_time_perception(screen, font, data_manager=None, targets=None, trials_per_target=None):
+    time_perception = TimePerceptionTest(screen, font, data_manager, targets, trials_per_target)
+    return time_perception.run()
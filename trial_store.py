@@ -0,0 +1,184 @@
+import os
+import sys
+import json
+import struct
+import argparse
+
+TRIAL_STORE_SUFFIX = ".trials"
+MAGIC = b"VGTRIAL1"
+
+# magic, schema length, session records covered, committed rows
+HEADER = struct.Struct("<8sIIQ")
+
+# Rows start on a multiple of this, after the header and the JSON schema
+DATA_ALIGNMENT = 64
+
+# Per test: fixed-width row layout as (field, struct code), little-endian without padding.
+# 'record' is the offset of the session record in <test>.json the row belongs to.
+TRIAL_SCHEMAS = {
+    "pvt": {
+        "version": 1,
+        "fields": [("record", "I"), ("trial", "I"), ("kind", "B"), ("value_ms", "d"), ("timestamp", "d"),
+                   ("stimulus_scheduled", "d"), ("stimulus_onset", "d")]
+    },
+    "digit_span": {
+        "version": 1,
+        "fields": [("record", "I"), ("trial", "H"), ("forward", "B"), ("span", "B"), ("correct", "B"),
+                   ("sequence", "16s"), ("user_input", "16s"), ("max_onset_error_ms", "f")]
+    }
+}
+
+# PVT 'kind' values; value_ms is the reaction time or the time since the wait started
+PVT_KINDS = {"correct": 0, "false_start": 1}
+UNKNOWN_KIND = 255
+
+NUMPY_TYPES = {"I": "<u4", "H": "<u2", "B": "u1", "d": "<f8", "f": "<f4"}
+
+def _pvt_rows(offset, record):
+    for response in record.get("all_responses", []):
+        value = response.get("reaction_time_ms", response.get("time_since_wait_start_ms", 0.0))
+        yield (offset, response.get("trial", 0), PVT_KINDS.get(response.get("type"), UNKNOWN_KIND), value,
+               response.get("timestamp", 0.0), response.get("stimulus_scheduled", 0.0),
+               response.get("stimulus_onset", 0.0))
+
+def _digits(digits):
+    return "".join(str(d) for d in digits).encode()
+
+def _digit_span_rows(offset, record):
+    trials = record.get("forward_trials", []) + record.get("backward_trials", [])
+    for i, trial in enumerate(trials):
+        errors = [digit["onset_error_ms"] for digit in trial.get("presentation", [])]
+        yield (offset, i, int(trial["forward"]), trial["span"], int(trial["correct"]),
+               _digits(trial["sequence"]), _digits(trial["user_input"]),
+               max(errors) if errors else float("nan"))
+
+# Test -> function yielding one row tuple per trial of a session record
+ROW_EXTRACTORS = {"pvt": _pvt_rows, "digit_span": _digit_span_rows}
+
+def trial_store_path(data_dir, test_name):
+    return data_dir / f"{test_name}{TRIAL_STORE_SUFFIX}"
+
+def row_struct(schema):
+    return struct.Struct("<" + "".join(code for _, code in schema["fields"]))
+
+def numpy_dtype(schema):
+    """Structured dtype matching the row layout, for zero-copy views"""
+    import numpy as np
+    return np.dtype([(name, NUMPY_TYPES.get(code, f"S{code[:-1]}")) for name, code in schema["fields"]])
+
+def read_header(path):
+    """(schema, data offset, records covered, rows) of a trial store, or None if unusable"""
+    try:
+        with open(path, 'rb') as f:
+            magic, schema_length, records, rows = HEADER.unpack(f.read(HEADER.size))
+            schema = json.loads(f.read(schema_length))
+    except (OSError, struct.error, ValueError):
+        return None
+    if magic != MAGIC:
+        return None
+    data_offset = -(-(HEADER.size + schema_length) // DATA_ALIGNMENT) * DATA_ALIGNMENT
+    return schema, data_offset, records, rows
+
+def _schema_bytes(test_name, schema):
+    return json.dumps({"test": test_name, **schema}).encode()
+
+def _create(path, test_name, schema):
+    schema_bytes = _schema_bytes(test_name, schema)
+    header = HEADER.pack(MAGIC, len(schema_bytes), 0, 0) + schema_bytes
+    with open(path, 'wb') as f:
+        f.write(header.ljust(-(-len(header) // DATA_ALIGNMENT) * DATA_ALIGNMENT, b"\0"))
+
+def update_trial_store(data_dir, test_name, records):
+    """Append the trials of records not yet in the test's trial store
+
+    Like the session index, the store remembers how many session records it
+    covers and catches up from there. It is recreated if the JSON file
+    shrank or the schema changed. Rows are made durable before the header
+    counts them, so rows from an interrupted append are dropped on the next one.
+    """
+    extract = ROW_EXTRACTORS.get(test_name)
+    if extract is None:
+        return
+
+    schema = TRIAL_SCHEMAS[test_name]
+    path = trial_store_path(data_dir, test_name)
+    header = read_header(path)
+    schema_bytes = _schema_bytes(test_name, schema)
+    expected = json.loads(schema_bytes)
+    if header is None or header[0] != expected or header[2] > len(records):
+        _create(path, test_name, schema)
+        header = read_header(path)
+    _, data_offset, covered, rows = header
+
+    row = row_struct(schema)
+    data = bytearray()
+    for offset in range(covered, len(records)):
+        for values in extract(offset, records[offset]):
+            data += row.pack(*values)
+
+    try:
+        with open(path, 'r+b') as f:
+            f.truncate(data_offset + rows * row.size)
+            f.seek(0, os.SEEK_END)
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+            f.seek(0)
+            f.write(HEADER.pack(MAGIC, len(schema_bytes), len(records), rows + len(data) // row.size))
+            f.flush()
+            os.fsync(f.fileno())
+    except OSError as e:
+        raise OSError(f"Error updating trial store '{path}': {e}")
+
+def open_trials(data_dir, test_name):
+    """All trials of a test as a read-only structured array mapped straight from disk"""
+    import numpy as np
+
+    path = trial_store_path(data_dir, test_name)
+    header = read_header(path)
+    if header is None:
+        raise OSError(f"No trial store at '{path}'; run 'python trial_store.py rebuild'")
+    schema, data_offset, _, rows = header
+
+    dtype = numpy_dtype(schema)
+    if rows == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', offset=data_offset, shape=(rows,))
+
+def rebuild_trial_store(data_manager, test_name):
+    """Recreate a test's trial store from its saved records"""
+    trial_store_path(data_manager.data_dir, test_name).unlink(missing_ok=True)
+    update_trial_store(data_manager.data_dir, test_name, data_manager.load_test_data(test_name))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect or rebuild the binary trial stores")
+    parser.add_argument("command", choices=("info", "rebuild"))
+    parser.add_argument("tests", nargs="*", default=list(TRIAL_SCHEMAS), help="tests (default: all with trials)")
+    args = parser.parse_args(argv)
+
+    from data_manager import DataManager
+    data_manager = DataManager()
+    error = data_manager.check_data_setup()
+    if error:
+        print(error)
+        return 1
+
+    for test_name in args.tests:
+        if test_name not in TRIAL_SCHEMAS:
+            print(f"{test_name}: no trial schema")
+            continue
+        if args.command == "rebuild":
+            rebuild_trial_store(data_manager, test_name)
+
+        header = read_header(trial_store_path(data_manager.data_dir, test_name))
+        if header is None:
+            print(f"{test_name}: no trial store")
+            continue
+        schema, _, records, rows = header
+        print(f"{test_name}: {rows} trials from {records} sessions, schema v{schema['version']}, "
+              f"{row_struct(schema).size} bytes per trial")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())